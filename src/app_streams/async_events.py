@@ -0,0 +1,572 @@
+import asyncio
+from collections import deque
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Executor
+import inspect
+import threading
+import time
+import traceback
+
+from app_streams.dispatch import (
+    BLOCK,
+    DEFAULT_MAX_BATCH_DELAY,
+    DEFAULT_MAX_BATCH_SIZE,
+    DEFAULT_MAX_QUEUE_SIZE,
+    DROP_NEWEST,
+    OVERFLOW_POLICIES,
+    get_hook_name,
+    get_next_item_index,
+)
+from app_streams.event_index import EventIndex
+from app_streams.event_log import SegmentedEventLog
+from app_streams.events import (
+    SHUTDOWN_TIMEOUT,
+    AppEvent,
+    AppEventStream,
+    EventHookTable,
+    EventStreamMetrics,
+    dump_events,
+)
+from app_streams.metrics import MetricsRegistry
+
+# pushes from other threads that may be on their way to the loop at once, this bounds
+# how far a full BLOCK queue can overshoot
+MAX_PENDING_PUSHES = 64
+
+AsyncHook = Callable[[any], Awaitable[None]]
+
+
+class HookExecutorShutdownError(RuntimeError):
+    """A synchronous hook's executor has been shut down, the item cannot be handled."""
+
+
+# marks executor threads running an adapted hook, their pushes must not wait: the
+# hook may be the one that has to make room
+_hook_threads = threading.local()
+
+
+def to_async_hook(hook: Callable, executor: Executor | None = None) -> AsyncHook:
+    """
+    Coroutine hooks are returned as they are. Synchronous hooks are wrapped so that
+    they run on `executor` (the loop's default executor if None) and can be awaited.
+    """
+    if inspect.iscoroutinefunction(hook):
+        return hook
+
+    def run_hook(item) -> None:
+        _hook_threads.is_running_hook = True
+
+        try:
+            hook(item)
+        finally:
+            _hook_threads.is_running_hook = False
+
+    async def run_in_executor(item) -> None:
+        loop = asyncio.get_running_loop()
+
+        try:
+            future = loop.run_in_executor(executor, run_hook, item)
+        except RuntimeError as err:
+            # executor has been shut down (i.e. during shutdown). the hook may block,
+            # so it must not run on the loop instead: the item is dropped
+            raise HookExecutorShutdownError() from err
+
+        await future
+
+    return run_in_executor
+
+
+class AsyncHookDispatcher:
+    """
+    Bounded FIFO dispatch queue for a single coroutine hook.
+
+    Like HookDispatcher, but the hook runs in at most `concurrency` tasks on the loop
+    instead of executor threads, ordered by `order_key` in the same way. Must only be
+    used from the loop's thread, except for `stats`. The loop cannot wait, so with BLOCK
+    a full queue still takes the item and reports through `on_full` that it is full
+    (True) or has room again (False).
+    """
+
+    def __init__(
+        self,
+        hook: AsyncHook,
+        loop: asyncio.AbstractEventLoop,
+        concurrency: int = 1,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+        overflow_policy: str = BLOCK,
+        name: str | None = None,
+        on_hook_done: Callable[[float, bool], None] | None = None,
+        on_full: Callable[[bool], None] | None = None,
+        order_key: Callable[[any], any] | None = None,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("Hook concurrency must be at least 1.")
+
+        if max_queue_size < 1:
+            raise ValueError("Hook queue size must be at least 1.")
+
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: '{overflow_policy}'.")
+
+        self.hook = hook
+        self.name = name or get_hook_name(hook)
+        self.concurrency = concurrency
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = overflow_policy
+        self.order_key = order_key
+
+        self.__loop = loop
+        self.__on_hook_done = on_hook_done
+        self.__on_full = on_full
+        self.__is_full = False
+        self.__queue = deque()
+        self.__active_workers = 0
+        self.__worker_tasks: set[asyncio.Task] = set()  # keeps the tasks referenced
+        self.__busy_keys = set()  # order keys of the items being handled
+
+        self.dispatched = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def dispatch(self, item) -> bool:
+        """Queue an item for the hook. Returns False if it was dropped."""
+        if len(self.__queue) >= self.max_queue_size:
+            if self.overflow_policy == BLOCK:
+                self.__set_is_full(True)
+            elif self.overflow_policy == DROP_NEWEST:
+                self.dropped += 1
+                return False
+            else:
+                self.__queue.popleft()
+                self.dropped += 1
+
+        self.__queue.append(item)
+
+        if self.__active_workers < self.concurrency:
+            self.__active_workers += 1
+
+            task = self.__loop.create_task(self.__work())
+            self.__worker_tasks.add(task)
+            task.add_done_callback(self.__worker_tasks.discard)
+
+        return True
+
+    async def __work(self) -> None:
+        try:
+            while (
+                index := get_next_item_index(
+                    self.__queue, self.__busy_keys, self.order_key
+                )
+            ) is not None:
+                item = self.__queue[index]
+                del self.__queue[index]
+
+                if self.__is_full and len(self.__queue) < self.max_queue_size:
+                    self.__set_is_full(False)
+
+                if self.order_key is None:
+                    await self.__run_hook(item)
+                    continue
+
+                key = self.order_key(item)
+                self.__busy_keys.add(key)
+
+                try:
+                    await self.__run_hook(item)
+                finally:
+                    self.__busy_keys.discard(key)
+        finally:
+            # no await between the empty check and here, so no item is left behind
+            self.__active_workers -= 1
+
+    def __set_is_full(self, is_full: bool) -> None:
+        if self.__is_full != is_full:
+            self.__is_full = is_full
+
+            if self.__on_full is not None:
+                self.__on_full(is_full)
+
+    @property
+    def is_full(self) -> bool:
+        return self.__is_full
+
+    async def __run_hook(self, item) -> None:
+        started_at = time.perf_counter()
+        is_failed = False
+
+        try:
+            await self.hook(item)
+        except HookExecutorShutdownError:
+            # never reached the hook, so it is neither dispatched nor observed
+            self.dropped += 1
+            return
+        except Exception:
+            is_failed = True
+            self.failed += 1
+            traceback.print_exc()
+
+        self.dispatched += 1
+
+        if self.__on_hook_done is not None:
+            self.__on_hook_done(time.perf_counter() - started_at, is_failed)
+
+    async def join(self) -> None:
+        """Wait until every queued item has been handled."""
+        while pending := {task for task in self.__worker_tasks if not task.done()}:
+            await asyncio.wait(pending)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queue_depth": len(self.__queue),
+            "active_workers": self.__active_workers,
+            "dispatched": self.dispatched,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+class AsyncBatchHookDispatcher:
+    """
+    Collects events for a coroutine hook that takes lists of events, like
+    BatchHookDispatcher, with the loop's own timers instead of a flusher thread.
+    """
+
+    def __init__(
+        self,
+        hook: AsyncHook,
+        loop: asyncio.AbstractEventLoop,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_delay: float = DEFAULT_MAX_BATCH_DELAY,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+        overflow_policy: str = BLOCK,
+        name: str | None = None,
+        on_hook_done: Callable[[float, bool], None] | None = None,
+        on_full: Callable[[bool], None] | None = None,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("Batch size must be at least 1.")
+
+        if max_delay < 0:
+            raise ValueError("Batch delay must not be negative.")
+
+        self.hook = hook
+        self.name = name or get_hook_name(hook)
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+
+        self.__loop = loop
+        self.__batch = []
+        self.__timer: asyncio.TimerHandle | None = None
+        self.__batches = AsyncHookDispatcher(
+            hook=hook,
+            loop=loop,
+            concurrency=1,
+            max_queue_size=max_queue_size,
+            overflow_policy=overflow_policy,
+            name=self.name,
+            on_hook_done=on_hook_done,
+            on_full=on_full,
+        )
+
+        self.flushed_by_size = 0
+        self.flushed_by_delay = 0
+
+    def dispatch(self, item) -> bool:
+        self.__batch.append(item)
+
+        if len(self.__batch) >= self.max_batch_size:
+            self.flushed_by_size += 1
+            return self.__dispatch_batch()
+
+        if self.__timer is None:
+            self.__timer = self.__loop.call_later(self.max_delay, self.__flush_by_delay)
+
+        return True
+
+    def __flush_by_delay(self) -> None:
+        self.__timer = None
+
+        if self.__batch:
+            self.flushed_by_delay += 1
+            self.__dispatch_batch()
+
+    def flush(self) -> None:
+        if self.__batch:
+            self.__dispatch_batch()
+
+    def __dispatch_batch(self) -> bool:
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+
+        batch = self.__batch
+        self.__batch = []
+
+        return self.__batches.dispatch(batch)
+
+    @property
+    def is_full(self) -> bool:
+        return self.__batches.is_full
+
+    async def join(self) -> None:
+        await self.__batches.join()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            **self.__batches.stats(),
+            "pending_events": len(self.__batch),
+            "flushed_by_size": self.flushed_by_size,
+            "flushed_by_delay": self.flushed_by_delay,
+        }
+
+
+class AsyncAppEventStream:
+    """
+    Event stream whose hooks run as tasks on an asyncio event loop.
+
+    `async def` hooks run on the loop itself, so a hook that only does a little I/O
+    costs no thread hop. Synchronous hooks still work: they are adapted to run on the
+    stream's executor (see to_async_hook). Routing by type and "all", history, index,
+    event log and metrics are the same as in AppEventStream.
+
+    push() is safe to call from any thread. Pushes from other threads are handed to the
+    loop in the order they were made. Without a `loop` the stream runs its own, on a
+    dedicated thread. While a hook with the BLOCK policy has a full queue, pushes from
+    other threads wait for room; pushes by hooks (on the loop or not) never wait. The
+    queue can briefly grow past its size by the pushes already on their way to the loop.
+    """
+
+    DEFAULT_DUMP_FILENAME = AppEventStream.DEFAULT_DUMP_FILENAME
+    DEFAULT_HISTORY_MAXSIZE = AppEventStream.DEFAULT_HISTORY_MAXSIZE
+    EVENT_LOG_BATCH_DELAY = AppEventStream.EVENT_LOG_BATCH_DELAY
+
+    def __init__(
+        self,
+        thread_pool_executor: Executor | None = None,
+        history_maxsize=DEFAULT_HISTORY_MAXSIZE,
+        event_log: SegmentedEventLog | None = None,
+        metrics: MetricsRegistry | None = None,
+        loop: asyncio.AbstractEventLoop | None = None,
+    ) -> None:
+        self.__event_hooks = EventHookTable()
+        self.__executor = thread_pool_executor
+        self.__full_hooks: set[int] = set()  # only touched on the loop
+        self.__has_room = threading.Event()
+        self.__has_room.set()
+        self.__pending_pushes = threading.BoundedSemaphore(MAX_PENDING_PUSHES)
+        self.__is_closed = False
+        self.event_log = event_log
+        self.history = deque(maxlen=history_maxsize)
+        self.index = EventIndex()
+
+        self.metrics = metrics or MetricsRegistry()
+        self.__stream_metrics = EventStreamMetrics(self.metrics, self.__event_hooks.get)
+        self.__events_pushed = self.__stream_metrics.events_pushed
+
+        self.__loop = loop or asyncio.new_event_loop()
+        self.__thread = None
+
+        if loop is None:
+            self.__thread = threading.Thread(
+                target=self.__run, name="event-stream", daemon=True
+            )
+            self.__thread.start()
+
+        if self.event_log is not None:
+            self.add_batch_event_hook(
+                event_type="all",
+                event_hook=self.__append_to_event_log,
+                max_delay=self.EVENT_LOG_BATCH_DELAY,
+                name="event_log",
+            )
+
+    async def __append_to_event_log(self, events: list[AppEvent]) -> None:
+        # appending only queues the events for the log's writer, no need for a thread
+        self.event_log.append_batch(events)
+
+    def __run(self) -> None:
+        asyncio.set_event_loop(self.__loop)
+
+        try:
+            self.__loop.run_forever()
+        finally:
+            self.__loop.close()
+
+    def __is_on_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.__loop
+        except RuntimeError:
+            return False
+
+    def __call_on_loop(self, callback: Callable, *args) -> None:
+        if self.__is_on_loop():
+            callback(*args)
+            return
+
+        try:
+            self.__loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # loop already closed (i.e. during shutdown), the hooks are gone
+            pass
+
+    def push(self, event) -> None:
+        if not isinstance(event, AppEvent):
+            raise ValueError(
+                f"Only AppEvent instances can be pushed to AsyncAppEventStream, received: {type(event)}"
+            )
+
+        if self.__is_on_loop():
+            self.__dispatch(event)
+        elif not self.__is_closed:
+            if not getattr(_hook_threads, "is_running_hook", False):
+                self.__has_room.wait()
+
+            self.__pending_pushes.acquire()
+
+            try:
+                self.__loop.call_soon_threadsafe(self.__dispatch_pending, event)
+            except RuntimeError:
+                # loop already closed (i.e. during shutdown), the hooks are gone
+                self.__pending_pushes.release()
+
+        self.__events_pushed.inc(type=event.type)
+        self.history.append(event)
+        self.index.add(event)
+
+    def __get_on_full(self, event_hook_id: int) -> Callable[[bool], None]:
+        def on_full(is_full: bool) -> None:
+            if is_full and not self.__is_closed:
+                self.__full_hooks.add(event_hook_id)
+                self.__has_room.clear()
+            elif not is_full:
+                self.__on_room(event_hook_id)
+
+        return on_full
+
+    def __on_room(self, event_hook_id: int) -> None:
+        self.__full_hooks.discard(event_hook_id)
+
+        if not self.__full_hooks:
+            self.__has_room.set()
+
+    def __dispatch_pending(self, event: AppEvent) -> None:
+        self.__pending_pushes.release()
+        self.__dispatch(event)
+
+    def __dispatch(self, event: AppEvent) -> None:
+        for dispatcher in self.__event_hooks.iter_dispatchers_for_event(event.type):
+            dispatcher.dispatch(event)
+
+    def add_event_hook(
+        self,
+        event_type: str,
+        event_hook: Callable,
+        concurrency: int = 1,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+        overflow_policy: str = BLOCK,
+        executor: Executor | None = None,
+        name: str | None = None,
+        order_key: Callable[[AppEvent], any] | None = None,
+    ) -> int:
+        """
+        Register an `async def` hook, or a synchronous one that then runs on `executor`
+        (the stream's by default). Concurrency, ordering and queueing work as in
+        AppEventStream.
+        """
+        event_hook_id = hash(event_hook)
+        name = name or get_hook_name(event_hook)
+
+        dispatcher = AsyncHookDispatcher(
+            hook=to_async_hook(event_hook, executor or self.__executor),
+            loop=self.__loop,
+            concurrency=concurrency,
+            max_queue_size=max_queue_size,
+            overflow_policy=overflow_policy,
+            name=name,
+            on_hook_done=self.__stream_metrics.get_hook_observer(event_type, name),
+            on_full=self.__get_on_full(event_hook_id),
+            order_key=order_key,
+        )
+
+        return self.__event_hooks.add(event_type, event_hook_id, dispatcher)
+
+    def add_batch_event_hook(
+        self,
+        event_type: str,
+        event_hook: Callable,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_delay: float = DEFAULT_MAX_BATCH_DELAY,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+        overflow_policy: str = BLOCK,
+        executor: Executor | None = None,
+        name: str | None = None,
+    ) -> int:
+        """Register a hook that receives lists of events, see AppEventStream."""
+        event_hook_id = hash(event_hook)
+        name = name or get_hook_name(event_hook)
+
+        dispatcher = AsyncBatchHookDispatcher(
+            hook=to_async_hook(event_hook, executor or self.__executor),
+            loop=self.__loop,
+            max_batch_size=max_batch_size,
+            max_delay=max_delay,
+            max_queue_size=max_queue_size,
+            overflow_policy=overflow_policy,
+            name=name,
+            on_hook_done=self.__stream_metrics.get_hook_observer(event_type, name),
+            on_full=self.__get_on_full(event_hook_id),
+        )
+
+        return self.__event_hooks.add(event_type, event_hook_id, dispatcher)
+
+    def remove_event_hook(self, event_type: str, event_hook_id: int) -> None:
+        # events already queued for the hook are still delivered
+        removed_dispatcher = self.__event_hooks.remove(event_type, event_hook_id)
+
+        if isinstance(removed_dispatcher, AsyncBatchHookDispatcher):
+            self.__call_on_loop(removed_dispatcher.flush)
+
+        # a removed hook no longer holds back pushers
+        self.__call_on_loop(self.__on_room, event_hook_id)
+
+    def flush(self) -> None:
+        """Deliver the events waiting in batch hooks now instead of after their delay."""
+        self.__call_on_loop(self.__flush)
+
+    def __flush(self) -> None:
+        for dispatcher in self.__event_hooks.get_dispatchers():
+            if isinstance(dispatcher, AsyncBatchHookDispatcher):
+                dispatcher.flush()
+
+    async def __drain(self) -> None:
+        self.__flush()
+
+        for dispatcher in self.__event_hooks.get_dispatchers():
+            await dispatcher.join()
+
+    def close(self, timeout: float = SHUTDOWN_TIMEOUT) -> None:
+        # called once nothing pushes events anymore, and not from the loop itself.
+        # waits (up to timeout) for queued events to be handled, then stops the loop
+        if self.__loop.is_closed():
+            return
+
+        # late pushes must not wait on hooks that are about to stop
+        self.__is_closed = True
+        self.__has_room.set()
+
+        try:
+            asyncio.run_coroutine_threadsafe(self.__drain(), self.__loop).result(
+                timeout=timeout
+            )
+        except Exception:
+            pass
+        finally:
+            if self.__thread is not None:
+                self.__loop.call_soon_threadsafe(self.__loop.stop)
+                self.__thread.join(timeout=timeout)
+
+    def get_hook_stats(self) -> dict[str, dict[int, dict[str, int]]]:
+        return self.__event_hooks.stats()
+
+    def dump(self, dump_filename=DEFAULT_DUMP_FILENAME):
+        dump_events(self.history, dump_filename)
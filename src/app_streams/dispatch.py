@@ -0,0 +1,401 @@
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Executor
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+# What to do with a new event when a hook's queue is full
+BLOCK = "block"  # wait for the hook to catch up
+DROP_OLDEST = "drop-oldest"  # discard the oldest queued event to make room
+DROP_NEWEST = "drop-newest"  # discard the new event
+
+OVERFLOW_POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST)
+
+DEFAULT_MAX_QUEUE_SIZE = 1024
+
+DEFAULT_MAX_BATCH_SIZE = 256
+DEFAULT_MAX_BATCH_DELAY = 0.05  # seconds
+
+# a worker hands its executor thread back after this many events, so one busy hook
+# cannot occupy a worker forever
+MAX_EVENTS_PER_TASK = 64
+
+
+def get_hook_name(hook: Callable) -> str:
+    # label for stats and metrics, hooks registered as lambdas should be named explicitly
+    return getattr(hook, "__qualname__", None) or repr(hook)
+
+
+def get_next_item_index(
+    queue: deque, busy_keys: set, order_key: Callable[[any], any] | None
+) -> int | None:
+    """Index of the oldest queued item whose order key is not being handled, if any."""
+    if order_key is None:
+        return 0 if queue else None
+
+    for index, item in enumerate(queue):
+        if order_key(item) not in busy_keys:
+            return index
+
+    return None
+
+
+class HookDispatcher:
+    """
+    Bounded FIFO dispatch queue for a single event hook.
+
+    At most `concurrency` executor tasks run the hook at any time. With the default
+    of 1 the hook sees events one at a time, in the order they were pushed. With an
+    `order_key`, items with the same key are handed to the hook one at a time and in
+    order, while items with other keys take the remaining tasks; an item waiting for
+    its key holds no executor thread.
+    `on_hook_done` is called after every hook call with its duration and whether it failed.
+    """
+
+    def __init__(
+        self,
+        hook: Callable,
+        executor: Executor,
+        concurrency: int = 1,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+        overflow_policy: str = BLOCK,
+        name: str | None = None,
+        on_hook_done: Callable[[float, bool], None] | None = None,
+        order_key: Callable[[any], any] | None = None,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("Hook concurrency must be at least 1.")
+
+        if max_queue_size < 1:
+            raise ValueError("Hook queue size must be at least 1.")
+
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: '{overflow_policy}'.")
+
+        self.hook = hook
+        self.name = name or get_hook_name(hook)
+        self.concurrency = concurrency
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = overflow_policy
+        self.order_key = order_key
+
+        self.__executor = executor
+        self.__on_hook_done = on_hook_done
+        self.__condition = threading.Condition()
+        self.__queue = deque()
+        self.__active_workers = 0
+        self.__worker_threads: set[int] = set()
+        self.__busy_keys = set()  # order keys of the items being handled
+
+        self.dispatched = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def dispatch(self, item) -> bool:
+        """Queue an item for the hook. Returns False if it was dropped."""
+        with self.__condition:
+            if len(self.__queue) >= self.max_queue_size:
+                if self.overflow_policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+
+                if self.overflow_policy == DROP_OLDEST:
+                    self.__queue.popleft()
+                    self.dropped += 1
+                elif threading.get_ident() not in self.__worker_threads:
+                    # a hook pushing to itself is never blocked, it would wait on itself
+                    self.__condition.wait_for(
+                        lambda: len(self.__queue) < self.max_queue_size
+                    )
+
+            self.__queue.append(item)
+
+            is_starting_worker = self.__active_workers < self.concurrency
+
+            if is_starting_worker:
+                self.__active_workers += 1
+
+        if is_starting_worker:
+            self.__submit_worker()
+
+        return True
+
+    def __submit_worker(self) -> None:
+        try:
+            self.__executor.submit(self.__drain)
+        except RuntimeError:
+            # executor has been shut down (i.e. during shutdown). the hook may block, so
+            # it must not run in the pushing thread instead: the queue is dropped
+            with self.__condition:
+                self.dropped += len(self.__queue)
+                self.__queue.clear()
+                self.__active_workers -= 1
+                self.__condition.notify_all()
+
+    def __drain(self) -> None:
+        self.__worker_threads.add(threading.get_ident())
+
+        try:
+            for _ in range(MAX_EVENTS_PER_TASK):
+                with self.__condition:
+                    index = get_next_item_index(
+                        self.__queue, self.__busy_keys, self.order_key
+                    )
+
+                    if index is None:
+                        # anything left waits for a key whose worker picks it up next
+                        self.__active_workers -= 1
+                        self.__condition.notify_all()
+                        return
+
+                    item = self.__queue[index]
+                    del self.__queue[index]
+                    self.__condition.notify_all()
+
+                    if self.order_key is not None:
+                        key = self.order_key(item)
+                        self.__busy_keys.add(key)
+
+                try:
+                    self.__run_hook(item)
+                finally:
+                    if self.order_key is not None:
+                        with self.__condition:
+                            self.__busy_keys.discard(key)
+        finally:
+            self.__worker_threads.discard(threading.get_ident())
+
+        # still busy: yield the executor thread and continue in a fresh task
+        self.__submit_worker()
+
+    def __run_hook(self, item) -> None:
+        started_at = time.perf_counter()
+        is_failed = False
+
+        try:
+            self.hook(item)
+        except Exception:
+            is_failed = True
+            traceback.print_exc()
+        finally:
+            # several workers may run the hook at once
+            with self.__condition:
+                self.dispatched += 1
+
+                if is_failed:
+                    self.failed += 1
+
+        if self.__on_hook_done is not None:
+            self.__on_hook_done(time.perf_counter() - started_at, is_failed)
+
+    def join(self, timeout: float | None = None) -> bool:
+        """Wait until every queued item has been handled. Returns False on timeout."""
+        with self.__condition:
+            return self.__condition.wait_for(
+                lambda: not self.__queue and self.__active_workers == 0, timeout
+            )
+
+    def stats(self) -> dict[str, int]:
+        with self.__condition:
+            return {
+                "queue_depth": len(self.__queue),
+                "active_workers": self.__active_workers,
+                "dispatched": self.dispatched,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
+
+
+class BatchHookDispatcher:
+    """
+    Collects events for a hook that takes lists of events.
+
+    A batch is handed to the hook once it holds max_batch_size events, or max_delay
+    seconds after its first event, whichever comes first. Batches are delivered one at
+    a time and in order through a HookDispatcher, so its overflow policy counts batches.
+    A batch hook must not push events that it receives itself.
+    """
+
+    def __init__(
+        self,
+        hook: Callable,
+        executor: Executor,
+        flusher: "BatchFlusher",
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_delay: float = DEFAULT_MAX_BATCH_DELAY,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+        overflow_policy: str = BLOCK,
+        name: str | None = None,
+        on_hook_done: Callable[[float, bool], None] | None = None,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("Batch size must be at least 1.")
+
+        if max_delay < 0:
+            raise ValueError("Batch delay must not be negative.")
+
+        self.hook = hook
+        self.name = name or get_hook_name(hook)
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+
+        self.__flusher = flusher
+        self.__lock = threading.Lock()
+        self.__dispatch_lock = threading.Lock()  # held while taking and queueing batches
+        self.__batch = []
+        self.__deadline = None  # flush time of the current batch
+        self.__batches = HookDispatcher(
+            hook=hook,
+            executor=executor,
+            concurrency=1,
+            max_queue_size=max_queue_size,
+            overflow_policy=overflow_policy,
+            name=self.name,
+            on_hook_done=on_hook_done,
+        )
+
+        self.flushed_by_size = 0
+        self.flushed_by_delay = 0
+
+    def dispatch(self, item) -> bool:
+        with self.__lock:
+            self.__batch.append(item)
+            is_full = len(self.__batch) >= self.max_batch_size
+
+        if is_full:
+            return self.__flush_batches(now=None, is_forced=False)
+
+        self.__schedule_flush()
+
+        return True
+
+    def flush(self, now: float | None = None) -> None:
+        """Hand the pending events to the hook. With `now`, only if they are due."""
+        self.__flush_batches(now=now, is_forced=now is None)
+
+    def __flush_batches(self, now: float | None, is_forced: bool) -> bool:
+        """
+        Hand full batches, and the due or (`is_forced`) any pending batch, to the hook.
+
+        The events lock is only held to take a batch, so a hook queue that is full
+        under the BLOCK policy holds back whoever flushes, while other pushers keep
+        adding events. Batches are taken and queued under the dispatch lock, so they
+        reach the hook in order.
+        """
+        is_dispatched = True
+
+        with self.__dispatch_lock:
+            while True:
+                with self.__lock:
+                    is_due = (
+                        now is not None
+                        and self.__deadline is not None
+                        and self.__deadline <= now
+                    )
+
+                    if len(self.__batch) >= self.max_batch_size:
+                        self.flushed_by_size += 1
+                    elif not self.__batch or not (is_due or is_forced):
+                        break
+                    elif is_due:
+                        self.flushed_by_delay += 1
+
+                    batch = self.__take_batch()
+
+                is_dispatched = self.__batches.dispatch(batch) and is_dispatched
+
+        # events that came in while the hook queue was full start a new batch
+        self.__schedule_flush()
+
+        return is_dispatched
+
+    def __schedule_flush(self) -> None:
+        with self.__lock:
+            if not self.__batch or self.__deadline is not None:
+                return
+
+            self.__deadline = deadline = time.monotonic() + self.max_delay
+
+        self.__flusher.schedule(deadline, self)
+
+    def join(self, timeout: float | None = None) -> bool:
+        """Wait until every flushed batch has been handled. Returns False on timeout."""
+        return self.__batches.join(timeout)
+
+    def __take_batch(self) -> list:
+        batch = self.__batch[: self.max_batch_size]
+        del self.__batch[: self.max_batch_size]
+        self.__deadline = None
+
+        return batch
+
+    def stats(self) -> dict[str, int]:
+        with self.__lock:
+            pending_events = len(self.__batch)
+
+        return {
+            **self.__batches.stats(),
+            "pending_events": pending_events,
+            "flushed_by_size": self.flushed_by_size,
+            "flushed_by_delay": self.flushed_by_delay,
+        }
+
+
+class BatchFlusher:
+    """Single background thread that flushes batch hooks once their max delay is up."""
+
+    def __init__(self) -> None:
+        self.__condition = threading.Condition()
+        self.__deadlines: list[tuple[float, int, BatchHookDispatcher]] = []
+        self.__ids = itertools.count()  # tie breaker, dispatchers do not compare
+        self.__is_closed = False
+        self.__thread = None
+
+    def schedule(self, deadline: float, dispatcher: BatchHookDispatcher) -> None:
+        with self.__condition:
+            if self.__is_closed:
+                return
+
+            if self.__thread is None:
+                self.__thread = threading.Thread(
+                    target=self.__flush_periodically,
+                    name="event-batch-flusher",
+                    daemon=True,
+                )
+                self.__thread.start()
+
+            heapq.heappush(self.__deadlines, (deadline, next(self.__ids), dispatcher))
+
+            if self.__deadlines[0][2] is dispatcher:
+                self.__condition.notify()
+
+    def __flush_periodically(self) -> None:
+        while True:
+            with self.__condition:
+                while not self.__is_closed:
+                    now = time.monotonic()
+
+                    if self.__deadlines and self.__deadlines[0][0] <= now:
+                        break
+
+                    self.__condition.wait(
+                        self.__deadlines[0][0] - now if self.__deadlines else None
+                    )
+                else:
+                    return
+
+                _, _, dispatcher = heapq.heappop(self.__deadlines)
+
+            dispatcher.flush(now=now)
+
+    def close(self) -> None:
+        with self.__condition:
+            self.__is_closed = True
+            self.__deadlines.clear()
+            self.__condition.notify()
+
+        if self.__thread is not None:
+            self.__thread.join()
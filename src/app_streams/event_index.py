@@ -0,0 +1,176 @@
+from collections import deque
+import itertools
+import threading
+
+DEFAULT_INDEX_MAXSIZE = 10_000
+DEFAULT_BUCKET_SECONDS = 60.0
+
+
+def get_event_connection_id(event) -> int | None:
+    # user and agent messages carry the connection id as their data, system events
+    # about a connection carry it in a dict
+    if isinstance(event.data, int) and not isinstance(event.data, bool):
+        return event.data
+
+    if isinstance(event.data, dict):
+        return event.data.get("connection_id")
+
+    return None
+
+
+class EventIndex:
+    """
+    Secondary indexes over the most recent events, for queries without a full scan.
+
+    Events are indexed by type, message, connection id and wall-clock time bucket. Each
+    index maps a key to the positions of its events in push order, so the oldest event
+    is always at the front and evicting it is O(1).
+    """
+
+    def __init__(
+        self,
+        maxsize: int = DEFAULT_INDEX_MAXSIZE,
+        bucket_seconds: float = DEFAULT_BUCKET_SECONDS,
+    ) -> None:
+        self.maxsize = maxsize
+        self.bucket_seconds = bucket_seconds
+
+        self.__lock = threading.Lock()
+        self.__positions = itertools.count()
+        self.__events: dict[int, any] = {}
+        self.__order: deque[int] = deque()
+
+        self.__by_type: dict[str, deque[int]] = {}
+        self.__by_message: dict[str, deque[int]] = {}
+        self.__by_connection: dict[int, deque[int]] = {}
+        self.__by_bucket: dict[int, deque[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.__events)
+
+    def __iter_keys(self, event):
+        yield self.__by_type, event.type
+        yield self.__by_message, event.message
+
+        connection_id = get_event_connection_id(event)
+
+        if connection_id is not None:
+            yield self.__by_connection, connection_id
+
+        yield self.__by_bucket, self.__get_bucket(event.timestamp)
+
+    def __get_bucket(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds)
+
+    def add(self, event) -> None:
+        with self.__lock:
+            position = next(self.__positions)
+
+            self.__events[position] = event
+            self.__order.append(position)
+
+            for index, key in self.__iter_keys(event):
+                index.setdefault(key, deque()).append(position)
+
+            if len(self.__order) > self.maxsize:
+                self.__evict_oldest()
+
+    def __evict_oldest(self) -> None:
+        position = self.__order.popleft()
+        event = self.__events.pop(position)
+
+        for index, key in self.__iter_keys(event):
+            positions = index[key]
+            positions.popleft()
+
+            if not positions:
+                del index[key]
+
+    def query(
+        self,
+        event_type: str | None = None,
+        message: str | None = None,
+        connection_id: int | None = None,
+        since: float | None = None,
+        until: float | None = None,
+        limit: int | None = None,
+    ) -> list:
+        """
+        Events matching every given filter, oldest first. `since` and `until` are
+        timestamps; with a limit only the most recent matches are returned.
+        """
+        with self.__lock:
+            candidates = self.__get_candidates(event_type, message, connection_id)
+
+            if since is not None or until is not None:
+                time_candidates = self.__get_time_candidates(since, until)
+
+                if candidates is None or len(time_candidates) < len(candidates):
+                    candidates = time_candidates
+
+            if candidates is None:
+                candidates = self.__order
+
+            matches = []
+
+            # newest first, so a limit can stop the scan early
+            for position in reversed(candidates):
+                event = self.__events[position]
+
+                if (
+                    (event_type is None or event.type == event_type)
+                    and (message is None or event.message == message)
+                    and (
+                        connection_id is None
+                        or get_event_connection_id(event) == connection_id
+                    )
+                    and (since is None or event.timestamp >= since)
+                    and (until is None or event.timestamp <= until)
+                ):
+                    matches.append(event)
+
+                    if limit is not None and len(matches) >= limit:
+                        break
+
+        matches.reverse()
+
+        return matches
+
+    def __get_candidates(
+        self, event_type: str | None, message: str | None, connection_id: int | None
+    ) -> deque[int] | None:
+        # the smallest of the exact-match indexes, or None if there is no such filter
+        candidates = None
+
+        for index, key in (
+            (self.__by_type, event_type),
+            (self.__by_message, message),
+            (self.__by_connection, connection_id),
+        ):
+            if key is None:
+                continue
+
+            positions = index.get(key, ())
+
+            if candidates is None or len(positions) < len(candidates):
+                candidates = positions
+
+        return candidates
+
+    def __get_time_candidates(
+        self, since: float | None, until: float | None
+    ) -> list[int]:
+        first_bucket = None if since is None else self.__get_bucket(since)
+        last_bucket = None if until is None else self.__get_bucket(until)
+
+        buckets = sorted(
+            bucket
+            for bucket in self.__by_bucket
+            if (first_bucket is None or bucket >= first_bucket)
+            and (last_bucket is None or bucket <= last_bucket)
+        )
+
+        # events are pushed roughly, not strictly, in timestamp order
+        return sorted(
+            position for bucket in buckets for position in self.__by_bucket[bucket]
+        )
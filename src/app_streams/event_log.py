@@ -0,0 +1,367 @@
+from collections import deque
+from collections.abc import Iterator
+import glob
+import itertools
+import json
+import mmap
+import os
+import threading
+import time
+import traceback
+from typing import NamedTuple
+
+DEFAULT_EVENT_LOG_DIR = "temp/event_log"
+DEFAULT_SEGMENT_MAX_BYTES = 8 * 1024 * 1024  # 8 MiB
+DEFAULT_SEGMENT_MAX_AGE = 60 * 60.0  # 1 hour
+DEFAULT_RETAINED_SEGMENTS = 16
+
+SEGMENT_SUFFIX = ".jsonl"
+
+
+class EventLogSettings(NamedTuple):
+    directory: str = DEFAULT_EVENT_LOG_DIR
+    segment_max_bytes: int = DEFAULT_SEGMENT_MAX_BYTES  # rotate once a segment grows past this
+    segment_max_age: float = DEFAULT_SEGMENT_MAX_AGE  # rotate segments older than this (seconds)
+    retained_segments: int = DEFAULT_RETAINED_SEGMENTS  # delete the oldest segments beyond this
+    fsync: bool = True  # fsync every group commit, otherwise only flush to the os
+
+
+def event_to_record(event, seq: int) -> dict[str, any]:
+    return {"seq": seq, "event": event.__class__.__name__, **event.as_dict()}
+
+
+class SegmentedEventLog:
+    """
+    Append-only event log, stored as a directory of JSON-lines segments.
+
+    `append` only queues the event. A background writer takes everything queued since
+    its last write, writes it in one go and fsyncs once (group commit), so pushing
+    events never waits for the disk. Segments are named after the sequence number of
+    their first record and rotated by size and age; only the newest are retained.
+
+    Old segments are read through mmap. On startup partially written or unreadable last
+    lines (left by a crash) are cut off and numbering continues after the last record
+    that parses. A failed write or fsync is cut off the same way and its records are
+    not counted as committed.
+    """
+
+    def __init__(self, settings: EventLogSettings = EventLogSettings()) -> None:
+        if settings.segment_max_bytes < 1 or settings.retained_segments < 1:
+            raise ValueError("Event log segments need a positive size and count.")
+
+        self.settings = settings
+
+        self.__condition = threading.Condition()
+        self.__pending: deque[tuple[int, any]] = deque()
+        self.__is_closed = False
+
+        self.__segment_file = None
+        self.__segment_path = None
+        self.__segment_opened_at = 0.0
+        self.__segment_size = 0  # bytes written to the active segment
+        self.__synced_size = 0  # bytes of committed records in the active segment
+
+        self.__appended = 0
+        self.__committed = 0
+        self.__commits = 0
+        self.__bytes_written = 0
+        self.__write_errors = 0
+
+        os.makedirs(settings.directory, exist_ok=True)
+        self.__next_seq = self.__recover() + 1
+        self.__committed_seq = self.__next_seq - 1  # last record written
+        self.__handled_seq = self.__committed_seq  # last record written or failed
+
+        self.__writer = threading.Thread(
+            target=self.__write_periodically, name="event-log-writer", daemon=True
+        )
+        self.__writer.start()
+
+    def append(self, event) -> int:
+        """Queue an event for writing and return its sequence number."""
+        return self.append_batch([event])
+
+    def append_batch(self, events: list) -> int:
+        """Queue events for writing, in order, and return the last sequence number."""
+        with self.__condition:
+            if self.__is_closed:
+                raise ValueError("Event log is closed.")
+
+            first_seq = self.__next_seq
+            self.__next_seq += len(events)
+            self.__appended += len(events)
+
+            self.__pending.extend(zip(itertools.count(first_seq), events))
+            self.__condition.notify_all()
+
+        return first_seq + len(events) - 1
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until everything appended so far is committed or failed to write."""
+        with self.__condition:
+            target_seq = self.__next_seq - 1
+
+            return self.__condition.wait_for(
+                lambda: self.__handled_seq >= target_seq
+                or not self.__writer.is_alive(),
+                timeout=timeout,
+            )
+
+    def close(self) -> None:
+        with self.__condition:
+            self.__is_closed = True
+            self.__condition.notify_all()
+
+        self.__writer.join()
+
+    def get_segment_paths(self) -> list[str]:
+        return get_segment_paths(self.settings.directory)
+
+    def read(self, since_seq: int = 0) -> Iterator[dict[str, any]]:
+        """Yield committed records with seq >= since_seq, oldest first."""
+        with self.__condition:
+            active_path = self.__segment_path
+            active_size = self.__synced_size
+
+        paths = self.get_segment_paths()
+
+        for index, path in enumerate(paths):
+            # skip segments that end before since_seq
+            if (
+                index + 1 < len(paths)
+                and get_segment_first_seq(paths[index + 1]) <= since_seq
+            ):
+                continue
+
+            size = active_size if path == active_path else None
+
+            for record in read_segment(path, size):
+                if record["seq"] >= since_seq:
+                    yield record
+
+    def stats(self) -> dict[str, int]:
+        with self.__condition:
+            return {
+                "appended": self.__appended,
+                "committed": self.__committed,
+                "pending": len(self.__pending),
+                "commits": self.__commits,
+                "bytes_written": self.__bytes_written,
+                "write_errors": self.__write_errors,
+                "last_seq": self.__next_seq - 1,
+            }
+
+    def __recover(self) -> int:
+        """Repair the newest segment and return the last sequence number on disk."""
+        for path in reversed(self.get_segment_paths()):
+            last_seq = None
+
+            with open(path, "r+b") as f:
+                data = f.read()
+                end = data.rfind(b"\n") + 1
+
+                # a torn write from a crash, or complete lines that do not parse
+                while end > 0:
+                    start = data.rfind(b"\n", 0, end - 1) + 1
+
+                    try:
+                        last_seq = json.loads(data[start:end])["seq"]
+                        break
+                    except (ValueError, KeyError, TypeError):
+                        end = start
+
+                if end < len(data):
+                    f.truncate(end)
+
+            if last_seq is None:
+                os.remove(path)
+                continue
+
+            return last_seq
+
+        return 0
+
+    def __write_periodically(self) -> None:
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(lambda: self.__pending or self.__is_closed)
+
+                if not self.__pending:
+                    break
+
+                batch = list(self.__pending)
+                self.__pending.clear()
+
+            self.__commit(batch)
+
+        self.__close_segment()
+
+    def __commit(self, batch: list[tuple[int, any]]) -> None:
+        written = 0  # records committed so far
+
+        try:
+            lines = [
+                json.dumps(
+                    event_to_record(event, seq), default=repr, ensure_ascii=False
+                ).encode()
+                + b"\n"
+                for seq, event in batch
+            ]
+
+            while written < len(lines):
+                self.__rotate_if_needed(first_seq=batch[written][0])
+
+                # fill the active segment up to its size limit, with at least one record
+                end = written + 1
+                size = len(lines[written])
+                room = self.settings.segment_max_bytes - self.__segment_size
+
+                while end < len(lines) and size + len(lines[end]) <= room:
+                    size += len(lines[end])
+                    end += 1
+
+                self.__write(b"".join(lines[written:end]))
+
+                with self.__condition:
+                    self.__segment_size += size
+                    self.__bytes_written += size
+
+                # records only count once they are on disk, anything left over goes
+                # to a new segment
+                self.__sync()
+
+                with self.__condition:
+                    self.__committed += end - written
+                    self.__committed_seq = batch[end - 1][0]
+
+                written = end
+        except Exception:
+            traceback.print_exc()
+            self.__discard_failed_write()
+
+            with self.__condition:
+                self.__write_errors += 1
+
+        with self.__condition:
+            self.__commits += 1
+            self.__handled_seq = batch[-1][0]
+            self.__condition.notify_all()
+
+    def __sync(self) -> None:
+        if self.settings.fsync:
+            os.fsync(self.__segment_file.fileno())
+
+        with self.__condition:
+            self.__synced_size = self.__segment_size
+
+    def __write(self, data: bytes) -> None:
+        # the segment is unbuffered, so nothing of a failed write is flushed later
+        view = memoryview(data)
+
+        while view:
+            view = view[self.__segment_file.write(view) :]
+
+    def __discard_failed_write(self) -> None:
+        """Cut the active segment back to its last committed record."""
+        if self.__segment_file is None:
+            return
+
+        try:
+            os.ftruncate(self.__segment_file.fileno(), self.__synced_size)
+
+            with self.__condition:
+                self.__segment_size = self.__synced_size
+        except OSError:
+            traceback.print_exc()
+
+            # never append after a partial line, continue in a new segment instead
+            segment_file = self.__segment_file
+
+            with self.__condition:
+                self.__segment_file = None
+                self.__segment_path = None
+
+            segment_file.close()
+
+    def __rotate_if_needed(self, first_seq: int) -> None:
+        segment_age = time.monotonic() - self.__segment_opened_at
+
+        if self.__segment_file is not None and (
+            self.__segment_size >= self.settings.segment_max_bytes
+            or segment_age >= self.settings.segment_max_age
+        ):
+            self.__close_segment()
+
+        if self.__segment_file is None:
+            path = os.path.join(
+                self.settings.directory, f"{first_seq:020d}{SEGMENT_SUFFIX}"
+            )
+            segment_file = open(path, "ab", buffering=0)
+
+            with self.__condition:
+                self.__segment_file = segment_file
+                self.__segment_path = path
+                self.__segment_opened_at = time.monotonic()
+                self.__segment_size = 0
+                self.__synced_size = 0
+
+            self.__apply_retention()
+
+    def __close_segment(self) -> None:
+        if self.__segment_file is None:
+            return
+
+        if self.settings.fsync:
+            os.fsync(self.__segment_file.fileno())
+
+        self.__segment_file.close()
+
+        with self.__condition:
+            self.__segment_file = None
+            self.__segment_path = None
+
+    def __apply_retention(self) -> None:
+        paths = self.get_segment_paths()
+
+        for path in paths[: max(0, len(paths) - self.settings.retained_segments)]:
+            try:
+                os.remove(path)
+            except OSError:
+                # still mapped by a reader (windows), retried on the next rotation
+                pass
+
+
+def get_segment_paths(directory: str) -> list[str]:
+    # oldest first, segment names sort by the seq of their first record
+    return sorted(glob.glob(os.path.join(directory, "*" + SEGMENT_SUFFIX)))
+
+
+def get_segment_first_seq(path: str) -> int:
+    return int(os.path.basename(path)[: -len(SEGMENT_SUFFIX)])
+
+
+def read_segment(path: str, size: int | None = None) -> Iterator[dict[str, any]]:
+    """Yield the complete records of one segment, reading at most `size` bytes."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        # removed by retention in the meantime
+        return
+
+    with f:
+        size = os.fstat(f.fileno()).st_size if size is None else size
+
+        if size == 0:
+            return
+
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as view:
+            start = 0
+
+            while start < size:
+                end = view.find(b"\n", start, size)
+
+                if end == -1:
+                    break
+
+                yield json.loads(view[start:end])
+                start = end + 1
@@ -1,60 +1,153 @@
 from collections import deque
 from collections.abc import Callable
 from datetime import datetime as dt
+from enum import Enum
 import os
+import threading
+import time
 from typing import Dict
-from concurrent.futures import ThreadPoolExecutor
-
-# All system event messages
-CORE_SYS_START = (
-    "Starting core systems..."  # data: {"active_services": {[system_name]: bool}}
+from concurrent.futures import Executor
+
+from app_streams.dispatch import (
+    BLOCK,
+    DEFAULT_MAX_BATCH_DELAY,
+    DEFAULT_MAX_BATCH_SIZE,
+    DEFAULT_MAX_QUEUE_SIZE,
+    BatchFlusher,
+    BatchHookDispatcher,
+    HookDispatcher,
+    get_hook_name,
 )
-CORE_SYS_FINISH = "Finished starting core systems."  # data: {"active_services": {[system_name]: bool}}
-USR_REQ_SHUTDN = "System shutdown requested by user."  # data: None
+from app_streams.event_index import EventIndex
+from app_streams.event_log import SegmentedEventLog
+from app_streams.metrics import MetricsRegistry
 
-COMMS_START = (
-    "Starting comms server..."  # data: {"server_hostname": str, "server_port": int}
-)
-COMMS_ONLINE = (
-    "Comms server online."  # data: {"server_hostname": str, "server_port": int},
-)
-COMMS_OFFLINE = "Unable to start comms server."  # data: {"error": Exception}
 
-USR_CONN_OK = "User connected to comms system."  # data: {"connection_id": int}
-USR_DISCONN_OK = "User disconnected from comms system."  # data: {"connection_id": int}
-USR_DISCONN_ABT = "User disconnected from comms system. Connection aborted."  # data: {}
+class EventMessage(str, Enum):
+    """
+    All system event messages.
 
-SYS_SPEAK_OK = "System completed speaking."  # data: str
-SYS_SPEAK_ERR = (
-    "System unable to speak."  # data: {"text_content": str, "error": Exception}
-)
+    Members are interned singletons that compare and hash like their text, so they can
+    be used anywhere a plain string message is expected.
+    """
+
+    CORE_SYS_START = "Starting core systems..."  # data: {"active_services": {[system_name]: bool}}
+    CORE_SYS_FINISH = "Finished starting core systems."  # data: {"active_services": {[system_name]: bool}}
+    USR_REQ_SHUTDN = "System shutdown requested by user."  # data: None
+
+    COMMS_START = "Starting comms server..."  # data: {"server_hostname": str, "server_port": int}
+    COMMS_ONLINE = "Comms server online."  # data: {"server_hostname": str, "server_port": int}
+    COMMS_OFFLINE = "Unable to start comms server."  # data: {"error": Exception}
+    COMMS_UNIX_ONLINE = "Comms server listening on unix socket."  # data: {"unix_socket_path": str}
+    COMMS_UNIX_OFFLINE = "Unable to listen on unix socket."  # data: {"unix_socket_path": str, "error": Exception}
+
+    USR_CONN_OK = "User connected to comms system."  # data: {"connection_id": int}
+    USR_DISCONN_OK = "User disconnected from comms system."  # data: {"connection_id": int}
+    USR_DISCONN_ABT = "User disconnected from comms system. Connection aborted."  # data: {}
+    USR_CONN_EVICTED = "User connection evicted from comms system."  # data: {"connection_id": int, "reason": str}
+
+    SYS_SPEAK_OK = "System completed speaking."  # data: str
+    SYS_SPEAK_ERR = "System unable to speak."  # data: {"text_content": str, "error": Exception}
+
+    LLM_START = "Starting LLM server..."  # data: {"server_url": str}
+    LLM_ONLINE = "LLM server online."  # data: {"server_url": str}
+    LLM_OFFLINE = "Unable to start LLM server."  # data: {"error": Exception}
 
-LLM_START = "Starting LLM server..."  # data: {"server_url": str}
-LLM_ONLINE = "LLM server online."  # data: {"server_url": str}
-LLM_OFFLINE = "Unable to start LLM server."  # data: {"error": Exception}
+    AGENT_ONLINE = "Agent online."  # data: {"ollama_url": str, "session_id": str}
+    AGENT_OFFLINE = "Agent offline."  # data: {"error": Exception}
+    AGENT_MODEL_LOAD_START = "Loading agent model..."  # data: {"model": str, "keep_alive": int | float | str}
+    AGENT_MODEL_LOAD_OK = "Agent model loaded."  # data: {"model": str, "duration": float, "load_duration": float}
+    AGENT_MODEL_LOAD_ERR = "Unable to load agent model."  # data: {"model": str, "error": Exception}
 
-AGENT_ONLINE = "Agent online."  # data: {"ollama_url": str, "session_id": str}
-AGENT_OFFLINE = "Agent offline."  # data: {"error": Exception}
+    # print and format as the message text, not as "EventMessage.NAME"
+    __str__ = str.__str__
+    __format__ = str.__format__
+
+
+CORE_SYS_START = EventMessage.CORE_SYS_START
+CORE_SYS_FINISH = EventMessage.CORE_SYS_FINISH
+USR_REQ_SHUTDN = EventMessage.USR_REQ_SHUTDN
+
+COMMS_START = EventMessage.COMMS_START
+COMMS_ONLINE = EventMessage.COMMS_ONLINE
+COMMS_OFFLINE = EventMessage.COMMS_OFFLINE
+COMMS_UNIX_ONLINE = EventMessage.COMMS_UNIX_ONLINE
+COMMS_UNIX_OFFLINE = EventMessage.COMMS_UNIX_OFFLINE
+
+USR_CONN_OK = EventMessage.USR_CONN_OK
+USR_DISCONN_OK = EventMessage.USR_DISCONN_OK
+USR_DISCONN_ABT = EventMessage.USR_DISCONN_ABT
+USR_CONN_EVICTED = EventMessage.USR_CONN_EVICTED
+
+SYS_SPEAK_OK = EventMessage.SYS_SPEAK_OK
+SYS_SPEAK_ERR = EventMessage.SYS_SPEAK_ERR
+
+LLM_START = EventMessage.LLM_START
+LLM_ONLINE = EventMessage.LLM_ONLINE
+LLM_OFFLINE = EventMessage.LLM_OFFLINE
+
+AGENT_ONLINE = EventMessage.AGENT_ONLINE
+AGENT_OFFLINE = EventMessage.AGENT_OFFLINE
+AGENT_MODEL_LOAD_START = EventMessage.AGENT_MODEL_LOAD_START
+AGENT_MODEL_LOAD_OK = EventMessage.AGENT_MODEL_LOAD_OK
+AGENT_MODEL_LOAD_ERR = EventMessage.AGENT_MODEL_LOAD_ERR
+
+SHUTDOWN_TIMEOUT = 5.0  # seconds close() waits for queued events
 
 
 class AppEvent:
+    __slots__ = (
+        "__type",
+        "message",
+        "data",
+        "timestamp",
+        "monotonic",
+        "__formatted",
+        "__weakref__",
+    )
+
     def __init__(self, type: str, message: str, data: any = None) -> None:
-        if not message:
-            raise ValueError("No message provided for AppEvent.")
+        # system messages are validated once, when the enum is created
+        if not isinstance(message, EventMessage):
+            if not message:
+                raise ValueError("No message provided for AppEvent.")
 
-        if len(message.strip()) == 0:
-            raise ValueError("Event message is empty.")
+            if message.isspace():
+                raise ValueError("Event message is empty.")
 
-        self.type = type
+        self.__type = type
         self.message = message
         self.data = data
-        self.timestamp = dt.now().timestamp()
+        # wall clock, for display and time range queries. stored, not derived from the
+        # monotonic clock, which stops during suspend and ignores clock changes
+        self.timestamp = time.time()
+        self.monotonic = time.monotonic()  # for measuring durations between events
+        self.__formatted = None
+
+    @property
+    def type(self) -> str:
+        # subclasses shadow this with a class attribute
+        return self.__type
 
     def __str__(self) -> str:
-        return f"<{self.__class__.__name__} created_on=({dt.fromtimestamp(self.timestamp).isoformat()}) type=('{self.type}') message=('{self.message}') data=({repr(self.data)})>"
+        # formatted on first use only, most events are never printed
+        if self.__formatted is None:
+            self.__formatted = f"<{self.__class__.__name__} created_on=({dt.fromtimestamp(self.timestamp).isoformat()}) type=('{self.type}') message=('{self.message}') data=({repr(self.data)})>"
+
+        return self.__formatted
+
+    def as_dict(self) -> dict[str, any]:
+        return {
+            "type": self.type,
+            "message": self.message,
+            "data": self.data,
+            "timestamp": self.timestamp,
+            "monotonic": self.monotonic,
+        }
 
 
 class SystemEvent(AppEvent):
+    __slots__ = ()
     type = "system"
 
     def __init__(self, message: str, data: any = None) -> None:
@@ -62,51 +155,207 @@ class SystemEvent(AppEvent):
 
 
 class UserMessageEvent(AppEvent):
+    __slots__ = ("request_id",)
     type = "user"
 
-    def __init__(self, message: str, connection_id: int) -> None:
+    def __init__(self, message: str, connection_id: int, request_id: int = 0) -> None:
         super().__init__(self.type, message, connection_id)
+        self.request_id = request_id  # echoed back on the reply
+
+    def as_dict(self) -> dict[str, any]:
+        return {**super().as_dict(), "request_id": self.request_id}
 
 
 class AgentMessageEvent(AppEvent):
+    __slots__ = ("request_id", "route")
     type = "assistant"
 
-    def __init__(self, message: str, data: any = None) -> None:
+    def __init__(
+        self,
+        message: str,
+        data: any = None,
+        request_id: int = 0,
+        route: dict[str, any] | None = None,
+    ) -> None:
         super().__init__(self.type, message, data)
+        self.request_id = request_id  # of the user message answered
+        self.route = route  # how it was answered, see llm.agent.router.RouteReport
+
+    def as_dict(self) -> dict[str, any]:
+        return {**super().as_dict(), "request_id": self.request_id, "route": self.route}
+
+
+class EventHookTable:
+    """
+    Dispatchers of an event stream's hooks, by event type and hook id.
+
+    Copy-on-write: the table and its inner dicts are never mutated once published, so
+    pushers can read them without locking while hooks are added or removed.
+    """
+
+    def __init__(self) -> None:
+        self.__event_hooks: Dict[str, Dict[int, any]] = {"all": {}}
+        self.__lock = threading.Lock()
+
+    def get(self) -> dict[str, dict[int, any]]:
+        return self.__event_hooks
+
+    def get_dispatchers(self) -> list:
+        return [
+            dispatcher
+            for event_hooks_for_type in self.__event_hooks.values()
+            for dispatcher in event_hooks_for_type.values()
+        ]
+
+    def iter_dispatchers_for_event(self, event_type: str):
+        # hooks registered for the type, then those registered for "all" events
+        event_hooks = self.__event_hooks
+
+        yield from event_hooks.get(event_type, {}).values()
+        yield from event_hooks.get("all", {}).values()
+
+    def add(self, event_type: str, event_hook_id: int, dispatcher) -> int:
+        with self.__lock:
+            event_hooks_for_type = self.__event_hooks.get(event_type, {})
+
+            if event_hook_id in event_hooks_for_type:
+                raise ValueError(
+                    f"Event hook with id {event_hook_id} already exists for event type '{event_type}'."
+                )
+
+            self.__event_hooks = {
+                **self.__event_hooks,
+                event_type: {**event_hooks_for_type, event_hook_id: dispatcher},
+            }
+
+        return event_hook_id
+
+    def remove(self, event_type: str, event_hook_id: int):
+        """Unregister a hook and return its dispatcher."""
+        with self.__lock:
+            event_hooks_for_type = self.__event_hooks.get(event_type, {})
+
+            if event_hook_id not in event_hooks_for_type:
+                raise ValueError(
+                    f"Event hook with id {event_hook_id} does not exist for event type '{event_type}'."
+                )
+
+            self.__event_hooks = {
+                **self.__event_hooks,
+                event_type: {
+                    hook_id: dispatcher
+                    for hook_id, dispatcher in event_hooks_for_type.items()
+                    if hook_id != event_hook_id
+                },
+            }
+
+        return event_hooks_for_type[event_hook_id]
+
+    def stats(self) -> dict[str, dict[int, dict[str, int]]]:
+        return {
+            event_type: {
+                hook_id: dispatcher.stats()
+                for hook_id, dispatcher in event_hooks_for_type.items()
+            }
+            for event_type, event_hooks_for_type in self.__event_hooks.items()
+        }
+
+
+def dump_events(events, dump_filename: str) -> None:
+    os.makedirs(os.path.dirname(dump_filename), exist_ok=True)
+    with open(dump_filename, "w") as f:
+        f.writelines([str(event) + "\n" for event in events])
+
+
+class EventStreamMetrics:
+    """
+    Metrics of an event stream: events pushed per type, and duration, failures, queue
+    depth and drops per hook. `get_event_hooks` returns the stream's hook table.
+    """
+
+    def __init__(
+        self,
+        metrics: MetricsRegistry,
+        get_event_hooks: Callable[[], dict[str, dict[int, any]]],
+    ) -> None:
+        self.__get_event_hooks = get_event_hooks
+
+        self.events_pushed = metrics.counter(
+            "yoda_events_pushed_total", "Events pushed to the event stream.", ("type",)
+        )
+        self.hook_duration = metrics.histogram(
+            "yoda_hook_duration_seconds",
+            "Time spent in an event hook per call (per batch for batch hooks).",
+            ("event_type", "hook"),
+        )
+        self.hook_failures = metrics.counter(
+            "yoda_hook_failures_total",
+            "Event hook calls that raised an exception.",
+            ("event_type", "hook"),
+        )
+        metrics.gauge(
+            "yoda_hook_queue_depth",
+            "Events (batches for batch hooks) waiting in an event hook's queue.",
+            ("event_type", "hook"),
+            collect=lambda: self.__collect_hook_stat("queue_depth"),
+        )
+        metrics.counter(
+            "yoda_hook_dropped_total",
+            "Events dropped by the overflow policy of an event hook's queue.",
+            ("event_type", "hook"),
+            collect=lambda: self.__collect_hook_stat("dropped"),
+        )
+
+    def __collect_hook_stat(self, stat: str) -> dict[tuple, int]:
+        return {
+            (event_type, dispatcher.name): dispatcher.stats()[stat]
+            for event_type, event_hooks_for_type in self.__get_event_hooks().items()
+            for dispatcher in event_hooks_for_type.values()
+        }
+
+    def get_hook_observer(
+        self, event_type: str, name: str
+    ) -> Callable[[float, bool], None]:
+        def on_hook_done(duration: float, is_failed: bool) -> None:
+            self.hook_duration.observe(duration, event_type=event_type, hook=name)
+
+            if is_failed:
+                self.hook_failures.inc(event_type=event_type, hook=name)
+
+        return on_hook_done
 
 
 class AppEventStream:
     DEFAULT_DUMP_FILENAME = "temp/AppEventStream_history.log"
+    DEFAULT_HISTORY_MAXSIZE = 1024
+    EVENT_LOG_BATCH_DELAY = 0.01  # seconds an event may wait before it goes to the log
 
     def __init__(
-        self, thread_pool_executor: ThreadPoolExecutor, history_maxsize=None
+        self,
+        thread_pool_executor: Executor,
+        history_maxsize=DEFAULT_HISTORY_MAXSIZE,
+        event_log: SegmentedEventLog | None = None,
+        metrics: MetricsRegistry | None = None,
     ) -> None:
-        self.__event_hooks: Dict[str, Dict[int, Callable[[AppEvent], None]]] = dict(
-            {"all": dict()}
-        )
+        self.__event_hooks = EventHookTable()
         self.__executor = thread_pool_executor
-        self.history = deque(maxlen=history_maxsize)
-
-    # If you truly know that:
-    #
-    # add_event_hook / remove_event_hook and push are only ever
-    # called from a single thread (or at least not concurrently),
-    # and
-    #
-    # The only concurrency in your system is from the threads
-    # that the executor itself runs after a push call is complete,
-    #
-    # ...then you don’t need a Lock around the dict. Python dicts
-    # are safe for concurrent reads, but not for concurrent
-    # reads+mutations. So the moment you ever think about
-    # adding/removing hooks from one thread while another is
-    # pushing, you need a lock. But if your design contract is
-    # "hook set mutations happen synchronously on the main thread
-    # only," then it’s fine as-is.
-
-    def __iter_hooks_for_event(self, event_type: str):
-        yield from self.__event_hooks.get(event_type, {}).values()
-        yield from self.__event_hooks.get("all", {}).values()
+        self.__batch_flusher = BatchFlusher()
+        self.event_log = event_log  # full, durable history
+        self.history = deque(maxlen=history_maxsize)  # recent events only
+        self.index = EventIndex()  # queryable window of recent events
+
+        # shared with the services, so that everything is reported in one place
+        self.metrics = metrics or MetricsRegistry()
+        self.__stream_metrics = EventStreamMetrics(self.metrics, self.__event_hooks.get)
+        self.__events_pushed = self.__stream_metrics.events_pushed
+
+        if self.event_log is not None:
+            self.add_batch_event_hook(
+                event_type="all",
+                event_hook=self.event_log.append_batch,
+                max_delay=self.EVENT_LOG_BATCH_DELAY,
+                name="event_log",
+            )
 
     def push(self, event) -> None:
         if not isinstance(event, AppEvent):
@@ -116,38 +365,118 @@ class AppEventStream:
 
         # send the event to all hooks registered for that event type
         # also send the event to all the hooks registered for 'all' events
-        for event_hook in self.__iter_hooks_for_event(event.type):
-            self.__executor.submit(event_hook, event)
+        for dispatcher in self.__event_hooks.iter_dispatchers_for_event(event.type):
+            dispatcher.dispatch(event)
 
+        self.__events_pushed.inc(type=event.type)
         self.history.append(event)
+        self.index.add(event)
 
     def add_event_hook(
-        self, event_type: str, event_hook: Callable[[AppEvent], None]
+        self,
+        event_type: str,
+        event_hook: Callable[[AppEvent], None],
+        concurrency: int = 1,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+        overflow_policy: str = BLOCK,
+        executor: Executor | None = None,
+        name: str | None = None,
+        order_key: Callable[[AppEvent], any] | None = None,
     ) -> int:
+        """
+        Register a hook with its own FIFO dispatch queue. With the default concurrency
+        of 1 the hook receives events one at a time and in order. With `order_key`,
+        only events with the same key are handled one at a time and in order. Hooks
+        that block for long (e.g. on the agent) can run on their own executor instead
+        of the stream's. `name` labels the hook in metrics, it defaults to the hook's
+        qualified name.
+        """
         event_hook_id = hash(event_hook)
+        name = name or get_hook_name(event_hook)
+
+        dispatcher = HookDispatcher(
+            hook=event_hook,
+            executor=executor or self.__executor,
+            concurrency=concurrency,
+            max_queue_size=max_queue_size,
+            overflow_policy=overflow_policy,
+            name=name,
+            on_hook_done=self.__stream_metrics.get_hook_observer(event_type, name),
+            order_key=order_key,
+        )
 
-        event_hooks_for_type = self.__event_hooks.setdefault(event_type, dict())
+        return self.__event_hooks.add(event_type, event_hook_id, dispatcher)
+
+    def add_batch_event_hook(
+        self,
+        event_type: str,
+        event_hook: Callable[[list[AppEvent]], None],
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_delay: float = DEFAULT_MAX_BATCH_DELAY,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+        overflow_policy: str = BLOCK,
+        executor: Executor | None = None,
+        name: str | None = None,
+    ) -> int:
+        """
+        Register a hook that receives lists of events, in order, for sinks that work
+        better in bulk (logs, metrics). A batch is delivered once it is full or
+        max_delay seconds after its first event. The queue size counts batches.
+        """
+        event_hook_id = hash(event_hook)
+        name = name or get_hook_name(event_hook)
+
+        dispatcher = BatchHookDispatcher(
+            hook=event_hook,
+            executor=executor or self.__executor,
+            flusher=self.__batch_flusher,
+            max_batch_size=max_batch_size,
+            max_delay=max_delay,
+            max_queue_size=max_queue_size,
+            overflow_policy=overflow_policy,
+            name=name,
+            on_hook_done=self.__stream_metrics.get_hook_observer(event_type, name),
+        )
 
-        if event_hook_id in event_hooks_for_type:
-            raise ValueError(
-                f"Event hook with id {event_hook_id} already exists for event type '{event_type}'."
-            )
+        return self.__event_hooks.add(event_type, event_hook_id, dispatcher)
 
-        event_hooks_for_type[event_hook_id] = event_hook
+    def remove_event_hook(self, event_type: str, event_hook_id: int) -> None:
+        # events already queued for the hook are still delivered
+        removed_dispatcher = self.__event_hooks.remove(event_type, event_hook_id)
 
-        return event_hook_id
+        if isinstance(removed_dispatcher, BatchHookDispatcher):
+            removed_dispatcher.flush()
 
-    def remove_event_hook(self, event_type: str, event_hook_id: int) -> None:
-        event_hooks_for_type = self.__event_hooks.setdefault(event_type, dict())
+    def flush(self) -> None:
+        """Deliver the events waiting in batch hooks now instead of after their delay."""
+        for dispatcher in self.__event_hooks.get_dispatchers():
+            if isinstance(dispatcher, BatchHookDispatcher):
+                dispatcher.flush()
 
-        if event_hook_id not in event_hooks_for_type:
-            raise ValueError(
-                f"Event hook with id {event_hook_id} does not exist for event type '{event_type}'."
-            )
+    def close(self, timeout: float = SHUTDOWN_TIMEOUT) -> None:
+        # called once only the hooks themselves push events, while the executors they
+        # run on are still up. waits (up to timeout) for queued events to be handled
+        self.__batch_flusher.close()
+
+        deadline = time.monotonic() + timeout
+        dispatchers = self.__event_hooks.get_dispatchers()
+
+        # hooks may push events to hooks that are already idle, so wait until all of
+        # them are idle at once
+        while True:
+            self.flush()
+            busy_dispatchers = [
+                dispatcher for dispatcher in dispatchers if not dispatcher.join(timeout=0)
+            ]
+            remaining = deadline - time.monotonic()
+
+            if not busy_dispatchers or remaining <= 0:
+                break
+
+            busy_dispatchers[0].join(timeout=remaining)
 
-        del event_hooks_for_type[event_hook_id]
+    def get_hook_stats(self) -> dict[str, dict[int, dict[str, int]]]:
+        return self.__event_hooks.stats()
 
     def dump(self, dump_filename=DEFAULT_DUMP_FILENAME):
-        os.makedirs(os.path.dirname(dump_filename), exist_ok=True)
-        with open(dump_filename, "w") as f:
-            f.writelines([str(event) + "\n" for event in self.history])
+        dump_events(self.history, dump_filename)
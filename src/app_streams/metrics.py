@@ -0,0 +1,350 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Callable
+import math
+import os
+import threading
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+# seconds, from sub-millisecond event hooks up to slow llm invocations
+DEFAULT_LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+DEFAULT_METRICS_FILE_INTERVAL = 15.0
+
+# a snapshot holds, for every metric: name, help, type and samples. a sample has labels
+# and either a value, or (histograms) cumulative bucket counts, a sum and a count
+Snapshot = list[dict[str, any]]
+
+
+class Metric(ABC):
+    type = None
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+
+        self._lock = threading.Lock()
+
+    def _get_key(self, labels: dict[str, any]) -> tuple:
+        return tuple(map(str, map(labels.__getitem__, self.labels)))
+
+    @abstractmethod
+    def _collect_samples(self) -> list[dict[str, any]]:
+        pass
+
+    def collect(self) -> dict[str, any]:
+        return {
+            "name": self.name,
+            "help": self.help,
+            "type": self.type,
+            "samples": self._collect_samples(),
+        }
+
+
+class ValueMetric(Metric):
+    """
+    Metric holding one value per label combination. The values are either updated
+    directly or, with `collect`, read from elsewhere whenever the metric is collected.
+    `collect` returns a value per tuple of label values, e.g. {("hooks",): 3}.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        collect: Callable[[], dict[tuple, float]] | None = None,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self._values: dict[tuple, float] = {}
+        self.__collect = collect
+
+    def _collect_samples(self) -> list[dict[str, any]]:
+        if self.__collect is not None:
+            values = list(self.__collect().items())
+        else:
+            with self._lock:
+                values = list(self._values.items())
+
+        return [
+            {"labels": dict(zip(self.labels, map(str, key))), "value": value}
+            for key, value in values
+        ]
+
+
+class Counter(ValueMetric):
+    type = COUNTER
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._get_key(labels)
+
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(ValueMetric):
+    type = GAUGE
+
+    def set(self, value: float, **labels) -> None:
+        key = self._get_key(labels)
+
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    type = HISTOGRAM
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+        # per label key: [count per bucket (+inf last), sum]
+        self.__values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._get_key(labels)
+        bucket = bisect_left(self.buckets, value)
+
+        with self._lock:
+            counts_and_sum = self.__values.get(key)
+
+            if counts_and_sum is None:
+                counts_and_sum = [[0] * (len(self.buckets) + 1), 0.0]
+                self.__values[key] = counts_and_sum
+
+            counts_and_sum[0][bucket] += 1
+            counts_and_sum[1] += value
+
+    def _collect_samples(self) -> list[dict[str, any]]:
+        with self._lock:
+            values = [
+                (key, list(counts), total)
+                for key, (counts, total) in self.__values.items()
+            ]
+
+        samples = []
+
+        for key, counts, total in values:
+            cumulative = []
+            running = 0
+
+            for upper_bound, count in zip((*self.buckets, math.inf), counts):
+                running += count
+                cumulative.append([upper_bound, running])
+
+            samples.append(
+                {
+                    "labels": dict(zip(self.labels, key)),
+                    "buckets": cumulative,
+                    "sum": total,
+                    "count": running,
+                }
+            )
+
+        return samples
+
+
+class MetricsRegistry:
+    """Named metrics of one process. Getting a metric that exists returns it."""
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__metrics: dict[str, Metric] = {}
+
+    def __get_or_create(self, metric_class: type, name: str, *args, **kwargs) -> Metric:
+        metric = self.__metrics.get(name)
+
+        if metric is None:
+            with self.__lock:
+                metric = self.__metrics.setdefault(
+                    name, metric_class(name, *args, **kwargs)
+                )
+
+        if not isinstance(metric, metric_class):
+            raise ValueError(f"Metric '{name}' is already registered as a {metric.type}.")
+
+        return metric
+
+    def counter(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        collect: Callable[[], dict[tuple, float]] | None = None,
+    ) -> Counter:
+        return self.__get_or_create(Counter, name, help, labels, collect)
+
+    def gauge(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        collect: Callable[[], dict[tuple, float]] | None = None,
+    ) -> Gauge:
+        return self.__get_or_create(Gauge, name, help, labels, collect)
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.__get_or_create(Histogram, name, help, labels, buckets)
+
+    def collect(self) -> Snapshot:
+        with self.__lock:
+            metrics = list(self.__metrics.values())
+
+        snapshot = []
+
+        for metric in metrics:
+            try:
+                snapshot.append(metric.collect())
+            except Exception as err:
+                # a broken collector should not hide every other metric
+                print(f"[Error] Unable to collect metric '{metric.name}': {err}")
+
+        return snapshot
+
+
+def estimate_quantile(buckets: list[list[float]], quantile: float) -> float:
+    """Estimate a quantile from cumulative histogram buckets, like Prometheus does."""
+    total = buckets[-1][1] if buckets else 0
+
+    if total == 0:
+        return 0.0
+
+    rank = quantile * total
+    lower_bound, lower_count = 0.0, 0
+
+    for upper_bound, count in buckets:
+        if count >= rank:
+            if math.isinf(upper_bound):
+                # beyond the largest finite bucket, report its bound
+                return lower_bound
+
+            share = (rank - lower_count) / (count - lower_count)
+            return lower_bound + (upper_bound - lower_bound) * share
+
+        lower_bound, lower_count = upper_bound, count
+
+    return lower_bound
+
+
+def format_prometheus(snapshot: Snapshot) -> str:
+    """Render a snapshot in the Prometheus text exposition format."""
+    lines = []
+
+    for metric in snapshot:
+        name = metric["name"]
+
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+
+        for sample in metric["samples"]:
+            labels = sample["labels"]
+
+            if metric["type"] != HISTOGRAM:
+                lines.append(
+                    f"{name}{format_labels(labels)} {format_value(sample['value'])}"
+                )
+                continue
+
+            for upper_bound, count in sample["buckets"]:
+                bucket_labels = {**labels, "le": format_value(upper_bound)}
+                lines.append(f"{name}_bucket{format_labels(bucket_labels)} {count}")
+
+            lines.append(
+                f"{name}_sum{format_labels(labels)} {format_value(sample['sum'])}"
+            )
+            lines.append(f"{name}_count{format_labels(labels)} {sample['count']}")
+
+    return "\n".join(lines) + "\n"
+
+
+def format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels.items()
+    )
+
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def format_value(value: float) -> str:
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def write_prometheus_file(filename: str, snapshot: Snapshot) -> None:
+    # written next to the target and renamed, so scrapers never see a partial file
+    parent_dir = os.path.dirname(filename)
+
+    if parent_dir:
+        os.makedirs(parent_dir, exist_ok=True)
+
+    temp_filename = f"{filename}.tmp"
+
+    with open(temp_filename, "w", encoding="utf-8") as f:
+        f.write(format_prometheus(snapshot))
+
+    os.replace(temp_filename, filename)
+
+
+def start_metrics_file_writer(
+    registry: MetricsRegistry,
+    filename: str,
+    shutdown_signal: threading.Event,
+    interval: float = DEFAULT_METRICS_FILE_INTERVAL,
+) -> threading.Thread:
+    """Rewrite the metrics file every `interval` seconds until shutdown is signalled."""
+
+    def write_periodically():
+        while not shutdown_signal.wait(interval):
+            try:
+                write_prometheus_file(filename, registry.collect())
+            except OSError as err:
+                print(f"[Error] Unable to write metrics file: {err}")
+
+    writer = threading.Thread(
+        target=write_periodically, name="metrics-writer", daemon=True
+    )
+    writer.start()
+
+    return writer
@@ -0,0 +1,180 @@
+import argparse
+import socket
+import threading
+import time
+from concurrent.futures import Future
+
+from bench.utils import summarise_latencies, write_results
+from comms.client import CommsClient, open_tls_connection, open_unix_connection
+
+REPLY_TIMEOUT = 30.0  # grace period for replies still in flight once sending stops
+
+
+class LatencyRecorder:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.latencies: list[float] = []
+        self.sent = 0
+        self.errors = 0
+        self.outstanding = 0
+        self.all_replied = threading.Event()
+        self.all_replied.set()
+
+    def on_sent(self) -> None:
+        with self.lock:
+            self.sent += 1
+            self.outstanding += 1
+            self.all_replied.clear()
+
+    def on_reply(self, sent_at: float, future: Future) -> None:
+        latency = time.perf_counter() - sent_at
+
+        with self.lock:
+            if future.exception() is None:
+                self.latencies.append(latency)
+            else:
+                self.errors += 1
+
+            self.outstanding -= 1
+
+            if self.outstanding == 0:
+                self.all_replied.set()
+
+    def on_error(self) -> None:
+        with self.lock:
+            self.errors += 1
+
+
+def bench_comms(args: argparse.Namespace) -> None:
+    """
+    Load generator for the comms server.
+
+    Opens N clients and sends fixed-size messages at the requested total rate for the
+    requested duration, then reports round-trip latency percentiles, throughput and
+    errors. Run it against a core started with `yo start --stub-agent`, so the numbers
+    reflect the comms server and event stream rather than the LLM.
+    """
+    recorder = LatencyRecorder()
+    payload = "x" * args.size
+
+    clients = []
+    for _ in range(args.clients):
+        try:
+            clients.append(open_client(args.port, args.unix))
+        except OSError:
+            recorder.on_error()
+
+    if not clients:
+        print("[Error] Unable to connect to comms server. Is it running with --stub-agent?")
+        return
+
+    # the total rate is spread evenly over the clients, 0 means closed loop
+    interval = len(clients) / args.rate if args.rate > 0 else 0.0
+
+    start_time = time.perf_counter()
+    deadline = start_time + args.duration
+
+    def run_client(client: CommsClient, offset: float) -> None:
+        next_send_time = start_time + offset
+
+        while (now := time.perf_counter()) < deadline:
+            if interval:
+                if next_send_time > now:
+                    time.sleep(next_send_time - now)
+                next_send_time += interval
+
+            sent_at = time.perf_counter()
+            recorder.on_sent()
+            reply = client.request(payload)
+            reply.add_done_callback(
+                lambda future, sent_at=sent_at: recorder.on_reply(sent_at, future)
+            )
+
+            if not interval:
+                try:
+                    reply.result(timeout=REPLY_TIMEOUT)
+                except Exception:
+                    pass
+
+    threads = [
+        threading.Thread(
+            target=run_client,
+            args=(client, interval * index / len(clients)),
+            daemon=True,
+        )
+        for index, client in enumerate(clients)
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    recorder.all_replied.wait(timeout=REPLY_TIMEOUT)
+    elapsed = time.perf_counter() - start_time
+
+    for client in clients:
+        client.close()
+
+    with recorder.lock:
+        completed = len(recorder.latencies)
+        results = {
+            "sent": recorder.sent,
+            "completed": completed,
+            "errors": recorder.errors,
+            "timeouts": recorder.outstanding,
+            "elapsed_s": elapsed,
+            "throughput_msgs_per_s": completed / elapsed,
+            "throughput_bytes_per_s": completed * args.size / elapsed,
+            "latency_ms": summarise_latencies(recorder.latencies),
+        }
+
+    config = {
+        "clients": args.clients,
+        "connected_clients": len(clients),
+        "rate": args.rate,
+        "size": args.size,
+        "duration": args.duration,
+        "transport": "unix" if args.unix else "tls",
+    }
+
+    print_results(config, results)
+
+    if args.output:
+        write_results(args.output, "comms", config, results)
+
+
+def open_client(port: int, use_unix_socket: bool) -> CommsClient:
+    if use_unix_socket:
+        sock = open_unix_connection(port)
+
+        if sock is None:
+            raise ConnectionRefusedError("Unix socket unavailable.")
+    else:
+        sock = open_tls_connection(
+            socket.create_connection(("localhost", port)), "localhost"
+        )
+
+    return CommsClient(sock)
+
+
+def print_results(config: dict, results: dict) -> None:
+    latency = results["latency_ms"]
+
+    print(
+        f"clients={config['connected_clients']}/{config['clients']} rate={config['rate'] or 'max'}/s "
+        f"size={config['size']}B duration={config['duration']}s transport={config['transport']}"
+    )
+    print(
+        f"sent={results['sent']} completed={results['completed']} "
+        f"errors={results['errors']} timeouts={results['timeouts']}"
+    )
+    print(
+        f"throughput: {results['throughput_msgs_per_s']:.1f} msgs/s, "
+        f"{results['throughput_bytes_per_s'] / 1024:.1f} KiB/s"
+    )
+    print(
+        "latency (ms): "
+        + " ".join(f"{name}={value:.2f}" for name, value in latency.items())
+    )
@@ -0,0 +1,200 @@
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime as dt
+import time
+import tracemalloc
+
+from app_streams.events import (
+    USR_CONN_OK,
+    AppEventStream,
+    SystemEvent,
+    UserMessageEvent,
+)
+from bench.utils import write_results
+
+
+class LegacyAppEvent:
+    """Replica of AppEvent before it was slotted, as the baseline."""
+
+    def __init__(self, type: str, message: str, data: any = None) -> None:
+        if not message:
+            raise ValueError("No message provided for AppEvent.")
+
+        if len(message.strip()) == 0:
+            raise ValueError("Event message is empty.")
+
+        self.type = type
+        self.message = message
+        self.data = data
+        self.timestamp = dt.now().timestamp()
+
+    def __str__(self) -> str:
+        return f"<{self.__class__.__name__} created_on=({dt.fromtimestamp(self.timestamp).isoformat()}) type=('{self.type}') message=('{self.message}') data=({repr(self.data)})>"
+
+
+class LegacySystemEvent(LegacyAppEvent):
+    type = "system"
+
+    def __init__(self, message: str, data: any = None) -> None:
+        super().__init__(self.type, message, data)
+
+
+class LegacyUserMessageEvent(LegacyAppEvent):
+    type = "user"
+
+    def __init__(self, message: str, connection_id: int, request_id: int = 0) -> None:
+        super().__init__(self.type, message, connection_id)
+        self.request_id = request_id
+
+
+class LegacyAppEventStream:
+    """Replica of the original push: one executor task per hook call, unbounded history."""
+
+    def __init__(self, thread_pool_executor: ThreadPoolExecutor) -> None:
+        self.__event_hooks = {"all": {}}
+        self.__executor = thread_pool_executor
+        self.history = deque()
+
+    def add_event_hook(self, event_type: str, event_hook) -> None:
+        self.__event_hooks.setdefault(event_type, {})[hash(event_hook)] = event_hook
+
+    def push(self, event) -> None:
+        for event_hook in [
+            *self.__event_hooks.get(event.type, {}).values(),
+            *self.__event_hooks.get("all", {}).values(),
+        ]:
+            self.__executor.submit(event_hook, event)
+
+        self.history.append(event)
+
+
+# (name, system message, system event, user message event, event stream factory)
+REPRESENTATIONS = (
+    (
+        "legacy",
+        USR_CONN_OK.value,  # messages used to be plain strings
+        LegacySystemEvent,
+        LegacyUserMessageEvent,
+        LegacyAppEventStream,
+    ),
+    (
+        "current",
+        USR_CONN_OK,
+        SystemEvent,
+        UserMessageEvent,
+        lambda executor: AppEventStream(executor, history_maxsize=None),
+    ),
+)
+
+
+def bench_events(args: argparse.Namespace) -> None:
+    """
+    Compare the current event representation and push path against replicas of the
+    original ones.
+
+    Reports bytes held per event, the cost of creating an event, of formatting it
+    (first and repeated str()), and of pushing it into an event stream with one no-op
+    hook. Push timings exclude the hook itself, the executor drains afterwards.
+    """
+    results = {}
+
+    for name, message, system_event, user_event, event_stream in REPRESENTATIONS:
+        results[name] = {
+            "system": measure_events(
+                lambda: system_event(message, {"connection_id": 1}), args.count
+            ),
+            "user": measure_events(
+                lambda: user_event("what time is it?", 1, 7), args.count
+            ),
+            "push_us": measure_push(
+                event_stream,
+                lambda: user_event("what time is it?", 1, 7),
+                args.count,
+            ),
+        }
+
+    config = {"count": args.count}
+
+    print_results(config, results)
+
+    if args.output:
+        write_results(args.output, "events", config, results)
+        print(f"results written to {args.output}")
+
+
+def measure_events(create_event, count: int) -> dict[str, float]:
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+
+    events = [create_event() for _ in range(count)]
+
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # the list holding the events is not part of their footprint
+    bytes_per_event = (allocated - baseline) / count - 8
+
+    started_at = time.perf_counter()
+    for _ in range(count):
+        create_event()
+    create_us = (time.perf_counter() - started_at) / count * 1e6
+
+    started_at = time.perf_counter()
+    for event in events:
+        str(event)
+    first_str_us = (time.perf_counter() - started_at) / count * 1e6
+
+    started_at = time.perf_counter()
+    for event in events:
+        str(event)
+    repeat_str_us = (time.perf_counter() - started_at) / count * 1e6
+
+    return {
+        "bytes_per_event": bytes_per_event,
+        "create_us": create_us,
+        "first_str_us": first_str_us,
+        "repeat_str_us": repeat_str_us,
+    }
+
+
+def measure_push(create_event_stream, create_event, count: int) -> float:
+    executor = ThreadPoolExecutor(max_workers=4)
+    event_stream = create_event_stream(executor)
+
+    if isinstance(event_stream, AppEventStream):
+        # room for every event, like the legacy unbounded executor queue
+        event_stream.add_event_hook("user", lambda event: None, max_queue_size=count)
+    else:
+        event_stream.add_event_hook("user", lambda event: None)
+
+    events = [create_event() for _ in range(count)]
+
+    started_at = time.perf_counter()
+    for event in events:
+        event_stream.push(event)
+    push_us = (time.perf_counter() - started_at) / count * 1e6
+
+    executor.shutdown()
+
+    return push_us
+
+
+def print_results(config: dict, results: dict) -> None:
+    print(f"events={config['count']} per representation")
+    print(
+        f"{'':10} {'event':8} {'bytes':>8} {'create us':>10} "
+        f"{'str us':>8} {'str again us':>13}"
+    )
+
+    for name, result in results.items():
+        for kind in ("system", "user"):
+            measured = result[kind]
+            print(
+                f"{name:10} {kind:8} {measured['bytes_per_event']:8.0f} "
+                f"{measured['create_us']:10.2f} {measured['first_str_us']:8.2f} "
+                f"{measured['repeat_str_us']:13.2f}"
+            )
+
+    for name, result in results.items():
+        print(f"{name:10} push: {result['push_us']:.2f} us/event")
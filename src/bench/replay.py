@@ -0,0 +1,338 @@
+import argparse
+import ast
+from datetime import datetime as dt
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+from typing import NamedTuple
+
+from app_streams.async_events import AsyncAppEventStream
+from app_streams.event_log import SEGMENT_SUFFIX, get_segment_paths, read_segment
+from app_streams.events import (
+    AgentMessageEvent,
+    AppEvent,
+    AppEventStream,
+    EventMessage,
+    SystemEvent,
+    UserMessageEvent,
+)
+from app_streams.metrics import estimate_quantile
+from bench.utils import summarise_latencies, write_results
+from comms.framing import KIND_ERROR, KIND_MESSAGE, NO_REQUEST_ID
+from core.executors import HOOKS_POOL, LLM_POOL, ExecutorRegistry
+from core.main import setup_event_hooks
+from llm.stub_agent import StubAgent
+
+# agent replies are produced by the hooks themselves, replaying them would double them
+DEFAULT_REPLAY_TYPES = (UserMessageEvent.type, SystemEvent.type)
+
+# one line of AppEventStream.dump, see AppEvent.__str__
+DUMP_LINE = re.compile(
+    r"^<(\w+) created_on=\((.*?)\) type=\('(.*?)'\) message=\('(.*)'\) data=\((.*)\)>$"
+)
+
+
+class RecordedEvent(NamedTuple):
+    timestamp: float
+    event: str  # class name
+    type: str
+    message: str
+    data: any
+
+
+def load_recorded_events(path: str) -> tuple[list[RecordedEvent], int]:
+    """
+    Read an event log directory, a single log segment, or a file written by
+    AppEventStream.dump. Returns the events in recorded order and the number of
+    lines that could not be parsed.
+    """
+    if os.path.isdir(path):
+        records = itertools.chain.from_iterable(
+            read_segment(segment_path) for segment_path in get_segment_paths(path)
+        )
+    elif path.endswith(SEGMENT_SUFFIX):
+        records = read_segment(path)
+    else:
+        return load_dump(path)
+
+    recorded_events = [
+        RecordedEvent(
+            record["timestamp"],
+            record["event"],
+            record["type"],
+            record["message"],
+            record["data"],
+        )
+        for record in records
+    ]
+
+    return recorded_events, 0
+
+
+def load_dump(path: str) -> tuple[list[RecordedEvent], int]:
+    recorded_events = []
+    skipped = 0
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            match = DUMP_LINE.match(line.rstrip("\n"))
+
+            if match is None:
+                # e.g. the continuation of a message spanning several lines
+                skipped += 1
+                continue
+
+            event, created_on, type, message, data = match.groups()
+
+            try:
+                data = ast.literal_eval(data)
+            except (ValueError, SyntaxError):
+                # reprs of objects (e.g. exceptions) are kept as text
+                pass
+
+            recorded_events.append(
+                RecordedEvent(
+                    dt.fromisoformat(created_on).timestamp(), event, type, message, data
+                )
+            )
+
+    return recorded_events, skipped
+
+
+class ReplayConnection:
+    """Stands in for a client connection, reporting every complete reply."""
+
+    def __init__(self, on_reply) -> None:
+        self.__on_reply = on_reply
+
+    def send_message(
+        self,
+        message: str,
+        kind: int = KIND_MESSAGE,
+        request_id: int = NO_REQUEST_ID,
+        block: bool = True,
+    ) -> int:
+        if kind in (KIND_MESSAGE, KIND_ERROR):
+            self.__on_reply(request_id)
+
+        return len(message)
+
+
+class ReplayCommsServer:
+    """Stands in for the comms server and measures push-to-reply latency."""
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__pushed_at: dict[int, float] = {}
+        self.__connection = ReplayConnection(self.__on_reply)
+
+        self.latencies: list[float] = []
+
+    def get_connection_by_id(self, connection_id: int) -> ReplayConnection:
+        return self.__connection
+
+    def expect_reply(self, request_id: int) -> None:
+        with self.__lock:
+            self.__pushed_at[request_id] = time.perf_counter()
+
+    def __on_reply(self, request_id: int) -> None:
+        replied_at = time.perf_counter()
+
+        with self.__lock:
+            pushed_at = self.__pushed_at.pop(request_id, None)
+
+            if pushed_at is not None:
+                self.latencies.append(replied_at - pushed_at)
+
+
+def create_event(recorded_event: RecordedEvent, request_id: int) -> AppEvent:
+    # events are created when they are pushed, so their own timestamps are fresh
+    message = recorded_event.message
+
+    if recorded_event.event == SystemEvent.__name__:
+        try:
+            message = EventMessage(message)
+        except ValueError:
+            pass
+
+        return SystemEvent(message, recorded_event.data)
+
+    if recorded_event.event == UserMessageEvent.__name__:
+        return UserMessageEvent(message, recorded_event.data, request_id)
+
+    if recorded_event.event == AgentMessageEvent.__name__:
+        return AgentMessageEvent(message, recorded_event.data)
+
+    return AppEvent(recorded_event.type, message, recorded_event.data)
+
+
+def replay(args: argparse.Namespace) -> None:
+    """
+    Re-push a recorded event log into a fresh event stream with the core's event
+    hooks, a stub agent and no comms server.
+
+    Events are paced by their recorded timestamps, sped up by --speed (0 pushes as
+    fast as possible). Reports per-hook throughput and execution time, and the
+    push-to-reply latency of user messages.
+    """
+    types = args.types or list(DEFAULT_REPLAY_TYPES)
+
+    try:
+        recorded_events, skipped = load_recorded_events(args.log)
+    except (OSError, ValueError) as err:
+        print(f"[Error] Unable to read event log: {err}", file=sys.stderr)
+        sys.exit(1)
+
+    recorded_events = [
+        recorded_event
+        for recorded_event in recorded_events
+        if recorded_event.type in types
+    ]
+
+    if not recorded_events:
+        print("[Error] No events to replay.", file=sys.stderr)
+        sys.exit(2)
+
+    executors = ExecutorRegistry()
+    event_stream_class = AsyncAppEventStream if args.async_events else AppEventStream
+    event_stream = event_stream_class(executors.get(HOOKS_POOL))
+    comms_server = ReplayCommsServer()
+    agent = StubAgent(event_stream=event_stream, reply_delay=args.stub_delay)
+
+    setup_event_hooks(
+        event_stream=event_stream,
+        comms_server=comms_server,
+        llm_server=None,
+        agent=agent,
+        executors=executors,
+        stream_replies=not args.no_stream,
+    )
+
+    first_timestamp = recorded_events[0].timestamp
+    request_ids = itertools.count(1)
+    max_lag = 0.0
+
+    started_at = time.perf_counter()
+
+    for recorded_event in recorded_events:
+        if args.speed > 0:
+            due_at = started_at + (recorded_event.timestamp - first_timestamp) / args.speed
+            delay = due_at - time.perf_counter()
+
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                max_lag = max(max_lag, -delay)
+
+        request_id = next(request_ids)
+        event = create_event(recorded_event, request_id)
+
+        if isinstance(event, UserMessageEvent):
+            comms_server.expect_reply(request_id)
+
+        event_stream.push(event)
+
+    pushed_at = time.perf_counter()
+
+    # as in the core, the stream drains while the pools its hooks run on are up
+    event_stream.close()
+    executors.shutdown([LLM_POOL, HOOKS_POOL])
+
+    finished_at = time.perf_counter()
+
+    config = {
+        "log": args.log,
+        "speed": args.speed,
+        "types": types,
+        "stub_delay": args.stub_delay,
+        "stream_replies": not args.no_stream,
+        "async_events": args.async_events,
+    }
+    results = {
+        "events": len(recorded_events),
+        "skipped_lines": skipped,
+        "push_s": pushed_at - started_at,
+        "total_s": finished_at - started_at,
+        "max_lag_ms": max_lag * 1000,
+        "hooks": summarise_hooks(event_stream.metrics.collect(), finished_at - started_at),
+        "replies": {
+            "count": len(comms_server.latencies),
+            "latency_ms": summarise_latencies(comms_server.latencies),
+        },
+    }
+
+    print_results(config, results)
+
+    if args.output:
+        write_results(args.output, "replay", config, results)
+        print(f"results written to {args.output}")
+
+
+def summarise_hooks(
+    snapshot: list[dict[str, any]], duration: float
+) -> dict[str, dict[str, float]]:
+    metrics = {metric["name"]: metric for metric in snapshot}
+    hooks = {}
+
+    def get_hook_key(labels: dict[str, str]) -> str:
+        return f"{labels['event_type']}/{labels['hook']}"
+
+    for sample in metrics["yoda_hook_duration_seconds"]["samples"]:
+        calls = sample["count"]
+
+        hooks[get_hook_key(sample["labels"])] = {
+            "calls": calls,
+            "failures": 0,
+            "dropped": 0,
+            "calls_per_s": calls / duration if duration else 0.0,
+            "mean_ms": sample["sum"] / calls * 1000 if calls else 0.0,
+            "p50_ms": estimate_quantile(sample["buckets"], 0.50) * 1000,
+            "p95_ms": estimate_quantile(sample["buckets"], 0.95) * 1000,
+            "p99_ms": estimate_quantile(sample["buckets"], 0.99) * 1000,
+        }
+
+    for name, stat in (
+        ("yoda_hook_failures_total", "failures"),
+        ("yoda_hook_dropped_total", "dropped"),
+    ):
+        for sample in metrics[name]["samples"]:
+            hook = hooks.get(get_hook_key(sample["labels"]))
+
+            if hook is not None:
+                hook[stat] = sample["value"]
+
+    return hooks
+
+
+def print_results(config: dict, results: dict) -> None:
+    speed = "max" if config["speed"] <= 0 else f"{config['speed']:g}x"
+
+    print(
+        f"events={results['events']} speed={speed} types={','.join(config['types'])} "
+        f"skipped_lines={results['skipped_lines']}"
+    )
+    print(
+        f"pushed in {results['push_s']:.2f}s, handled in {results['total_s']:.2f}s "
+        f"(max pacing lag {results['max_lag_ms']:.2f} ms)"
+    )
+    print(
+        f"{'hook':40} {'calls':>7} {'calls/s':>9} {'fail':>5} {'drop':>5} "
+        f"{'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+
+    for name, hook in results["hooks"].items():
+        print(
+            f"{name:40} {hook['calls']:7d} {hook['calls_per_s']:9.1f} "
+            f"{hook['failures']:5g} {hook['dropped']:5g} {hook['mean_ms']:8.2f} "
+            f"{hook['p50_ms']:8.2f} {hook['p95_ms']:8.2f} {hook['p99_ms']:8.2f}"
+        )
+
+    latency = results["replies"]["latency_ms"]
+    print(
+        f"replies={results['replies']['count']} latency (ms): "
+        f"min={latency['min']:.2f} mean={latency['mean']:.2f} p50={latency['p50']:.2f} "
+        f"p95={latency['p95']:.2f} p99={latency['p99']:.2f} max={latency['max']:.2f}"
+    )
@@ -0,0 +1,181 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from bench.utils import percentile, write_results
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# parses the arguments and imports the command's function like `yo` does, without
+# running the command
+PROBE = (
+    "import sys\n"
+    "from cli.main import get_parser\n"
+    "get_parser().parse_args(sys.argv[1:]).func.load()\n"
+)
+
+# name, arguments, whether the command counts against the budget
+COMMANDS = (
+    ("yo", [], True),
+    ("yo ask", ["ask", "hello"], True),
+    ("yo stats", ["stats"], True),
+    ("yo start", ["start"], False),  # loads the agent by design
+)
+
+# packages the client commands must not import
+HEAVY_PACKAGES = (
+    "langchain_core",
+    "langchain_ollama",
+    "langgraph",
+    "requests",
+    "windows_toasts",
+    "art",
+)
+
+DEFAULT_STARTUP_BUDGET = 150.0  # milliseconds on top of a bare interpreter start
+TOP_IMPORTS = 5
+
+
+def bench_startup(args: argparse.Namespace) -> None:
+    """
+    Measure how long `yo` takes to start for each command: the interpreter start,
+    argument parsing and the imports the command needs, but not the command itself.
+
+    Reports the median wall time over --runs runs, the time on top of a bare
+    interpreter start and the slowest imports (from `python -X importtime`). Exits
+    with an error if a client command goes over --budget or imports a heavy package.
+    """
+    bare_time = measure_startup([sys.executable, "-c", "pass"], args.runs)
+
+    results = {"bare_ms": bare_time * 1000, "commands": {}}
+    failures = []
+
+    for name, command_args, is_budgeted in COMMANDS:
+        probe = [sys.executable, "-c", PROBE, *command_args]
+        startup_time = measure_startup(probe, args.runs)
+        import_times = get_import_times(probe)
+
+        heavy_packages = sorted(
+            {
+                module.strip().split(".")[0]
+                for module, _, _ in import_times
+                if module.strip().split(".")[0] in HEAVY_PACKAGES
+            }
+        )
+        overhead_ms = (startup_time - bare_time) * 1000
+
+        results["commands"][name] = {
+            "startup_ms": startup_time * 1000,
+            "overhead_ms": overhead_ms,
+            "modules": len(import_times),
+            "heavy_packages": heavy_packages,
+            "top_imports": [
+                {"module": module, "cumulative_ms": cumulative_us / 1000}
+                for module, _, cumulative_us in sorted(
+                    (entry for entry in import_times if not entry[0].startswith(" ")),
+                    key=lambda entry: entry[2],
+                    reverse=True,
+                )[:TOP_IMPORTS]
+            ],
+            "budgeted": is_budgeted,
+        }
+
+        if not is_budgeted:
+            continue
+
+        if overhead_ms > args.budget:
+            failures.append(
+                f"{name} takes {overhead_ms:.1f} ms to start, over the budget of {args.budget:.1f} ms"
+            )
+
+        if heavy_packages:
+            failures.append(f"{name} imports {', '.join(heavy_packages)}")
+
+    config = {"runs": args.runs, "budget_ms": args.budget}
+
+    print_results(config, results)
+
+    if args.output:
+        write_results(args.output, "startup", config, results)
+        print(f"results written to {args.output}")
+
+    if failures:
+        for failure in failures:
+            print(f"[Error] {failure}", file=sys.stderr)
+
+        sys.exit(1)
+
+
+def run_probe(command: list[str], **kwargs) -> subprocess.CompletedProcess:
+    env = {**os.environ}
+    env["PYTHONPATH"] = os.pathsep.join(
+        path for path in (SRC_DIR, env.get("PYTHONPATH")) if path
+    )
+
+    return subprocess.run(command, env=env, stdout=subprocess.DEVNULL, check=True, **kwargs)
+
+
+def measure_startup(command: list[str], runs: int) -> float:
+    """Median seconds the command takes to run, after one run to warm the caches."""
+    run_probe(command)
+
+    durations = []
+
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        run_probe(command)
+        durations.append(time.perf_counter() - started_at)
+
+    return percentile(sorted(durations), 0.50)
+
+
+def get_import_times(command: list[str]) -> list[tuple[str, int, int]]:
+    """
+    Module, self and cumulative microseconds of every import the command makes, as
+    reported by `python -X importtime`. Nested imports keep their indentation.
+    """
+    process = run_probe(
+        [command[0], "-X", "importtime", *command[1:]],
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+    import_times = []
+
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+
+        self_us, cumulative_us, module = line.removeprefix("import time:").split("|")
+
+        if not self_us.strip().isdigit():
+            # the header
+            continue
+
+        import_times.append((module[1:].rstrip(), int(self_us), int(cumulative_us)))
+
+    return import_times
+
+
+def print_results(config: dict, results: dict) -> None:
+    print(
+        f"runs={config['runs']} budget={config['budget_ms']:.1f} ms "
+        f"bare interpreter={results['bare_ms']:.1f} ms"
+    )
+    print(f"{'':10} {'startup ms':>10} {'overhead ms':>11} {'modules':>8}  heavy packages")
+
+    for name, result in results["commands"].items():
+        print(
+            f"{name:10} {result['startup_ms']:10.1f} {result['overhead_ms']:11.1f} "
+            f"{result['modules']:8}  {', '.join(result['heavy_packages']) or '-'}"
+            f"{'' if result['budgeted'] else '  (not budgeted)'}"
+        )
+
+    for name, result in results["commands"].items():
+        slowest = ", ".join(
+            f"{entry['module']} {entry['cumulative_ms']:.1f}"
+            for entry in result["top_imports"]
+        )
+        print(f"{name:10} slowest imports (ms): {slowest}")
@@ -0,0 +1,64 @@
+import json
+import os
+import platform
+import time
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    # nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+
+    rank = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+
+    return sorted_values[rank]
+
+
+def summarise_latencies(latencies: list[float]) -> dict[str, float]:
+    """Latency summary in milliseconds."""
+    values = sorted(latencies)
+
+    if not values:
+        return {"min": 0.0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+
+    return {
+        "min": values[0] * 1000,
+        "mean": sum(values) / len(values) * 1000,
+        "p50": percentile(values, 0.50) * 1000,
+        "p95": percentile(values, 0.95) * 1000,
+        "p99": percentile(values, 0.99) * 1000,
+        "max": values[-1] * 1000,
+    }
+
+
+def get_yoda_version() -> str:
+    # slow to import, and only needed once results are written
+    from importlib import metadata
+
+    try:
+        return metadata.version("yoda")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def write_results(filename: str, benchmark: str, config: dict, results: dict) -> None:
+    """Write results as JSON so runs can be compared between releases."""
+    parent_dir = os.path.dirname(filename)
+
+    if parent_dir:
+        os.makedirs(parent_dir, exist_ok=True)
+
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "benchmark": benchmark,
+                "yoda_version": get_yoda_version(),
+                "python_version": platform.python_version(),
+                "platform": platform.platform(),
+                "timestamp": time.time(),
+                "config": config,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
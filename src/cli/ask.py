@@ -0,0 +1,92 @@
+import argparse
+import socket
+import sys
+import time
+
+from comms.client import (
+    CommsClient,
+    RequestError,
+    open_tls_connection,
+    open_unix_connection,
+)
+
+DEFAULT_ASK_TIMEOUT = 300.0
+
+
+def ask(args: argparse.Namespace) -> None:
+    """
+    One-shot, non-interactive query: prints the answer to stdout and exits.
+    Meant for scripts and shell hooks, so there is no banner or spinner.
+    """
+    prompt = " ".join(args.prompt).strip() or sys.stdin.read().strip()
+
+    if prompt == "":
+        print("[Error] No prompt given.", file=sys.stderr)
+        sys.exit(2)
+
+    timings = {}
+    start_time = time.perf_counter()
+
+    try:
+        ssock = open_unix_connection(args.port)
+        timings["connect"] = time.perf_counter() - start_time
+
+        if ssock is None:
+            # no local socket, fall back to tls over tcp
+            sock = socket.create_connection(("localhost", args.port))
+            timings["connect"] = time.perf_counter() - start_time
+
+            ssock = open_tls_connection(sock, "localhost")
+            timings["handshake"] = (
+                time.perf_counter() - start_time - timings["connect"]
+            )
+    except OSError:
+        print(
+            "[Error] Unable to connect to comms server. Did you forget to start the comms server?",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    with ssock:
+        client = CommsClient(ssock)
+        request_time = time.perf_counter()
+        is_streamed = False
+
+        def on_chunk(chunk: str):
+            nonlocal is_streamed
+
+            if not is_streamed:
+                timings["first_token"] = time.perf_counter() - request_time
+                is_streamed = True
+
+            sys.stdout.write(chunk)
+            sys.stdout.flush()
+
+        try:
+            message = client.request(prompt, on_chunk).result(timeout=args.timeout)
+        except RequestError as err:
+            print(f"\n[Error] Unable to answer: {err}", file=sys.stderr)
+            sys.exit(1)
+        except TimeoutError:
+            print(
+                f"\n[Error] No answer within {args.timeout:g} seconds.", file=sys.stderr
+            )
+            sys.exit(1)
+        except (OSError, ValueError):
+            print("\n[Error] Comms server unavailable.", file=sys.stderr)
+            sys.exit(1)
+
+        timings["answer"] = time.perf_counter() - request_time
+
+    # a streamed answer has already been written chunk by chunk
+    sys.stdout.write("\n" if is_streamed else f"{message}\n")
+    sys.stdout.flush()
+
+    if args.timing:
+        print_timings(timings)
+
+
+def print_timings(timings: dict[str, float]) -> None:
+    # timings go to stderr so they never mix with the answer
+    for name, duration in timings.items():
+        print(f"{name:>12}: {duration * 1000:8.2f} ms", file=sys.stderr)
@@ -1,8 +1,51 @@
 import argparse
+from collections.abc import Callable
+import importlib
 
-from core.main import start_core_system
+# only light modules are imported here, every command imports what it needs when it
+# runs, so that e.g. `yo ask` does not load the agent (see `yo bench startup`)
+from app_streams.event_log import (
+    DEFAULT_EVENT_LOG_DIR,
+    DEFAULT_RETAINED_SEGMENTS,
+    DEFAULT_SEGMENT_MAX_BYTES,
+)
+from app_streams.metrics import DEFAULT_METRICS_FILE_INTERVAL
+from bench.startup import DEFAULT_STARTUP_BUDGET
+from comms.outbound import (
+    DEFAULT_HIGH_WATERMARK,
+    DEFAULT_LOW_WATERMARK,
+    SLOW_CONSUMER_POLICIES,
+)
+from comms.registry import DEFAULT_HEARTBEAT_INTERVAL, DEFAULT_HEARTBEAT_TIMEOUT
+from core.executors import DEFAULT_POOL_SETTINGS, parse_pool_setting
+from llm.agent.defaults import (
+    DEFAULT_CONTEXT_TOKEN_BUDGET,
+    DEFAULT_MAX_PARALLEL_INVOCATIONS,
+    DEFAULT_MAX_SESSIONS,
+    DEFAULT_RESPONSE_CACHE_SIZE,
+    DEFAULT_RESPONSE_CACHE_TTL,
+    DEFAULT_SIMPLE_MAX_WORDS,
+)
+from llm.server import DEFAULT_KEEP_ALIVE, parse_keep_alive
 
-from .user_input import start_interactive_mode
+from .ask import DEFAULT_ASK_TIMEOUT
+from .stats import STATS_FORMATS
+
+
+class LazyCommand:
+    """Command function that is imported when the command runs."""
+
+    def __init__(self, module_name: str, function_name: str) -> None:
+        self.module_name = module_name
+        self.function_name = function_name
+
+    def load(self) -> Callable[[argparse.Namespace], None]:
+        module = importlib.import_module(self.module_name)
+
+        return getattr(module, self.function_name)
+
+    def __call__(self, args: argparse.Namespace) -> None:
+        self.load()(args)
 
 
 def main() -> None:
@@ -21,13 +64,89 @@ def get_parser() -> argparse.ArgumentParser:
         prog="yo", description="Centralised System Automations with LLM"
     )
     parser.add_argument("-p", "--port", type=int, default=1234, help="comms server port to connect to")
-    parser.set_defaults(func=start_interactive_mode)
+    parser.set_defaults(func=LazyCommand("cli.user_input", "start_interactive_mode"))
 
     commands = parser.add_subparsers(dest="command", title="Supported Commands")
 
     start_parser = commands.add_parser("start", help="start the core server")
     start_parser.add_argument("-pc", "--port-comms", type=int, default=1234, help="local port for comms server")
     start_parser.add_argument("-po", "--port-ollama", type=int, default=11434, help="local port for ollama server")
-    start_parser.set_defaults(func=start_core_system)
+    start_parser.add_argument("--no-stream", action="store_true", help="send agent replies only once they are complete")
+    start_parser.add_argument("--no-unix-socket", action="store_true", help="do not listen on a local unix socket next to the TLS port")
+    start_parser.add_argument("--outbound-high-watermark", type=int, default=DEFAULT_HIGH_WATERMARK, help="queued bytes per connection at which the slow consumer policy kicks in")
+    start_parser.add_argument("--outbound-low-watermark", type=int, default=DEFAULT_LOW_WATERMARK, help="queued bytes per connection below which sending resumes")
+    start_parser.add_argument("--slow-consumer", choices=SLOW_CONSUMER_POLICIES, default=SLOW_CONSUMER_POLICIES[0], help="what to do with replies to a client that reads too slowly")
+    start_parser.add_argument("--heartbeat-interval", type=float, default=DEFAULT_HEARTBEAT_INTERVAL, help="seconds of silence after which a client is pinged")
+    start_parser.add_argument("--heartbeat-timeout", type=float, default=DEFAULT_HEARTBEAT_TIMEOUT, help="seconds to wait for a pong before a client is considered dead")
+    start_parser.add_argument("--idle-timeout", type=float, default=None, help="disconnect clients that send no message for this many seconds")
+    start_parser.add_argument("--threaded-comms", action="store_true", help="use the legacy thread-per-connection comms server")
+    start_parser.add_argument("--stub-agent", action="store_true", help="echo messages back instead of running the LLM agent (for benchmarks)")
+    start_parser.add_argument("--stub-delay", type=float, default=0.0, help="seconds the stub agent waits before replying")
+    start_parser.add_argument("--max-sessions", type=int, default=DEFAULT_MAX_SESSIONS, help="chat sessions kept by the agent, the least recently used idle ones are evicted")
+    start_parser.add_argument("--max-llm-calls", type=int, default=DEFAULT_MAX_PARALLEL_INVOCATIONS, help="agent invocations run in parallel across all connections")
+    start_parser.add_argument("--context-tokens", type=int, default=DEFAULT_CONTEXT_TOKEN_BUDGET, help="estimated tokens of chat history sent with each message, older turns are summarised")
+    start_parser.add_argument("--keep-alive", type=parse_keep_alive, default=DEFAULT_KEEP_ALIVE, help="how long ollama keeps the agent model loaded while idle: seconds or a duration like 30m, negative for as long as ollama runs")
+    start_parser.add_argument("--response-cache", action="store_true", help="reuse agent replies to identical prompts with the same history, and answer identical concurrent prompts with one llm call")
+    start_parser.add_argument("--response-cache-size", type=int, default=DEFAULT_RESPONSE_CACHE_SIZE, help="replies kept by the response cache")
+    start_parser.add_argument("--response-cache-ttl", type=float, default=DEFAULT_RESPONSE_CACHE_TTL, help="seconds a cached reply may be reused for")
+    start_parser.add_argument("--small-model", default=None, help="ollama model for short prompts that need no tools, e.g. qwen3:1.7b (default: use the agent model for everything)")
+    start_parser.add_argument("--simple-max-words", type=int, default=DEFAULT_SIMPLE_MAX_WORDS, help="longest prompt, in words, that may go to the small model")
+    start_parser.add_argument("--no-direct-answers", action="store_true", help="send questions such as the time to the model instead of answering them directly")
+    start_parser.add_argument("--pool", type=parse_pool_setting, action="append", default=[], metavar="NAME=MIN:MAX", help=f"worker bounds for a thread pool ({', '.join(DEFAULT_POOL_SETTINGS)}), may be repeated")
+    start_parser.add_argument("--event-log-dir", default=DEFAULT_EVENT_LOG_DIR, help="directory for the on-disk event log")
+    start_parser.add_argument("--event-log-segment-size", type=int, default=DEFAULT_SEGMENT_MAX_BYTES, help="bytes after which the event log starts a new segment")
+    start_parser.add_argument("--event-log-retention", type=int, default=DEFAULT_RETAINED_SEGMENTS, help="number of event log segments to keep")
+    start_parser.add_argument("--no-event-log", action="store_true", help="keep events in memory only")
+    start_parser.add_argument("--async-events", action="store_true", help="run event hooks as tasks on an event loop instead of a thread pool")
+    start_parser.add_argument("--metrics-file", default=None, help="periodically write metrics in prometheus text format to this file")
+    start_parser.add_argument("--metrics-interval", type=float, default=DEFAULT_METRICS_FILE_INTERVAL, help="seconds between writes of the metrics file")
+    start_parser.set_defaults(func=LazyCommand("core.main", "start_core_system"))
+
+    ask_parser = commands.add_parser("ask", help="ask a one-off question and print the answer")
+    ask_parser.add_argument("prompt", nargs="*", help="question to ask, read from stdin if omitted")
+    ask_parser.add_argument("-p", "--port", type=int, default=argparse.SUPPRESS, help="comms server port to connect to")
+    ask_parser.add_argument("--timing", action="store_true", help="report connect, handshake and answer timings on stderr")
+    ask_parser.add_argument("-t", "--timeout", type=float, default=DEFAULT_ASK_TIMEOUT, help="seconds to wait for the complete answer")
+    ask_parser.set_defaults(func=LazyCommand("cli.ask", "ask"))
+
+    stats_parser = commands.add_parser("stats", help="show metrics of the running core server")
+    stats_parser.add_argument("-p", "--port", type=int, default=argparse.SUPPRESS, help="comms server port to connect to")
+    stats_parser.add_argument("-f", "--format", choices=STATS_FORMATS, default=STATS_FORMATS[0], help="output format")
+    stats_parser.add_argument("-o", "--output", help="write the stats to this file instead of stdout")
+    stats_parser.set_defaults(func=LazyCommand("cli.stats", "stats"))
+
+    replay_parser = commands.add_parser("replay", help="replay a recorded event log against the event hooks, with a stub agent")
+    replay_parser.add_argument("log", help="event log directory, log segment, or AppEventStream dump file")
+    replay_parser.add_argument("-s", "--speed", type=float, default=1.0, help="replay speed relative to the recording, 0 for as fast as possible")
+    replay_parser.add_argument("-t", "--types", nargs="+", default=None, help="event types to replay (default: user system)")
+    replay_parser.add_argument("--stub-delay", type=float, default=0.0, help="seconds the stub agent waits before replying")
+    replay_parser.add_argument("--no-stream", action="store_true", help="send agent replies only once they are complete")
+    replay_parser.add_argument("--async-events", action="store_true", help="run event hooks as tasks on an event loop instead of a thread pool")
+    replay_parser.add_argument("-o", "--output", help="write machine-readable results to this json file")
+    replay_parser.set_defaults(func=LazyCommand("bench.replay", "replay"))
+
+    bench_parser = commands.add_parser("bench", help="run performance benchmarks")
+    benchmarks = bench_parser.add_subparsers(dest="benchmark", title="Benchmarks", required=True)
+
+    bench_comms_parser = benchmarks.add_parser("comms", help="load test the comms server (start it with --stub-agent)")
+    bench_comms_parser.add_argument("-p", "--port", type=int, default=argparse.SUPPRESS, help="comms server port to connect to")
+    bench_comms_parser.add_argument("-c", "--clients", type=int, default=10, help="number of concurrent clients")
+    bench_comms_parser.add_argument("-r", "--rate", type=float, default=100.0, help="total messages per second across all clients, 0 for as fast as possible")
+    bench_comms_parser.add_argument("-s", "--size", type=int, default=256, help="message size in bytes")
+    bench_comms_parser.add_argument("-d", "--duration", type=float, default=10.0, help="seconds to send messages for")
+    bench_comms_parser.add_argument("--unix", action="store_true", help="connect over the unix socket instead of tls")
+    bench_comms_parser.add_argument("-o", "--output", help="write machine-readable results to this json file")
+    bench_comms_parser.set_defaults(func=LazyCommand("bench.comms", "bench_comms"))
+
+    bench_events_parser = benchmarks.add_parser("events", help="measure event memory, creation and push cost against the legacy representation")
+    bench_events_parser.add_argument("-n", "--count", type=int, default=100_000, help="number of events per measurement")
+    bench_events_parser.add_argument("-o", "--output", help="write machine-readable results to this json file")
+    bench_events_parser.set_defaults(func=LazyCommand("bench.events", "bench_events"))
+
+    bench_startup_parser = benchmarks.add_parser("startup", help="measure how long yo takes to start for each command, fail if a client command goes over budget")
+    bench_startup_parser.add_argument("-n", "--runs", type=int, default=10, help="runs per command, the median is reported")
+    bench_startup_parser.add_argument("-b", "--budget", type=float, default=DEFAULT_STARTUP_BUDGET, help="milliseconds a client command may add to a bare interpreter start")
+    bench_startup_parser.add_argument("-o", "--output", help="write machine-readable results to this json file")
+    bench_startup_parser.set_defaults(func=LazyCommand("bench.startup", "bench_startup"))
 
     return parser
@@ -0,0 +1,90 @@
+import argparse
+import json
+import socket
+import sys
+
+from app_streams.metrics import HISTOGRAM, estimate_quantile, format_prometheus
+from comms.client import CommsClient, open_tls_connection, open_unix_connection
+from comms.framing import KIND_STATS
+
+TEXT = "text"
+JSON = "json"
+PROMETHEUS = "prometheus"
+
+STATS_FORMATS = (TEXT, JSON, PROMETHEUS)
+
+STATS_TIMEOUT = 10.0
+
+
+def stats(args: argparse.Namespace) -> None:
+    """Fetch the metrics of a running core server and print or save them."""
+    try:
+        ssock = open_unix_connection(args.port)
+
+        if ssock is None:
+            sock = socket.create_connection(("localhost", args.port))
+            ssock = open_tls_connection(sock, "localhost")
+    except OSError:
+        print(
+            "[Error] Unable to connect to comms server. Did you forget to start the comms server?",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    with ssock:
+        client = CommsClient(ssock)
+
+        try:
+            snapshot = json.loads(
+                client.request("", kind=KIND_STATS).result(timeout=STATS_TIMEOUT)
+            )
+        except (OSError, ValueError, TimeoutError):
+            print("[Error] Comms server did not answer with stats.", file=sys.stderr)
+            sys.exit(1)
+
+    if args.format == JSON:
+        output = json.dumps(snapshot, indent=2) + "\n"
+    elif args.format == PROMETHEUS:
+        output = format_prometheus(snapshot)
+    else:
+        output = format_text(snapshot)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"stats written to {args.output}")
+    else:
+        sys.stdout.write(output)
+
+
+def format_text(snapshot: list[dict[str, any]]) -> str:
+    lines = []
+
+    for metric in snapshot:
+        if not metric["samples"]:
+            continue
+
+        lines.append(f"{metric['name']}  ({metric['help']})")
+
+        for sample in metric["samples"]:
+            labels = ", ".join(f"{key}={value}" for key, value in sample["labels"].items())
+            labels = f"  [{labels}]" if labels else "  [total]"
+
+            if metric["type"] != HISTOGRAM:
+                lines.append(f"{labels:48} {sample['value']:g}")
+                continue
+
+            count = sample["count"]
+            mean = sample["sum"] / count if count else 0.0
+            p50, p95, p99 = (
+                estimate_quantile(sample["buckets"], quantile)
+                for quantile in (0.5, 0.95, 0.99)
+            )
+
+            # durations are in seconds, shown in milliseconds
+            lines.append(
+                f"{labels:48} n={count} mean={mean * 1000:.2f}ms "
+                f"p50={p50 * 1000:.2f}ms p95={p95 * 1000:.2f}ms p99={p99 * 1000:.2f}ms"
+            )
+
+    return "\n".join(lines) + "\n"
@@ -2,7 +2,7 @@ import argparse
 import ssl
 
 from cli.utils import greet, show_loading_text
-from comms.client import connect_to_comms_server, listen_for_messages, send_message
+from comms.client import CommsClient, RequestError, connect_to_comms_server
 
 
 def start_interactive_mode(args: argparse.Namespace) -> None:
@@ -26,17 +26,30 @@ def on_server_connected(ssock: ssl.SSLSocket):
         with ssock:
             print("- Comms server connected\n")
 
-            socket_buffer = ""
+            client = CommsClient(ssock)
 
             while True:
                 prompt = input("> ").strip()
                 if prompt == "":
                     continue
 
-                send_message(ssock, prompt)
-                message, socket_buffer = listen_for_messages(ssock, socket_buffer)
+                print()
 
-                print(f"\n{message}\n")
+                is_streamed = False
 
-    except ssl.SSLEOFError:
+                def on_chunk(chunk: str):
+                    nonlocal is_streamed
+                    is_streamed = True
+                    print(chunk, end="", flush=True)
+
+                try:
+                    message = client.request(prompt, on_chunk).result()
+                except RequestError as err:
+                    print(f"\n[Error] Unable to answer: {err}\n")
+                    continue
+
+                # a streamed reply has already been rendered chunk by chunk
+                print("\n" if is_streamed else f"{message}\n")
+
+    except (ssl.SSLEOFError, ConnectionResetError):
         print("\n[Error] Comms server unavailable. Exiting...")
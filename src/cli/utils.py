@@ -2,10 +2,12 @@ import signal
 import threading
 import time
 from types import MethodType
-from art import text2art
 
 
 def greet(heading, subHeading):
+    # art loads all of its fonts on import, only the interactive mode needs them
+    from art import text2art
+
     banner = text2art(heading, "sub-zero") if heading else None
     bannerWidth = banner.index("\n") if heading else None
 
@@ -1,27 +1,92 @@
+from concurrent.futures import Future
+import itertools
+import os
 import socket
 import ssl
-from typing import Callable, Tuple
+import threading
+from typing import Callable
 
-from comms.utils import pack_msg
+from comms.framing import (
+    FRAMED,
+    KIND_CHUNK,
+    KIND_ERROR,
+    KIND_MESSAGE,
+    KIND_PING,
+    KIND_PONG,
+    KIND_STATS,
+    MAX_REQUEST_ID,
+    FrameReader,
+    encode_frame,
+    encode_message,
+)
+from comms.utils import (
+    get_is_owned_by_user,
+    get_is_unix_socket_supported,
+    get_unix_socket_path,
+)
 
-BUFFER_SIZE = 1024
+
+class RequestError(RuntimeError):
+    """The server answered a request with an error instead of a reply."""
+
+
+def get_client_ssl_context() -> ssl.SSLContext:
+    context = ssl.create_default_context()
+
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE  # bcz we are using self-signed certs
+
+    return context
+
+
+def open_tls_connection(
+    sock: socket.socket,
+    hostname: str,
+    context: ssl.SSLContext | None = None,
+) -> ssl.SSLSocket:
+    # performs the TLS handshake
+    context = context or get_client_ssl_context()
+
+    return context.wrap_socket(sock, server_hostname=hostname)
+
+
+def open_unix_connection(port: int) -> socket.socket | None:
+    # local clients skip TLS when the server listens on a unix socket
+    path = get_unix_socket_path(port)
+
+    if not get_is_unix_socket_supported() or not os.path.exists(path):
+        return None
+
+    if not get_is_owned_by_user(path):
+        # not our server, prompts must not go to another user's process
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+
+    return sock
 
 
 def connect_to_comms_server(
     hostname: str,
     port: int,
-    on_connect: Callable[[ssl.SSLSocket], None],
+    on_connect: Callable[[socket.socket | ssl.SSLSocket], None],
     on_error: Callable[[Exception], None],
     on_done: Callable[[], None],
+    prefer_unix_socket: bool = True,
 ) -> None:
     try:
-        context = ssl.create_default_context()
+        ssock = open_unix_connection(port) if prefer_unix_socket else None
 
-        context.check_hostname = False
-        context.verify_mode = ssl.CERT_NONE  # bcz we are using self-signed certs
+        if ssock is None:
+            sock = socket.create_connection((hostname, port))
+            ssock = open_tls_connection(sock, hostname)
 
-        sock = socket.create_connection((hostname, port))
-        ssock = context.wrap_socket(sock, server_hostname=hostname)
         ssock.setblocking(False)
 
         on_done()
@@ -31,35 +96,132 @@ def connect_to_comms_server(
         on_error(e)
 
 
-def send_message(ssock: ssl.SSLSocket, message: str) -> None:
+def send_message(ssock: ssl.SSLSocket, message: str, framing: str = FRAMED) -> None:
     # assuming opening and closing the ssock is handled externally
     parsed_message = message.strip()
     if parsed_message == "":
         return
 
-    ssock.sendall(pack_msg(parsed_message))
-
-
-def listen_for_messages(ssock: ssl.SSLSocket, init_buffer: str = "") -> Tuple[str, str]:
-    # assuming opening and closing the ssock is handled externally
-    buffer = init_buffer
-
-    ssock.setblocking(True)
-
-    while "\0" not in buffer:
-        chunk = ""
-
+    ssock.sendall(encode_message(parsed_message, framing))
+
+
+def listen_for_messages(
+    reader: FrameReader, on_chunk: Callable[[str], None] = lambda chunk: None
+) -> str:
+    # assuming opening and closing the underlying socket is handled externally
+    # raises ConnectionResetError once the socket has disconnected
+    # heartbeats are skipped, not answered. long-lived clients should use CommsClient
+    while True:
+        frame = reader.read_frame()
+
+        if frame.kind == KIND_CHUNK:
+            # part of a streamed reply, the complete reply follows
+            on_chunk(frame.payload)
+        elif frame.kind == KIND_MESSAGE:
+            return frame.payload
+        elif frame.kind == KIND_ERROR:
+            raise RequestError(frame.payload)
+
+
+class CommsClient:
+    """
+    Pipelined client for a connected comms socket.
+
+    Every request is tagged with a request id, so several requests can be in flight
+    on the same connection. Replies may arrive in any order and are matched back to
+    the future returned by `request`.
+    """
+
+    def __init__(self, sock: socket.socket | ssl.SSLSocket) -> None:
+        self.__sock = sock
+        self.__sock.setblocking(True)
+        self.__reader = FrameReader(sock, framing=FRAMED)
+
+        self.__lock = threading.Lock()
+        self.__request_ids = itertools.count(1)
+        self.__pending: dict[int, tuple[Future, Callable[[str], None] | None]] = {}
+        self.__error: Exception | None = None  # why the connection stopped, once it has
+
+        self.__listener = threading.Thread(
+            target=self.__listen_for_replies, name="comms-client", daemon=True
+        )
+        self.__listener.start()
+
+    def request(
+        self,
+        message: str,
+        on_chunk: Callable[[str], None] | None = None,
+        kind: int = KIND_MESSAGE,
+    ) -> Future:
+        """
+        Send a message and return a future resolving to the complete reply, or
+        failing with RequestError if the server could not answer it.
+        Chunks of a streamed reply are handed to on_chunk as they arrive.
+        With kind=KIND_STATS the reply is the server's metrics snapshot (json).
+        """
+        future = Future()
+        future.set_running_or_notify_cancel()
+
+        with self.__lock:
+            if self.__error is not None:
+                # no listener is left to resolve the future
+                future.set_exception(self.__error)
+                return future
+
+            request_id = next(self.__request_ids) % MAX_REQUEST_ID + 1
+            self.__pending[request_id] = (future, on_chunk)
+
+            try:
+                self.__sock.sendall(encode_frame(message, kind, request_id))
+            except Exception as err:
+                del self.__pending[request_id]
+                future.set_exception(err)
+
+        return future
+
+    def __listen_for_replies(self) -> None:
         try:
-            chunk = ssock.recv(BUFFER_SIZE).decode()
-            chunk = None if chunk == "" else chunk
-        except ssl.SSLWantReadError:
-            pass
-
-        if chunk is None:
-            break
-
-        buffer += chunk
-
-    message, remainder = buffer.split("\0", 1)
-
-    return message, remainder
+            while True:
+                frame = self.__reader.read_frame()
+
+                if frame.kind == KIND_PING:
+                    with self.__lock:
+                        self.__sock.sendall(encode_frame("", KIND_PONG))
+                    continue
+
+                if frame.kind not in (KIND_CHUNK, KIND_MESSAGE, KIND_STATS, KIND_ERROR):
+                    continue
+
+                with self.__lock:
+                    if frame.kind == KIND_CHUNK:
+                        future, on_chunk = self.__pending.get(
+                            frame.request_id, (None, None)
+                        )
+                    else:
+                        future, on_chunk = self.__pending.pop(
+                            frame.request_id, (None, None)
+                        )
+
+                if future is None:
+                    # not a reply to any of our requests
+                    continue
+
+                if frame.kind == KIND_CHUNK:
+                    if on_chunk is not None:
+                        on_chunk(frame.payload)
+                elif frame.kind == KIND_ERROR:
+                    future.set_exception(RequestError(frame.payload))
+                else:
+                    future.set_result(frame.payload)
+
+        except Exception as err:
+            with self.__lock:
+                self.__error = err
+                pending = list(self.__pending.values())
+                self.__pending.clear()
+
+            for future, _ in pending:
+                future.set_exception(err)
+
+    def close(self) -> None:
+        self.__sock.close()
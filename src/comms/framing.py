@@ -0,0 +1,277 @@
+import asyncio
+import socket
+import struct
+from typing import NamedTuple
+
+from comms.utils import pack_msg
+
+# Wire format (FRAMED):
+#
+#   +---------+------+------------+----------------+-------------------+
+#   | version | kind | request id | payload length | payload (utf-8)   |
+#   |  u8     |  u8  |  u32       |  u32           |  <length> bytes   |
+#   +---------+------+------------+----------------+-------------------+
+#
+# All integers are in network byte order. Replies (and reply chunks) carry the request
+# id of the message they answer, so several requests can be in flight on one connection
+# and be answered out of order. Request id 0 means "not part of a request".
+#
+# NUL_DELIMITED is the original protocol (utf-8 text terminated by "\0") and is kept
+# for compatibility with older peers. A reader without an explicit framing detects it
+# from the first two bytes received: framed peers always start with PROTOCOL_VERSION
+# followed by a known kind, control bytes that text does not contain. The one clash
+# left is a legacy message starting with 0x02 followed by 0x01-0x05, or one that is
+# just "\x02": legacy peers must not send those as their first message.
+
+PROTOCOL_VERSION = 2
+FRAME_HEADER = struct.Struct("!BBII")
+MAX_FRAME_SIZE = 16 * 1024 * 1024  # 16 MiB
+
+FRAMED = "framed"
+NUL_DELIMITED = "nul-delimited"
+
+KIND_MESSAGE = 0  # a complete message
+KIND_CHUNK = 1  # an incremental part of a reply, followed by a KIND_MESSAGE with the full reply
+KIND_PING = 2  # heartbeat from the server, must be answered with a KIND_PONG
+KIND_PONG = 3
+KIND_STATS = 4  # request for the server's metrics, answered with a KIND_STATS frame holding a json snapshot
+KIND_ERROR = 5  # the request failed, replaces its KIND_MESSAGE reply and holds the reason
+
+FRAME_KINDS = (KIND_MESSAGE, KIND_CHUNK, KIND_PING, KIND_PONG, KIND_STATS, KIND_ERROR)
+
+NO_REQUEST_ID = 0
+MAX_REQUEST_ID = 2**32 - 1
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+
+class FramingError(ValueError):
+    pass
+
+
+class Frame(NamedTuple):
+    kind: int
+    request_id: int
+    payload: str
+
+
+def encode_frame(
+    payload: str, kind: int = KIND_MESSAGE, request_id: int = NO_REQUEST_ID
+) -> bytes:
+    data = payload.encode()
+
+    if len(data) > MAX_FRAME_SIZE:
+        raise FramingError(
+            f"Frame payload of {len(data)} bytes exceeds limit of {MAX_FRAME_SIZE} bytes."
+        )
+
+    return FRAME_HEADER.pack(PROTOCOL_VERSION, kind, request_id, len(data)) + data
+
+
+def encode_message(
+    message: str,
+    framing: str = FRAMED,
+    kind: int = KIND_MESSAGE,
+    request_id: int = NO_REQUEST_ID,
+) -> bytes:
+    if framing == NUL_DELIMITED:
+        # the legacy protocol only knows complete messages, errors are sent as one
+        return pack_msg(message) if kind in (KIND_MESSAGE, KIND_ERROR) else b""
+
+    return encode_frame(message, kind, request_id)
+
+
+def detect_framing(prefix: bytes) -> str | None:
+    """Framing of a peer from the first bytes it sent, None if more are needed."""
+    if not prefix:
+        return None
+
+    if prefix[0] != PROTOCOL_VERSION:
+        return NUL_DELIMITED
+
+    if len(prefix) < 2:
+        return None
+
+    return FRAMED if prefix[1] in FRAME_KINDS else NUL_DELIMITED
+
+
+class FrameReader:
+    """
+    Incremental frame decoder for a blocking socket.
+
+    Data is received with `recv_into` straight into a reusable buffer and each payload
+    is decoded exactly once, from a memoryview over that buffer. The buffer only grows
+    when a single frame does not fit into it.
+    """
+
+    def __init__(
+        self,
+        sock: socket.socket,
+        framing: str | None = None,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+    ) -> None:
+        self.framing = framing  # None until detected from the first bytes
+
+        self.__sock = sock
+        self.__buffer = bytearray(buffer_size)
+        self.__view = memoryview(self.__buffer)
+        self.__start = 0  # first unconsumed byte
+        self.__end = 0  # end of received data
+        self.__scan = 0  # NUL_DELIMITED: bytes before this offset hold no terminator
+
+    def read_frame(self) -> Frame:
+        # raises ConnectionResetError once the peer disconnects
+        while True:
+            frame = self.__parse()
+
+            if frame is not None:
+                return frame
+
+            self.__fill()
+
+    def __fill(self) -> None:
+        if self.__end == len(self.__buffer):
+            self.__reserve(len(self.__buffer) - self.__start + 1)
+
+        received = self.__sock.recv_into(self.__view[self.__end :])
+
+        if received == 0:
+            raise ConnectionResetError("Connection closed by peer.")
+
+        self.__end += received
+
+    def __parse(self) -> Frame | None:
+        if self.__start == self.__end:
+            # everything consumed, rewind for free instead of compacting later
+            self.__start = self.__end = self.__scan = 0
+            return None
+
+        if self.framing is None:
+            prefix = self.__buffer[self.__start : min(self.__start + 2, self.__end)]
+            self.framing = detect_framing(prefix)
+
+            if self.framing is None:
+                return None
+
+        if self.framing == NUL_DELIMITED:
+            return self.__parse_nul_delimited()
+
+        return self.__parse_framed()
+
+    def __parse_framed(self) -> Frame | None:
+        available = self.__end - self.__start
+
+        if available < FRAME_HEADER.size:
+            return None
+
+        version, kind, request_id, length = FRAME_HEADER.unpack_from(
+            self.__buffer, self.__start
+        )
+
+        if version != PROTOCOL_VERSION:
+            raise FramingError(f"Unsupported protocol version: {version}.")
+
+        if length > MAX_FRAME_SIZE:
+            raise FramingError(
+                f"Frame payload of {length} bytes exceeds limit of {MAX_FRAME_SIZE} bytes."
+            )
+
+        frame_size = FRAME_HEADER.size + length
+
+        if available < frame_size:
+            self.__reserve(frame_size)
+            return None
+
+        payload_start = self.__start + FRAME_HEADER.size
+        payload = str(self.__view[payload_start : self.__start + frame_size], "utf-8")
+        self.__start += frame_size
+
+        return Frame(kind, request_id, payload)
+
+    def __parse_nul_delimited(self) -> Frame | None:
+        terminator = self.__buffer.find(
+            b"\0", max(self.__scan, self.__start), self.__end
+        )
+
+        if terminator == -1:
+            self.__scan = self.__end
+
+            if self.__end - self.__start > MAX_FRAME_SIZE:
+                raise FramingError(
+                    f"Message exceeds limit of {MAX_FRAME_SIZE} bytes without a terminator."
+                )
+
+            return None
+
+        payload = str(self.__view[self.__start : terminator], "utf-8")
+        self.__start = self.__scan = terminator + 1
+
+        return Frame(KIND_MESSAGE, NO_REQUEST_ID, payload)
+
+    def __reserve(self, size: int) -> None:
+        # make sure `size` bytes starting at self.__start fit into the buffer
+        if self.__start + size <= len(self.__buffer):
+            return
+
+        pending = self.__end - self.__start
+
+        if size <= len(self.__buffer):
+            # compact: only the partial frame is copied
+            self.__buffer[:pending] = self.__view[self.__start : self.__end].tobytes()
+        else:
+            buffer = bytearray(max(size, 2 * len(self.__buffer)))
+            buffer[:pending] = self.__view[self.__start : self.__end]
+
+            self.__view.release()
+            self.__buffer = buffer
+            self.__view = memoryview(self.__buffer)
+
+        self.__scan -= self.__start
+        self.__start = 0
+        self.__end = pending
+
+
+class AsyncFrameReader:
+    """Frame decoder for asyncio streams, with the same framing detection as FrameReader."""
+
+    def __init__(self, reader: asyncio.StreamReader, framing: str | None = None) -> None:
+        self.framing = framing
+
+        self.__reader = reader
+
+    async def read_frame(self) -> Frame:
+        # raises asyncio.IncompleteReadError once the peer disconnects
+        prefix = b""
+
+        while self.framing is None:
+            prefix += await self.__reader.readexactly(1)
+            self.framing = detect_framing(prefix)
+
+        if self.framing == NUL_DELIMITED:
+            data = prefix if prefix == b"\0" else prefix + await self.__read_until_nul()
+            return Frame(KIND_MESSAGE, NO_REQUEST_ID, data[:-1].decode())
+
+        header = prefix + await self.__reader.readexactly(
+            FRAME_HEADER.size - len(prefix)
+        )
+        version, kind, request_id, length = FRAME_HEADER.unpack(header)
+
+        if version != PROTOCOL_VERSION:
+            raise FramingError(f"Unsupported protocol version: {version}.")
+
+        if length > MAX_FRAME_SIZE:
+            raise FramingError(
+                f"Frame payload of {length} bytes exceeds limit of {MAX_FRAME_SIZE} bytes."
+            )
+
+        payload = await self.__reader.readexactly(length)
+
+        return Frame(kind, request_id, payload.decode())
+
+    async def __read_until_nul(self) -> bytes:
+        try:
+            return await self.__reader.readuntil(b"\0")
+        except asyncio.LimitOverrunError:
+            raise FramingError(
+                "Message exceeds the stream limit without a terminator."
+            ) from None
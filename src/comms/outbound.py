@@ -0,0 +1,162 @@
+import threading
+from collections import deque
+from typing import Callable, NamedTuple
+
+# What to do with a new frame while a connection's queue is above its high watermark
+BLOCK = "block"  # wait (up to BLOCK_TIMEOUT) until the queue drains below the low watermark
+DROP = "drop"  # discard the new frame
+DISCONNECT = "disconnect"  # close the connection
+
+SLOW_CONSUMER_POLICIES = (BLOCK, DROP, DISCONNECT)
+
+DEFAULT_HIGH_WATERMARK = 1024 * 1024  # 1 MiB
+DEFAULT_LOW_WATERMARK = 256 * 1024  # 256 KiB
+BLOCK_TIMEOUT = 30.0
+
+
+class OutboundQueueSettings(NamedTuple):
+    high_watermark: int = DEFAULT_HIGH_WATERMARK
+    low_watermark: int = DEFAULT_LOW_WATERMARK
+    slow_consumer_policy: str = BLOCK
+
+
+def validate_outbound_settings(settings: OutboundQueueSettings) -> None:
+    if settings.slow_consumer_policy not in SLOW_CONSUMER_POLICIES:
+        raise ValueError(
+            f"Unknown slow consumer policy: '{settings.slow_consumer_policy}'."
+        )
+
+    if not 0 <= settings.low_watermark <= settings.high_watermark:
+        raise ValueError("Outbound queue watermarks must satisfy 0 <= low <= high.")
+
+
+class OutboundQueue:
+    """
+    Bounded, thread-safe queue of encoded frames waiting to be written to one connection.
+
+    Depth is measured in bytes and includes frames the writer has taken but not yet
+    released, i.e. everything not yet handed to the OS. Once the depth reaches the high
+    watermark the queue is paused until the writer drains it down to the low watermark,
+    and the slow consumer policy decides what happens to frames put in the meantime.
+    """
+
+    def __init__(
+        self,
+        settings: OutboundQueueSettings,
+        on_ready: Callable[[], None] = lambda: None,
+        on_disconnect: Callable[[], None] = lambda: None,
+    ) -> None:
+        validate_outbound_settings(settings)
+
+        self.settings = settings
+
+        self.__on_ready = on_ready  # called after a frame was queued or the queue was closed
+        self.__on_disconnect = on_disconnect
+
+        self.__condition = threading.Condition()
+        self.__frames: deque[bytes] = deque()
+        self.__depth = 0
+        self.__is_paused = False
+        self.__is_closed = False
+
+        self.__max_depth = 0
+        self.__sent_frames = 0
+        self.__sent_bytes = 0
+        self.__dropped_frames = 0
+        self.__blocked_puts = 0
+
+    def put(self, data: bytes, block: bool = True) -> bool:
+        """
+        Queue a frame. Returns False if it was dropped or the connection is gone.
+        With block=False a paused queue drops the frame instead of applying the policy.
+        """
+        is_disconnecting = False
+
+        with self.__condition:
+            if self.__is_paused and not self.__is_closed and block:
+                policy = self.settings.slow_consumer_policy
+
+                if policy == BLOCK:
+                    self.__blocked_puts += 1
+                    self.__condition.wait_for(
+                        lambda: not self.__is_paused or self.__is_closed,
+                        timeout=BLOCK_TIMEOUT,
+                    )
+                elif policy == DISCONNECT:
+                    is_disconnecting = True
+
+            if self.__is_closed or self.__is_paused or is_disconnecting:
+                self.__dropped_frames += 1
+                is_queued = False
+            else:
+                self.__frames.append(data)
+                self.__depth += len(data)
+                self.__max_depth = max(self.__max_depth, self.__depth)
+                self.__is_paused = self.__depth >= self.settings.high_watermark
+                self.__condition.notify_all()
+                is_queued = True
+
+        if is_disconnecting:
+            self.__on_disconnect()
+        elif is_queued:
+            self.__on_ready()
+
+        return is_queued
+
+    def take(self) -> list[bytes]:
+        """Writer side: take every queued frame without waiting."""
+        with self.__condition:
+            frames = list(self.__frames)
+            self.__frames.clear()
+
+        return frames
+
+    def wait_and_take(self) -> list[bytes] | None:
+        """Writer side: wait for frames. Returns None once the queue is closed and empty."""
+        with self.__condition:
+            self.__condition.wait_for(lambda: self.__frames or self.__is_closed)
+
+            if not self.__frames:
+                return None
+
+            frames = list(self.__frames)
+            self.__frames.clear()
+
+        return frames
+
+    def release(self, frames: list[bytes]) -> None:
+        """Writer side: mark frames returned by take/wait_and_take as written."""
+        size = sum(map(len, frames))
+
+        with self.__condition:
+            self.__depth -= size
+            self.__sent_frames += len(frames)
+            self.__sent_bytes += size
+
+            if self.__is_paused and self.__depth <= self.settings.low_watermark:
+                self.__is_paused = False
+                self.__condition.notify_all()
+
+    def close(self) -> None:
+        with self.__condition:
+            self.__is_closed = True
+            self.__condition.notify_all()
+
+        self.__on_ready()
+
+    @property
+    def is_closed(self) -> bool:
+        return self.__is_closed
+
+    def stats(self) -> dict[str, int | bool]:
+        with self.__condition:
+            return {
+                "depth_bytes": self.__depth,
+                "depth_frames": len(self.__frames),
+                "max_depth_bytes": self.__max_depth,
+                "sent_frames": self.__sent_frames,
+                "sent_bytes": self.__sent_bytes,
+                "dropped_frames": self.__dropped_frames,
+                "blocked_puts": self.__blocked_puts,
+                "is_paused": self.__is_paused,
+            }
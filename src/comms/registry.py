@@ -0,0 +1,166 @@
+import itertools
+import threading
+import time
+from typing import Callable, NamedTuple
+
+from comms.server import SocketConnection, StreamConnection
+
+DEFAULT_HEARTBEAT_INTERVAL = 30.0
+DEFAULT_HEARTBEAT_TIMEOUT = 10.0
+
+EVICT_DEAD = "dead"  # no pong within the heartbeat timeout
+EVICT_IDLE = "idle"  # no message within the idle timeout
+
+Connection = SocketConnection | StreamConnection
+
+
+class HeartbeatSettings(NamedTuple):
+    interval: float = DEFAULT_HEARTBEAT_INTERVAL  # ping connections quiet for this long
+    timeout: float = DEFAULT_HEARTBEAT_TIMEOUT  # evict if the pong takes longer
+    idle_timeout: float | None = None  # evict connections without messages for this long
+
+
+class ConnectionRecord:
+    __slots__ = (
+        "connection",
+        "connected_at",
+        "last_seen",
+        "last_active",
+        "ping_sent_at",
+    )
+
+    def __init__(self, connection: Connection, now: float) -> None:
+        self.connection = connection
+        self.connected_at = now
+        self.last_seen = now  # any frame, including pongs
+        self.last_active = now  # user messages only
+        self.ping_sent_at = None
+
+
+class ConnectionRegistry:
+    """
+    Thread-safe registry of open connections.
+
+    Connection ids come from a monotonic counter and are never reused. Lookups are
+    O(1) and never touch the socket; liveness is tracked from inbound traffic instead,
+    with heartbeats for quiet connections and a background reaper that evicts dead
+    and (optionally) idle ones.
+    """
+
+    def __init__(self, heartbeat_settings: HeartbeatSettings = HeartbeatSettings()) -> None:
+        self.heartbeat_settings = heartbeat_settings
+
+        self.__lock = threading.Lock()
+        self.__connection_ids = itertools.count(1)
+        self.__records: dict[int, ConnectionRecord] = {}
+
+        self.__stop_reaper = threading.Event()
+        self.__reaper = None
+
+    def register(self, connection: Connection) -> int:
+        with self.__lock:
+            connection_id = next(self.__connection_ids)
+            self.__records[connection_id] = ConnectionRecord(
+                connection, time.monotonic()
+            )
+
+        return connection_id
+
+    def unregister(self, connection_id: int) -> Connection | None:
+        with self.__lock:
+            record = self.__records.pop(connection_id, None)
+
+        return None if record is None else record.connection
+
+    def get(self, connection_id: int) -> Connection | None:
+        record = self.__records.get(connection_id)
+        return None if record is None else record.connection
+
+    def touch(self, connection_id: int, is_activity: bool = True) -> None:
+        """Record inbound traffic. Pongs and other control frames are not activity."""
+        record = self.__records.get(connection_id)
+
+        if record is None:
+            return
+
+        now = time.monotonic()
+        record.last_seen = now
+        record.ping_sent_at = None
+
+        if is_activity:
+            record.last_active = now
+
+    def items(self) -> list[tuple[int, Connection]]:
+        with self.__lock:
+            return [
+                (connection_id, record.connection)
+                for connection_id, record in self.__records.items()
+            ]
+
+    def __len__(self) -> int:
+        return len(self.__records)
+
+    def stats(self) -> dict[int, dict[str, float]]:
+        now = time.monotonic()
+
+        with self.__lock:
+            return {
+                connection_id: {
+                    "connected_s": now - record.connected_at,
+                    "idle_s": now - record.last_active,
+                    "since_seen_s": now - record.last_seen,
+                }
+                for connection_id, record in self.__records.items()
+            }
+
+    def reap(self, on_evict: Callable[[int, Connection, str], None]) -> None:
+        """Ping quiet connections and evict dead or idle ones. Called by the reaper."""
+        settings = self.heartbeat_settings
+        now = time.monotonic()
+
+        to_ping = []
+        to_evict = []
+
+        with self.__lock:
+            for connection_id, record in self.__records.items():
+                if (
+                    settings.idle_timeout is not None
+                    and now - record.last_active > settings.idle_timeout
+                ):
+                    to_evict.append((connection_id, record, EVICT_IDLE))
+                elif record.ping_sent_at is not None:
+                    if now - record.ping_sent_at > settings.timeout:
+                        to_evict.append((connection_id, record, EVICT_DEAD))
+                elif now - record.last_seen > settings.interval:
+                    to_ping.append(record)
+
+        for record in to_ping:
+            # set first, the pong may arrive before send_ping returns
+            record.ping_sent_at = now
+
+            if not record.connection.send_ping():
+                # legacy peer, or one too slow to take more frames right now
+                record.ping_sent_at = None
+
+        for connection_id, record, reason in to_evict:
+            self.unregister(connection_id)
+            on_evict(connection_id, record.connection, reason)
+
+    def start_reaper(self, on_evict: Callable[[int, Connection, str], None]) -> None:
+        settings = self.heartbeat_settings
+        period = min(settings.interval, settings.timeout) / 2
+
+        if settings.idle_timeout is not None:
+            period = min(period, settings.idle_timeout / 2)
+
+        def reap_periodically():
+            while not self.__stop_reaper.wait(period):
+                self.reap(on_evict)
+
+        self.__reaper = threading.Thread(
+            target=reap_periodically, name="comms-reaper", daemon=True
+        )
+        self.__reaper.start()
+
+    def stop_reaper(self) -> None:
+        self.__stop_reaper.set()
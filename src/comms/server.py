@@ -1,7 +1,22 @@
+import asyncio
+import os
 import socket
 import ssl
+import stat
 import threading
-from typing import Callable
+from typing import Awaitable, Callable
+
+from comms.framing import (
+    FRAMED,
+    KIND_MESSAGE,
+    KIND_PING,
+    MAX_FRAME_SIZE,
+    NO_REQUEST_ID,
+    encode_frame,
+    encode_message,
+)
+from comms.outbound import OutboundQueue, OutboundQueueSettings
+from comms.utils import make_private_dir
 
 
 BUFFER_SIZE = 1024
@@ -9,6 +24,15 @@ BUFFER_SIZE = 1024
 CERT_FILE = "server.crt"
 KEY_FILE = "server.key"
 
+UNIX_SOCKET_MODE = 0o600  # owner only
+
+
+def get_server_ssl_context() -> ssl.SSLContext:
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certfile=CERT_FILE, keyfile=KEY_FILE)
+
+    return context
+
 
 def start_server(
     hostname: str,
@@ -23,8 +47,7 @@ def start_server(
         sock.bind((hostname, port))
         sock.listen()
 
-        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-        context.load_cert_chain(certfile=CERT_FILE, keyfile=KEY_FILE)
+        context = get_server_ssl_context()
 
         ssock = context.wrap_socket(sock, server_side=True)
         ssock.setblocking(True)
@@ -37,6 +60,59 @@ def start_server(
         on_error(err)
 
 
+def start_unix_server(
+    path: str,
+    on_start: Callable[[socket.socket], None],
+    on_error: Callable[[Exception], None],
+    on_done: Callable[[], None] = lambda: None,
+) -> None:
+    # plain, unencrypted socket. access is restricted by filesystem permissions
+    try:
+        make_private_dir(os.path.dirname(path))
+        remove_stale_unix_socket(path)
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(path)
+        os.chmod(path, UNIX_SOCKET_MODE)
+        sock.listen()
+        sock.setblocking(True)
+
+        on_done()
+        on_start(sock)
+
+    except Exception as err:
+        on_done()
+        on_error(err)
+
+
+def remove_stale_unix_socket(path: str) -> None:
+    # a socket file left behind by a server that did not shut down cleanly
+    # would make bind() fail. refuse to take over one that is still served
+    if not os.path.exists(path):
+        return
+
+    if not stat.S_ISSOCK(os.stat(path).st_mode):
+        raise FileExistsError(f"{path} exists and is not a socket.")
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+    else:
+        raise FileExistsError(f"Another server is already listening on {path}.")
+    finally:
+        probe.close()
+
+
+def remove_unix_socket(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
 def listen_for_connections(
     ssock: ssl.SSLSocket,
     shutdown_signal: threading.Event,
@@ -60,3 +136,190 @@ def get_is_socket_connected(ssock: ssl.SSLSocket) -> bool:
         return True
     except (socket.error, ssl.SSLError):
         return False
+
+
+async def start_async_server(
+    hostname: str,
+    port: int,
+    on_client_connected: Callable[
+        [asyncio.StreamReader, asyncio.StreamWriter], Awaitable[None]
+    ],
+) -> asyncio.AbstractServer:
+    # must be awaited on the event loop that will serve the connections
+    return await asyncio.start_server(
+        on_client_connected,
+        host=hostname,
+        port=port,
+        ssl=get_server_ssl_context(),
+        reuse_address=True,
+        limit=MAX_FRAME_SIZE,
+    )
+
+
+async def start_async_unix_server(
+    path: str,
+    on_client_connected: Callable[
+        [asyncio.StreamReader, asyncio.StreamWriter], Awaitable[None]
+    ],
+) -> asyncio.AbstractServer:
+    make_private_dir(os.path.dirname(path))
+    remove_stale_unix_socket(path)
+
+    server = await asyncio.start_unix_server(
+        on_client_connected, path=path, limit=MAX_FRAME_SIZE
+    )
+    os.chmod(path, UNIX_SOCKET_MODE)
+
+    return server
+
+
+class SocketConnection:
+    """
+    Handle to a client connected to the threaded server.
+    Frames are queued and written by a dedicated writer thread, so `send` never blocks
+    on a slow reader unless the slow consumer policy says so.
+    """
+
+    def __init__(
+        self,
+        sock: socket.socket | ssl.SSLSocket,
+        outbound_settings: OutboundQueueSettings = OutboundQueueSettings(),
+    ) -> None:
+        self.framing = None  # unknown until the peer's first frame is read
+
+        self.__sock = sock
+        self.outbound = OutboundQueue(outbound_settings, on_disconnect=self.close)
+
+        self.__writer_thread = threading.Thread(
+            target=self.__drain_outbound, name="comms-writer", daemon=True
+        )
+        self.__writer_thread.start()
+
+    def __drain_outbound(self) -> None:
+        try:
+            while (frames := self.outbound.wait_and_take()) is not None:
+                for frame in frames:
+                    self.__sock.sendall(frame)
+
+                self.outbound.release(frames)
+        except OSError:
+            self.close()
+
+    def send(self, data: bytes, block: bool = True) -> int:
+        return len(data) if self.outbound.put(data, block) else 0
+
+    def send_message(
+        self,
+        message: str,
+        kind: int = KIND_MESSAGE,
+        request_id: int = NO_REQUEST_ID,
+        block: bool = True,
+    ) -> int:
+        data = encode_message(message, self.framing, kind, request_id)
+        return self.send(data, block) if data else 0
+
+    def send_ping(self) -> bool:
+        if self.framing != FRAMED:
+            # legacy peers do not understand control frames
+            return False
+
+        # never blocks: a paused queue means the peer is slow, not dead
+        return self.outbound.put(encode_frame("", KIND_PING), block=False)
+
+    def is_connected(self) -> bool:
+        return not self.outbound.is_closed and get_is_socket_connected(self.__sock)
+
+    def close(self) -> None:
+        self.outbound.close()
+
+        try:
+            # wakes up the reader blocked in recv, unlike a plain close()
+            self.__sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        self.__sock.close()
+
+    def abort(self) -> None:
+        self.close()
+
+
+class StreamConnection:
+    """
+    Handle to a client connected to an asyncio stream server.
+    Frames are queued and written by a writer task on the owning event loop, so `send`
+    is safe to call from any thread other than the loop's own.
+    """
+
+    def __init__(
+        self,
+        writer: asyncio.StreamWriter,
+        loop: asyncio.AbstractEventLoop,
+        outbound_settings: OutboundQueueSettings = OutboundQueueSettings(),
+    ) -> None:
+        # must be created on the loop
+        self.framing = None  # unknown until the peer's first frame is read
+
+        self.__writer = writer
+        self.__loop = loop
+        self.__is_outbound_ready = asyncio.Event()
+
+        self.outbound = OutboundQueue(
+            outbound_settings,
+            on_ready=lambda: self.__loop.call_soon_threadsafe(
+                self.__is_outbound_ready.set
+            ),
+            on_disconnect=self.abort,
+        )
+
+        self.__writer_task = loop.create_task(self.__drain_outbound())
+
+    async def __drain_outbound(self) -> None:
+        try:
+            while True:
+                await self.__is_outbound_ready.wait()
+                self.__is_outbound_ready.clear()
+
+                frames = self.outbound.take()
+
+                if frames:
+                    self.__writer.writelines(frames)
+                    await self.__writer.drain()
+                    self.outbound.release(frames)
+                elif self.outbound.is_closed:
+                    break
+        except (ConnectionError, ssl.SSLError):
+            self.close()
+
+    def send(self, data: bytes, block: bool = True) -> int:
+        return len(data) if self.outbound.put(data, block) else 0
+
+    def send_message(
+        self,
+        message: str,
+        kind: int = KIND_MESSAGE,
+        request_id: int = NO_REQUEST_ID,
+        block: bool = True,
+    ) -> int:
+        data = encode_message(message, self.framing, kind, request_id)
+        return self.send(data, block) if data else 0
+
+    def send_ping(self) -> bool:
+        if self.framing != FRAMED:
+            # legacy peers do not understand control frames
+            return False
+
+        # never blocks: a paused queue means the peer is slow, not dead
+        return self.outbound.put(encode_frame("", KIND_PING), block=False)
+
+    def is_connected(self) -> bool:
+        return not self.outbound.is_closed and not self.__writer.is_closing()
+
+    def close(self) -> None:
+        self.outbound.close()
+        self.__loop.call_soon_threadsafe(self.__writer.close)
+
+    def abort(self) -> None:
+        # unlike close(), does not wait for buffered data to reach a peer that is not reading
+        self.outbound.close()
+        self.__loop.call_soon_threadsafe(self.__writer.transport.abort)
@@ -1,2 +1,44 @@
+import os
+import socket
+import stat
+import tempfile
+
+UNIX_SOCKET_DIR_MODE = 0o700  # owner only
+
+
 def pack_msg(msg) -> bytes:
     return msg.encode() + b"\0"
+
+
+def get_is_unix_socket_supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+def get_unix_socket_path(port: int) -> str:
+    # keyed by the comms port, so `yo -p <port>` finds the matching server. the
+    # directory belongs to the user alone, so no one else can bind the path first
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(
+        tempfile.gettempdir(), f"yoda-{os.getuid()}"
+    )
+
+    return os.path.join(runtime_dir, f"yoda-comms-{port}.sock")
+
+
+def make_private_dir(path: str) -> None:
+    """Create `path` for the current user only, or check that it already is."""
+    os.makedirs(path, mode=UNIX_SOCKET_DIR_MODE, exist_ok=True)
+
+    info = os.lstat(path)
+
+    if not stat.S_ISDIR(info.st_mode):
+        raise NotADirectoryError(f"{path} is not a directory.")
+
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"{path} belongs to another user.")
+
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        raise PermissionError(f"{path} is accessible by other users.")
+
+
+def get_is_owned_by_user(path: str) -> bool:
+    return os.lstat(path).st_uid == os.getuid()
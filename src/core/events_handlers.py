@@ -1,12 +1,20 @@
+import time
+
 from langchain_core.messages import ChatMessage
 from app_streams.events import (
+    AGENT_MODEL_LOAD_ERR,
+    AGENT_MODEL_LOAD_OK,
+    AGENT_MODEL_LOAD_START,
     AGENT_OFFLINE,
     AGENT_ONLINE,
     COMMS_OFFLINE,
     COMMS_ONLINE,
+    COMMS_UNIX_OFFLINE,
+    COMMS_UNIX_ONLINE,
     CORE_SYS_FINISH,
     LLM_OFFLINE,
     LLM_ONLINE,
+    USR_CONN_EVICTED,
     USR_CONN_OK,
     USR_DISCONN_OK,
     USR_REQ_SHUTDN,
@@ -17,9 +25,10 @@ from app_streams.events import (
 )
 from windows_toasts import WindowsToaster, Toast
 
-from comms.utils import pack_msg
-from core.services import CommsServer
+from comms.framing import KIND_CHUNK, KIND_ERROR
+from core.services import AsyncCommsServer, CommsServer
 from llm.agent import Agent
+from llm.stub_agent import StubAgent
 
 
 def on_core_system_ready(event: SystemEvent, event_stream: AppEventStream):
@@ -44,18 +53,27 @@ def on_core_system_ready(event: SystemEvent, event_stream: AppEventStream):
     elif event.message in [
         COMMS_ONLINE,
         COMMS_OFFLINE,
+        COMMS_UNIX_ONLINE,
+        COMMS_UNIX_OFFLINE,
         LLM_ONLINE,
         LLM_OFFLINE,
         AGENT_ONLINE,
         AGENT_OFFLINE,
+        AGENT_MODEL_LOAD_START,
+        AGENT_MODEL_LOAD_ERR,
     ]:
         print(f"[ {event.message} ]")
+    elif event.message == AGENT_MODEL_LOAD_OK:
+        print(f"[ {event.message} ] ({event.data['duration']:.2f}s)")
     elif event.message in [
         USR_CONN_OK,
         USR_DISCONN_OK,
     ]:
         connection_id = event.data["connection_id"]
         print(f"[ {connection_id} ] {event.message}")
+    elif event.message == USR_CONN_EVICTED:
+        connection_id = event.data["connection_id"]
+        print(f"[ {connection_id} ] {event.message} ({event.data['reason']})")
     elif event.message == USR_REQ_SHUTDN:
         print(event.message)
 
@@ -63,17 +81,79 @@ def on_core_system_ready(event: SystemEvent, event_stream: AppEventStream):
 def on_user_message(
     event: UserMessageEvent,
     event_stream: AppEventStream,
-    comms_server: CommsServer,
-    agent: Agent,
+    comms_server: AsyncCommsServer | CommsServer,
+    agent: Agent | StubAgent,
+    stream_replies: bool = True,
 ):
     try:
         connection_id = event.data
+        connection = comms_server.get_connection_by_id(connection_id)
 
-        response = agent.invoke(
-            ChatMessage(role=UserMessageEvent.type, content=event.message)
-        )
+        if connection is None:
+            # disconnected while the message was queued, nobody to reply to
+            return
+
+        on_token = None
+
+        if stream_replies:
+
+            def on_token(token: str):
+                connection.send_message(
+                    token, kind=KIND_CHUNK, request_id=event.request_id
+                )
+
+        started_at = time.perf_counter()
+        status = "error"
+        route_reports = []
 
-        comms_server.get_connection_by_id(event.data).send(pack_msg(response))
-        event_stream.push(AgentMessageEvent(response, connection_id))
+        try:
+            response = agent.invoke(
+                ChatMessage(role=UserMessageEvent.type, content=event.message),
+                connection_id,
+                on_token=on_token,
+                on_routed=route_reports.append,
+            )
+            status = "ok"
+        except Exception as err:
+            # the client waits for an answer to this request, fail it instead
+            if comms_server.get_connection_by_id(connection_id) is not None:
+                connection.send_message(
+                    str(err) or err.__class__.__name__,
+                    kind=KIND_ERROR,
+                    request_id=event.request_id,
+                )
+
+            raise
+        finally:
+            observe_agent_invocation(
+                event_stream, time.perf_counter() - started_at, status
+            )
+
+        if comms_server.get_connection_by_id(connection_id) is not None:
+            connection.send_message(response, request_id=event.request_id)
+        # otherwise disconnected while the agent was busy
+
+        event_stream.push(
+            AgentMessageEvent(
+                response,
+                connection_id,
+                event.request_id,
+                # per request, the metrics only have the totals
+                route=route_reports[-1]._asdict() if route_reports else None,
+            )
+        )
     except Exception as e:
         print(e)
+
+
+def observe_agent_invocation(
+    event_stream: AppEventStream, duration: float, status: str
+) -> None:
+    event_stream.metrics.counter(
+        "yoda_agent_invocations_total", "Agent invocations by outcome.", ("status",)
+    ).inc(status=status)
+    event_stream.metrics.histogram(
+        "yoda_agent_invocation_duration_seconds",
+        "Time taken by the agent to produce a complete reply.",
+        ("status",),
+    ).observe(duration, status=status)
@@ -0,0 +1,239 @@
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Executor, Future
+import itertools
+import threading
+import time
+from typing import NamedTuple
+
+# Named pools, so that one class of work cannot starve or deadlock the others
+COMMS_POOL = "comms"  # comms server startup, per-connection listeners (long-lived), message pushes
+HOOKS_POOL = "hooks"  # event hooks
+LLM_POOL = "llm"  # agent invocations
+SERVICES_POOL = "services"  # other service lifecycles, e.g. supervising the llm server
+
+DEFAULT_IDLE_TIMEOUT = 60.0
+
+
+class PoolSettings(NamedTuple):
+    min_workers: int = 0
+    max_workers: int = 16
+    idle_timeout: float = DEFAULT_IDLE_TIMEOUT  # seconds before an idle worker above min_workers exits
+
+
+DEFAULT_POOL_SETTINGS = {
+    # the threaded comms server keeps one worker per open connection
+    COMMS_POOL: PoolSettings(min_workers=2, max_workers=256),
+    HOOKS_POOL: PoolSettings(min_workers=1, max_workers=16),
+    LLM_POOL: PoolSettings(min_workers=1, max_workers=8),
+    SERVICES_POOL: PoolSettings(min_workers=0, max_workers=4),
+}
+
+
+def validate_pool_settings(settings: PoolSettings) -> None:
+    if not 0 <= settings.min_workers <= settings.max_workers:
+        raise ValueError("Pool sizes must satisfy 0 <= min <= max.")
+
+    if settings.max_workers < 1:
+        raise ValueError("Pools need at least one worker.")
+
+    if settings.idle_timeout <= 0:
+        raise ValueError("Pool idle timeout must be positive.")
+
+
+def parse_pool_setting(value: str) -> tuple[str, PoolSettings]:
+    """Parse a NAME=MIN:MAX command line value."""
+    name, sep, sizes = value.partition("=")
+    min_workers, sep_sizes, max_workers = sizes.partition(":")
+
+    if not (name and sep and sep_sizes):
+        raise ValueError(f"Expected NAME=MIN:MAX, received: '{value}'.")
+
+    if name not in DEFAULT_POOL_SETTINGS:
+        raise ValueError(f"Unknown pool: '{name}'.")
+
+    settings = DEFAULT_POOL_SETTINGS[name]._replace(
+        min_workers=int(min_workers), max_workers=int(max_workers)
+    )
+    validate_pool_settings(settings)
+
+    return name, settings
+
+
+class ElasticThreadPoolExecutor(Executor):
+    """
+    Thread pool that grows with load and shrinks when idle.
+
+    A new worker is started whenever work is submitted and no worker is idle, up to
+    max_workers; after that work waits in an unbounded FIFO queue. Workers above
+    min_workers exit after idle_timeout seconds without work.
+    """
+
+    def __init__(self, name: str, settings: PoolSettings = PoolSettings()) -> None:
+        validate_pool_settings(settings)
+
+        self.name = name
+        self.settings = settings
+
+        self.__condition = threading.Condition()
+        self.__work: deque[tuple[Future, Callable, tuple, dict, float]] = deque()
+        self.__workers: set[threading.Thread] = set()
+        self.__idle_workers = 0
+        self.__busy_workers = 0
+        self.__is_shutdown = False
+        self.__worker_ids = itertools.count(1)
+
+        self.__peak_workers = 0
+        self.__max_queued = 0
+        self.__submitted = 0
+        self.__completed = 0
+        self.__saturated_submits = 0
+        self.__queue_wait_total = 0.0
+
+        with self.__condition:
+            for _ in range(settings.min_workers):
+                self.__start_worker()
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        future = Future()
+
+        with self.__condition:
+            if self.__is_shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+
+            self.__work.append((future, fn, args, kwargs, time.monotonic()))
+            self.__submitted += 1
+            self.__max_queued = max(self.__max_queued, len(self.__work))
+
+            if self.__idle_workers >= len(self.__work):
+                self.__condition.notify()
+            elif len(self.__workers) < self.settings.max_workers:
+                self.__start_worker()
+            else:
+                # every worker is busy, the work has to wait
+                self.__saturated_submits += 1
+
+        return future
+
+    def __start_worker(self) -> None:
+        worker = threading.Thread(
+            target=self.__run_worker,
+            name=f"{self.name}-pool_{next(self.__worker_ids)}",
+            daemon=True,
+        )
+        self.__workers.add(worker)
+        self.__peak_workers = max(self.__peak_workers, len(self.__workers))
+        worker.start()
+
+    def __run_worker(self) -> None:
+        worker = threading.current_thread()
+
+        while True:
+            with self.__condition:
+                self.__idle_workers += 1
+                self.__condition.wait_for(
+                    lambda: self.__work or self.__is_shutdown,
+                    timeout=self.settings.idle_timeout,
+                )
+                self.__idle_workers -= 1
+
+                if not self.__work:
+                    if (
+                        self.__is_shutdown
+                        or len(self.__workers) > self.settings.min_workers
+                    ):
+                        self.__workers.discard(worker)
+                        return
+
+                    continue
+
+                future, fn, args, kwargs, queued_at = self.__work.popleft()
+                self.__queue_wait_total += time.monotonic() - queued_at
+                self.__busy_workers += 1
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as err:
+                    future.set_exception(err)
+                else:
+                    future.set_result(result)
+
+                # drop references before waiting for more work
+                del future, fn, args, kwargs
+
+            with self.__condition:
+                self.__busy_workers -= 1
+                self.__completed += 1
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self.__condition:
+            self.__is_shutdown = True
+
+            if cancel_futures:
+                while self.__work:
+                    self.__work.popleft()[0].cancel()
+
+            self.__condition.notify_all()
+            workers = list(self.__workers)
+
+        if wait:
+            for worker in workers:
+                if worker is not threading.current_thread():
+                    worker.join()
+
+    def stats(self) -> dict[str, int | float]:
+        with self.__condition:
+            started = self.__submitted - len(self.__work)
+
+            return {
+                "min_workers": self.settings.min_workers,
+                "max_workers": self.settings.max_workers,
+                "workers": len(self.__workers),
+                "busy_workers": self.__busy_workers,
+                "peak_workers": self.__peak_workers,
+                "queued": len(self.__work),
+                "max_queued": self.__max_queued,
+                "submitted": self.__submitted,
+                "completed": self.__completed,
+                "saturated_submits": self.__saturated_submits,
+                "utilisation": self.__busy_workers / self.settings.max_workers,
+                "mean_queue_wait_ms": (
+                    1000 * self.__queue_wait_total / started if started else 0.0
+                ),
+            }
+
+
+class ExecutorRegistry:
+    """Named, separately sized executors. Pools are created on first use."""
+
+    def __init__(self, pool_settings: dict[str, PoolSettings] | None = None) -> None:
+        self.pool_settings = {**DEFAULT_POOL_SETTINGS, **(pool_settings or {})}
+
+        self.__lock = threading.Lock()
+        self.__executors: dict[str, ElasticThreadPoolExecutor] = {}
+
+    def get(self, name: str) -> ElasticThreadPoolExecutor:
+        executor = self.__executors.get(name)
+
+        if executor is not None:
+            return executor
+
+        with self.__lock:
+            if name not in self.__executors:
+                self.__executors[name] = ElasticThreadPoolExecutor(
+                    name, self.pool_settings.get(name, PoolSettings())
+                )
+
+            return self.__executors[name]
+
+    def stats(self) -> dict[str, dict[str, int | float]]:
+        return {name: executor.stats() for name, executor in self.__executors.items()}
+
+    def shutdown(self, names: list[str] | None = None, wait: bool = True) -> None:
+        """Shut down the given pools (all of them by default), in that order."""
+        for name in names if names is not None else list(self.__executors):
+            executor = self.__executors.get(name)
+
+            if executor is not None:
+                executor.shutdown(wait=wait)
@@ -1,10 +1,10 @@
 import argparse
-from concurrent.futures import ThreadPoolExecutor
 import signal
 import threading
 import time
 
 
+from app_streams.async_events import AsyncAppEventStream
 from app_streams.events import (
     CORE_SYS_FINISH,
     CORE_SYS_START,
@@ -13,16 +13,39 @@ from app_streams.events import (
     SystemEvent,
     UserMessageEvent,
 )
+from app_streams.event_log import EventLogSettings, SegmentedEventLog
+from app_streams.metrics import (
+    MetricsRegistry,
+    start_metrics_file_writer,
+    write_prometheus_file,
+)
+from core.executors import (
+    COMMS_POOL,
+    HOOKS_POOL,
+    LLM_POOL,
+    SERVICES_POOL,
+    ExecutorRegistry,
+)
 from core.events_handlers import (
     on_core_system_ready,
     on_user_message,
 )
 
-from core.services import CommsServer
+from core.services import AsyncCommsServer, CommsServer
 from core.services.llm_server import OllamaServer
 from core.utils import poll_and_wait_for
+from comms.outbound import OutboundQueueSettings, validate_outbound_settings
+from comms.registry import HeartbeatSettings
+from comms.utils import get_is_unix_socket_supported, get_unix_socket_path
 
 from llm.agent import Agent
+from llm.agent.context import ContextSettings, validate_context_settings
+from llm.agent.response_cache import (
+    ResponseCacheSettings,
+    validate_response_cache_settings,
+)
+from llm.agent.router import RouterSettings, validate_router_settings
+from llm.stub_agent import StubAgent
 
 
 def start_core_system(args: argparse.Namespace) -> None:
@@ -42,13 +65,28 @@ def start_core_system(args: argparse.Namespace) -> None:
 
     signal.signal(signal.SIGINT, shutdown_handler)
 
-    thread_pool_executor = ThreadPoolExecutor(max_workers=16)
-    event_stream = AppEventStream(thread_pool_executor)
+    executors = ExecutorRegistry(dict(args.pool))
+
+    event_log = (
+        None
+        if args.no_event_log
+        else SegmentedEventLog(
+            EventLogSettings(
+                directory=args.event_log_dir,
+                segment_max_bytes=args.event_log_segment_size,
+                retained_segments=args.event_log_retention,
+            )
+        )
+    )
+    # with --async-events hooks are scheduled as tasks on an event loop, synchronous
+    # ones still run on the hooks pool
+    event_stream_class = AsyncAppEventStream if args.async_events else AppEventStream
+    event_stream = event_stream_class(executors.get(HOOKS_POOL), event_log=event_log)
 
     setup_early_hooks(event_stream)
 
     comms_server, llm_server, agent = setup_services(
-        args, event_stream, shutdown_signal, thread_pool_executor
+        args, event_stream, shutdown_signal, executors
     )
 
     setup_event_hooks(
@@ -56,24 +94,51 @@ def start_core_system(args: argparse.Namespace) -> None:
         comms_server=comms_server,
         llm_server=llm_server,
         agent=agent,
+        executors=executors,
+        stream_replies=not args.no_stream,
     )
 
+    setup_service_metrics(
+        event_stream.metrics, executors, comms_server, agent, event_log
+    )
+
+    if args.metrics_file:
+        start_metrics_file_writer(
+            event_stream.metrics,
+            args.metrics_file,
+            shutdown_signal,
+            interval=args.metrics_interval,
+        )
+
     # keep the main thread alive to process signals
     while not shutdown_signal.is_set():
         time.sleep(1.0)
     else:
         comms_server.close()
-        llm_server.close()
-        thread_pool_executor.shutdown()
-        event_stream.dump()
+
+        if llm_server is not None:
+            llm_server.close()
+
+        # stop what pushes events, then let the stream drain its queues while the
+        # pools its hooks run on are still up, and only then stop those
+        executors.shutdown([COMMS_POOL, SERVICES_POOL])
+        event_stream.close()
+        executors.shutdown([LLM_POOL, HOOKS_POOL])
+
+        if event_log is not None:
+            event_log.close()
+
+        if args.metrics_file:
+            # final counts, the periodic writer stops with the shutdown signal
+            write_prometheus_file(args.metrics_file, event_stream.metrics.collect())
 
 
 def setup_services(
     args: argparse.Namespace,
     event_stream: AppEventStream,
     shutdown_signal: threading.Event,
-    thread_pool_executor: ThreadPoolExecutor,
-) -> tuple[CommsServer, OllamaServer, Agent]:
+    executors: ExecutorRegistry,
+) -> tuple[AsyncCommsServer | CommsServer, OllamaServer | None, Agent | StubAgent]:
     """Start all the related services"""
 
     status = {
@@ -84,30 +149,101 @@ def setup_services(
 
     event_stream.push(SystemEvent(CORE_SYS_START, {"active_services": {**status}}))
 
-    comms_server = CommsServer(
-        port=args.port_comms,
-        event_stream=event_stream,
-        shutdown_signal=shutdown_signal,
-        thread_pool_executor=thread_pool_executor,
+    unix_socket_path = (
+        get_unix_socket_path(args.port_comms)
+        if get_is_unix_socket_supported() and not args.no_unix_socket
+        else None
     )
 
-    llm_server = OllamaServer(
-        port=args.port_ollama,
-        event_stream=event_stream,
-        shutdown_signal=shutdown_signal,
-        thread_pool_executor=thread_pool_executor,
+    outbound_settings = OutboundQueueSettings(
+        high_watermark=args.outbound_high_watermark,
+        low_watermark=args.outbound_low_watermark,
+        slow_consumer_policy=args.slow_consumer,
     )
+    validate_outbound_settings(outbound_settings)
 
-    poll_and_wait_for([comms_server.is_done, llm_server.is_done])
+    heartbeat_settings = HeartbeatSettings(
+        interval=args.heartbeat_interval,
+        timeout=args.heartbeat_timeout,
+        idle_timeout=args.idle_timeout,
+    )
 
-    agent = Agent(
-        llm_server=llm_server,
-        event_stream=event_stream,
-        shutdown_signal=shutdown_signal,
+    if args.threaded_comms:
+        comms_server = CommsServer(
+            port=args.port_comms,
+            event_stream=event_stream,
+            shutdown_signal=shutdown_signal,
+            thread_pool_executor=executors.get(COMMS_POOL),
+            unix_socket_path=unix_socket_path,
+            outbound_settings=outbound_settings,
+            heartbeat_settings=heartbeat_settings,
+        )
+    else:
+        comms_server = AsyncCommsServer(
+            port=args.port_comms,
+            event_stream=event_stream,
+            thread_pool_executor=executors.get(COMMS_POOL),
+            shutdown_signal=shutdown_signal,
+            unix_socket_path=unix_socket_path,
+            outbound_settings=outbound_settings,
+            heartbeat_settings=heartbeat_settings,
+        )
+
+    context_settings = ContextSettings(token_budget=args.context_tokens)
+    validate_context_settings(context_settings)
+
+    response_cache_settings = None
+
+    if args.response_cache:
+        response_cache_settings = ResponseCacheSettings(
+            max_entries=args.response_cache_size, ttl=args.response_cache_ttl
+        )
+        validate_response_cache_settings(response_cache_settings)
+
+    router_settings = RouterSettings(
+        small_model=args.small_model,
+        simple_max_words=args.simple_max_words,
+        direct_answers=not args.no_direct_answers,
     )
+    validate_router_settings(router_settings)
+
+    if args.stub_agent:
+        # echo agent for benchmarks, no ollama required
+        llm_server = None
+
+        poll_and_wait_for([comms_server.is_done])
+
+        agent = StubAgent(
+            event_stream=event_stream,
+            reply_delay=args.stub_delay,
+            max_sessions=args.max_sessions,
+            max_parallel_invocations=args.max_llm_calls,
+        )
+    else:
+        llm_server = OllamaServer(
+            port=args.port_ollama,
+            event_stream=event_stream,
+            shutdown_signal=shutdown_signal,
+            thread_pool_executor=executors.get(SERVICES_POOL),
+        )
+
+        poll_and_wait_for([comms_server.is_done, llm_server.is_done])
+
+        agent = Agent(
+            llm_server=llm_server,
+            event_stream=event_stream,
+            shutdown_signal=shutdown_signal,
+            executor=executors.get(LLM_POOL),
+            max_sessions=args.max_sessions,
+            max_parallel_invocations=args.max_llm_calls,
+            context_settings=context_settings,
+            keep_alive=args.keep_alive,
+            response_cache_settings=response_cache_settings,
+            router_settings=router_settings,
+        )
 
     status["comms-server"] = comms_server.is_ready.is_set()
-    status["llm-server"] = llm_server.is_ready.is_set()
+    status["llm-server"] = llm_server is not None and llm_server.is_ready.is_set()
     status["agent"] = agent.is_ready.is_set()
 
     event_stream.push(SystemEvent(CORE_SYS_FINISH, {"active_services": {**status}}))
@@ -119,20 +255,109 @@ def setup_early_hooks(event_stream: AppEventStream):
     event_stream.add_event_hook(
         event_type=SystemEvent.type,
         event_hook=lambda event: on_core_system_ready(event, event_stream),
+        name="on_core_system_ready",
     )
 
 
 def setup_event_hooks(
     event_stream: AppEventStream,
-    comms_server: CommsServer,
-    llm_server: OllamaServer,
-    agent: Agent,
+    comms_server: AsyncCommsServer | CommsServer,
+    llm_server: OllamaServer | None,
+    agent: Agent | StubAgent,
+    executors: ExecutorRegistry,
+    stream_replies: bool = True,
 ) -> None:
     """Setup event hooks for the event stream."""
 
+    # user messages block on the agent, so they run on the llm pool, as many at a time
+    # as the pool allows. messages of one connection share its chat history and are
+    # answered in order; a connection that pipelines requests takes one worker, not all
     event_stream.add_event_hook(
         event_type=UserMessageEvent.type,
         event_hook=lambda event: on_user_message(
-            event, event_stream, comms_server, agent
+            event, event_stream, comms_server, agent, stream_replies
         ),
+        concurrency=executors.pool_settings[LLM_POOL].max_workers,
+        executor=executors.get(LLM_POOL),
+        name="on_user_message",
+        order_key=lambda event: event.data,  # connection id
+    )
+
+
+def setup_service_metrics(
+    metrics: MetricsRegistry,
+    executors: ExecutorRegistry,
+    comms_server: AsyncCommsServer | CommsServer,
+    agent: Agent | StubAgent,
+    event_log: SegmentedEventLog | None,
+) -> None:
+    """Expose executor, connection, session and event log counters, read when collected."""
+
+    def collect_executor_stat(stat: str):
+        return lambda: {
+            (name,): stats[stat] for name, stats in executors.stats().items()
+        }
+
+    metrics.gauge(
+        "yoda_executor_queue_depth",
+        "Tasks waiting for a worker, per thread pool.",
+        ("pool",),
+        collect=collect_executor_stat("queued"),
+    )
+    metrics.gauge(
+        "yoda_executor_workers",
+        "Worker threads, per thread pool.",
+        ("pool",),
+        collect=collect_executor_stat("workers"),
+    )
+    metrics.gauge(
+        "yoda_executor_busy_workers",
+        "Worker threads running a task, per thread pool.",
+        ("pool",),
+        collect=collect_executor_stat("busy_workers"),
+    )
+    metrics.counter(
+        "yoda_executor_saturated_submits_total",
+        "Tasks submitted while every worker of the pool was busy.",
+        ("pool",),
+        collect=collect_executor_stat("saturated_submits"),
+    )
+
+    metrics.gauge(
+        "yoda_active_connections",
+        "Clients connected to the comms server.",
+        collect=lambda: {(): len(comms_server.connections)},
     )
+    metrics.gauge(
+        "yoda_outbound_queue_bytes",
+        "Reply bytes queued for all connected clients.",
+        collect=lambda: {
+            (): sum(
+                stats["depth_bytes"]
+                for stats in comms_server.get_outbound_stats().values()
+            )
+        },
+    )
+
+    metrics.gauge(
+        "yoda_agent_sessions",
+        "Chat sessions held by the agent.",
+        collect=lambda: {(): agent.get_session_stats()["sessions"]},
+    )
+    metrics.counter(
+        "yoda_agent_sessions_evicted_total",
+        "Idle chat sessions evicted to make room for new ones.",
+        collect=lambda: {(): agent.get_session_stats()["evicted"]},
+    )
+
+    if event_log is not None:
+        metrics.gauge(
+            "yoda_event_log_pending",
+            "Events waiting to be written to the event log.",
+            collect=lambda: {(): event_log.stats()["pending"]},
+        )
+        metrics.counter(
+            "yoda_event_log_write_errors_total",
+            "Failed event log writes.",
+            collect=lambda: {(): event_log.stats()["write_errors"]},
+        )
@@ -1,2 +1,3 @@
+from .async_comms_server import AsyncCommsServer
 from .comms_server import CommsServer
 from .llm_server import OllamaServer
@@ -0,0 +1,259 @@
+import asyncio
+from concurrent.futures import Executor
+import json
+import ssl
+import threading
+
+from app_streams.events import (
+    COMMS_OFFLINE,
+    COMMS_ONLINE,
+    COMMS_START,
+    COMMS_UNIX_OFFLINE,
+    COMMS_UNIX_ONLINE,
+    USR_CONN_EVICTED,
+    USR_CONN_OK,
+    USR_DISCONN_OK,
+    AppEventStream,
+    SystemEvent,
+    UserMessageEvent,
+)
+from comms.framing import KIND_MESSAGE, KIND_STATS, AsyncFrameReader, FramingError
+from comms.outbound import OutboundQueueSettings
+from comms.registry import ConnectionRegistry, HeartbeatSettings
+from comms.server import (
+    StreamConnection,
+    remove_unix_socket,
+    start_async_server,
+    start_async_unix_server,
+)
+
+SHUTDOWN_TIMEOUT = 5.0
+
+
+class AsyncCommsServer:
+    """
+    Event-loop based comms server.
+
+    All connections are served by a single asyncio loop running on a dedicated thread,
+    so idle clients do not hold on to workers of the shared thread pool. The pool only
+    takes the pushes of user messages, which may block on a full hook queue.
+    """
+
+    def __init__(
+        self,
+        port: int,
+        event_stream: AppEventStream,
+        thread_pool_executor: Executor,
+        shutdown_signal: threading.Event,
+        unix_socket_path: str | None = None,
+        outbound_settings: OutboundQueueSettings = OutboundQueueSettings(),
+        heartbeat_settings: HeartbeatSettings = HeartbeatSettings(),
+    ) -> None:
+        self.hostname = "localhost"
+        self.port = port
+        self.unix_socket_path = unix_socket_path
+        self.outbound_settings = outbound_settings
+
+        self.server = None
+        self.unix_server = None
+        self.is_done = threading.Event()
+        self.is_ready = threading.Event()
+
+        self.__shutdown_signal = shutdown_signal
+        self.__event_stream = event_stream
+        self.__thread_pool_executor = thread_pool_executor
+
+        self.connections = ConnectionRegistry(heartbeat_settings)
+        self.__client_tasks: set[asyncio.Task] = set()  # only touched on the loop
+
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(
+            target=self.__run, name="comms-server", daemon=True
+        )
+        self.__thread.start()
+
+    def __run(self) -> None:
+        asyncio.set_event_loop(self.__loop)
+
+        try:
+            self.__loop.run_until_complete(self.__start())
+
+            if self.is_ready.is_set():
+                self.__loop.run_forever()
+        finally:
+            self.__loop.close()
+
+    async def __start(self) -> None:
+        self.__event_stream.push(
+            SystemEvent(
+                COMMS_START,
+                {"server_hostname": (self.hostname), "server_port": self.port},
+            )
+        )
+
+        try:
+            server = await start_async_server(
+                hostname=self.hostname,
+                port=self.port,
+                on_client_connected=self.__on_client_connected,
+            )
+        except Exception as err:
+            self.__on_done()
+            self.__on_error(err)
+        else:
+            if self.unix_socket_path is not None:
+                await self.__start_unix()
+
+            self.__on_done()
+            self.__on_start(server)
+
+    async def __start_unix(self) -> None:
+        try:
+            self.unix_server = await start_async_unix_server(
+                path=self.unix_socket_path,
+                on_client_connected=self.__on_client_connected,
+            )
+        except Exception as err:
+            self.__event_stream.push(
+                SystemEvent(
+                    COMMS_UNIX_OFFLINE,
+                    {"unix_socket_path": self.unix_socket_path, "error": err},
+                )
+            )
+        else:
+            self.__event_stream.push(
+                SystemEvent(
+                    COMMS_UNIX_ONLINE, {"unix_socket_path": self.unix_socket_path}
+                )
+            )
+
+    def __on_done(self) -> None:
+        self.is_done.set()
+
+    def __on_start(self, server: asyncio.AbstractServer) -> None:
+        self.server = server
+        self.connections.start_reaper(on_evict=self.__on_evict)
+        self.is_ready.set()
+        self.__event_stream.push(
+            SystemEvent(
+                COMMS_ONLINE,
+                {"server_hostname": (self.hostname), "server_port": self.port},
+            )
+        )
+
+    def __on_error(self, err: Exception) -> None:
+        self.__event_stream.push(SystemEvent(COMMS_OFFLINE, {"error": err}))
+
+    async def __on_client_connected(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.__client_tasks.add(asyncio.current_task())
+
+        connection = StreamConnection(writer, self.__loop, self.outbound_settings)
+        connection_id = self.connections.register(connection)
+
+        self.__event_stream.push(
+            SystemEvent(USR_CONN_OK, {"connection_id": connection_id})
+        )
+
+        frame_reader = AsyncFrameReader(reader)
+
+        try:
+            while not self.__shutdown_signal.is_set():
+                frame = await frame_reader.read_frame()
+                connection.framing = frame_reader.framing
+
+                is_message = frame.kind == KIND_MESSAGE
+                self.connections.touch(connection_id, is_activity=is_message)
+
+                if is_message and frame.payload.strip():
+                    # pushed off the loop: a full hook queue may block the push, which
+                    # must hold back this connection only, not reads, pings and stats
+                    # of all the others
+                    await self.__loop.run_in_executor(
+                        self.__thread_pool_executor,
+                        self.__event_stream.push,
+                        UserMessageEvent(frame.payload, connection_id, frame.request_id),
+                    )
+                elif frame.kind == KIND_STATS:
+                    self.__send_stats(connection, frame.request_id)
+        except (asyncio.IncompleteReadError, ConnectionError, ssl.SSLError):
+            # peer has disconnected
+            pass
+        except (FramingError, UnicodeDecodeError):
+            # peer sent a malformed frame, drop the connection
+            pass
+        finally:
+            connection.close()
+            self.connections.unregister(connection_id)
+
+            self.__event_stream.push(
+                SystemEvent(USR_DISCONN_OK, {"connection_id": connection_id})
+            )
+
+            self.__client_tasks.discard(asyncio.current_task())
+
+    def __send_stats(self, connection: StreamConnection, request_id: int) -> None:
+        # answered right here instead of through the event stream, so stats stay
+        # available while the hooks are saturated. never blocks the loop
+        connection.send_message(
+            json.dumps(self.__event_stream.metrics.collect()),
+            kind=KIND_STATS,
+            request_id=request_id,
+            block=False,
+        )
+
+    def __on_evict(
+        self, connection_id: int, connection: StreamConnection, reason: str
+    ) -> None:
+        self.__event_stream.push(
+            SystemEvent(
+                USR_CONN_EVICTED, {"connection_id": connection_id, "reason": reason}
+            )
+        )
+        # the client handler sees the disconnect and cleans up
+        connection.abort()
+
+    def get_connection_by_id(self, connection_id: int) -> StreamConnection | None:
+        return self.connections.get(connection_id)
+
+    async def __stop(self) -> None:
+        self.connections.stop_reaper()
+        self.server.close()
+
+        if self.unix_server is not None:
+            self.unix_server.close()
+            remove_unix_socket(self.unix_socket_path)
+
+        for _, connection in self.connections.items():
+            connection.close()
+
+        if self.__client_tasks:
+            # let the client handlers observe the disconnect and clean up
+            await asyncio.wait(set(self.__client_tasks), timeout=SHUTDOWN_TIMEOUT)
+
+        await self.server.wait_closed()
+
+        if self.unix_server is not None:
+            await self.unix_server.wait_closed()
+
+    def close(self) -> None:
+        if not self.__loop.is_running():
+            return
+
+        try:
+            asyncio.run_coroutine_threadsafe(self.__stop(), self.__loop).result(
+                timeout=SHUTDOWN_TIMEOUT
+            )
+        except Exception:
+            pass
+        finally:
+            self.__loop.call_soon_threadsafe(self.__loop.stop)
+            self.__thread.join(timeout=SHUTDOWN_TIMEOUT)
+
+    def get_outbound_stats(self) -> dict[int, dict[str, int | bool]]:
+        """Outbound queue counters (depth, drops, ...) for every open connection."""
+        return {
+            connection_id: connection.outbound.stats()
+            for connection_id, connection in self.connections.items()
+        }
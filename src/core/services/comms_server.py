@@ -1,4 +1,6 @@
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Executor
+import json
+import socket
 import ssl
 import threading
 
@@ -6,6 +8,9 @@ from app_streams.events import (
     COMMS_OFFLINE,
     COMMS_ONLINE,
     COMMS_START,
+    COMMS_UNIX_OFFLINE,
+    COMMS_UNIX_ONLINE,
+    USR_CONN_EVICTED,
     USR_CONN_OK,
     USR_DISCONN_ABT,
     USR_DISCONN_OK,
@@ -13,8 +18,16 @@ from app_streams.events import (
     SystemEvent,
     UserMessageEvent,
 )
-from comms.client import listen_for_messages
-from comms.server import get_is_socket_connected, listen_for_connections, start_server
+from comms.framing import KIND_MESSAGE, KIND_STATS, FrameReader
+from comms.outbound import OutboundQueueSettings
+from comms.registry import ConnectionRegistry, HeartbeatSettings
+from comms.server import (
+    SocketConnection,
+    listen_for_connections,
+    remove_unix_socket,
+    start_server,
+    start_unix_server,
+)
 
 
 class CommsServer:
@@ -22,13 +35,19 @@ class CommsServer:
         self,
         port: int,
         event_stream: AppEventStream,
-        thread_pool_executor: ThreadPoolExecutor,
+        thread_pool_executor: Executor,
         shutdown_signal: threading.Event,
+        unix_socket_path: str | None = None,
+        outbound_settings: OutboundQueueSettings = OutboundQueueSettings(),
+        heartbeat_settings: HeartbeatSettings = HeartbeatSettings(),
     ) -> None:
         self.hostname = "localhost"
         self.port = port
+        self.unix_socket_path = unix_socket_path
+        self.outbound_settings = outbound_settings
 
         self.ssock = None
+        self.usock = None
         self.is_done = threading.Event()
         self.is_ready = threading.Event()
 
@@ -36,8 +55,7 @@ class CommsServer:
         self.__event_stream = event_stream
         self.__thread_pool_executor = thread_pool_executor
 
-        self.__lock = threading.Lock()
-        self.__connections = {}
+        self.connections = ConnectionRegistry(heartbeat_settings)
 
         self.__thread_pool_executor.submit(self.__start)
 
@@ -62,6 +80,7 @@ class CommsServer:
 
     def __on_start(self, ssock: ssl.SSLSocket) -> None:
         self.ssock = ssock
+        self.connections.start_reaper(on_evict=self.__on_evict)
         self.is_ready.set()
         self.__event_stream.push(
             SystemEvent(
@@ -69,15 +88,41 @@ class CommsServer:
                 {"server_hostname": (self.hostname), "server_port": self.port},
             )
         )
-        self.__listen_for_connections()
+
+        if self.unix_socket_path is not None:
+            self.__thread_pool_executor.submit(self.__start_unix)
+
+        self.__listen_for_connections(self.ssock)
 
     def __on_error(self, err: Exception) -> None:
         self.__event_stream.push(SystemEvent(COMMS_OFFLINE, {"error": err}))
 
-    def __listen_for_connections(self) -> None:
+    def __start_unix(self) -> None:
+        start_unix_server(
+            path=self.unix_socket_path,
+            on_start=self.__on_unix_start,
+            on_error=self.__on_unix_error,
+        )
+
+    def __on_unix_start(self, sock: socket.socket) -> None:
+        self.usock = sock
+        self.__event_stream.push(
+            SystemEvent(COMMS_UNIX_ONLINE, {"unix_socket_path": self.unix_socket_path})
+        )
+        self.__listen_for_connections(self.usock)
+
+    def __on_unix_error(self, err: Exception) -> None:
+        self.__event_stream.push(
+            SystemEvent(
+                COMMS_UNIX_OFFLINE,
+                {"unix_socket_path": self.unix_socket_path, "error": err},
+            )
+        )
+
+    def __listen_for_connections(self, sock: socket.socket) -> None:
         try:
             listen_for_connections(
-                ssock=self.ssock,
+                ssock=sock,
                 shutdown_signal=self.__shutdown_signal,
                 on_client_connected=self.__on_client_connected,
             )
@@ -85,32 +130,51 @@ class CommsServer:
             self.__event_stream.push(SystemEvent(USR_DISCONN_ABT))
         except BlockingIOError:
             pass
+        except OSError:
+            # the listening socket was shut down by close()
+            pass
 
     def __on_client_connected(
         self, client: ssl.SSLSocket, addr: tuple[str, int]
     ) -> None:
-        connection_id = hash(client)
+        # reads and writes happen on their own threads, so plain blocking i/o is fine
+        client.setblocking(True)
 
-        with self.__lock:
-            self.__connections[connection_id] = client
+        if client.family == socket.AF_INET:
+            # replies are written as separate small frames, don't let nagle hold them back
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        connection = SocketConnection(client, self.outbound_settings)
+        connection_id = self.connections.register(connection)
 
         self.__event_stream.push(
             SystemEvent(USR_CONN_OK, {"connection_id": connection_id})
         )
 
         def on_client_connected():
-            socket_buffer = ""
+            reader = FrameReader(client)
 
             try:
                 while not self.__shutdown_signal.is_set():
-                    message, socket_buffer = listen_for_messages(client, socket_buffer)
-                    self.__event_stream.push(UserMessageEvent(message, connection_id))
-            except ValueError:
-                # if socket has disconnected, this error is raised by listen_for_messages
-                client.close()
-
-                with self.__lock:
-                    del self.__connections[connection_id]
+                    frame = reader.read_frame()
+                    connection.framing = reader.framing
+
+                    is_message = frame.kind == KIND_MESSAGE
+                    self.connections.touch(connection_id, is_activity=is_message)
+
+                    if is_message and frame.payload.strip():
+                        self.__event_stream.push(
+                            UserMessageEvent(
+                                frame.payload, connection_id, frame.request_id
+                            )
+                        )
+                    elif frame.kind == KIND_STATS:
+                        self.__send_stats(connection, frame.request_id)
+            except (ValueError, OSError):
+                # raised by read_frame once the socket has disconnected
+                # or the peer has sent a malformed frame
+                connection.close()
+                self.connections.unregister(connection_id)
 
                 self.__event_stream.push(
                     SystemEvent(USR_DISCONN_OK, {"connection_id": connection_id})
@@ -118,17 +182,56 @@ class CommsServer:
 
         self.__thread_pool_executor.submit(on_client_connected)
 
-    def get_connection_by_id(self, connection_id: int) -> ssl.SSLSocket | None:
-        with self.__lock:
-            if connection_id in self.__connections and get_is_socket_connected(
-                self.__connections[connection_id]
-            ):
-                return self.__connections[connection_id]
-            elif connection_id in self.__connections:
-                del self.__connections[connection_id]
-                return None
-            else:
-                return None
+    def __send_stats(self, connection: SocketConnection, request_id: int) -> None:
+        # answered right here instead of through the event stream, so stats stay
+        # available while the hooks are saturated
+        connection.send_message(
+            json.dumps(self.__event_stream.metrics.collect()),
+            kind=KIND_STATS,
+            request_id=request_id,
+        )
+
+    def __on_evict(
+        self, connection_id: int, connection: SocketConnection, reason: str
+    ) -> None:
+        self.__event_stream.push(
+            SystemEvent(
+                USR_CONN_EVICTED, {"connection_id": connection_id, "reason": reason}
+            )
+        )
+        # the reader thread sees the disconnect and cleans up
+        connection.abort()
+
+    def get_connection_by_id(self, connection_id: int) -> SocketConnection | None:
+        return self.connections.get(connection_id)
 
     def close(self) -> None:
-        self.ssock.close()
+        self.connections.stop_reaper()
+
+        if self.ssock is not None:
+            # not set if the server failed to start
+            self.__close_listener(self.ssock)
+
+        if self.usock is not None:
+            self.__close_listener(self.usock)
+            remove_unix_socket(self.unix_socket_path)
+
+        # wakes up the reader threads blocked in recv, so the pool can shut down
+        for _, connection in self.connections.items():
+            connection.close()
+
+    def __close_listener(self, sock: socket.socket) -> None:
+        # closing alone does not wake a thread blocked in accept(), shutting down does
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        sock.close()
+
+    def get_outbound_stats(self) -> dict[int, dict[str, int | bool]]:
+        """Outbound queue counters (depth, drops, ...) for every open connection."""
+        return {
+            connection_id: connection.outbound.stats()
+            for connection_id, connection in self.connections.items()
+        }
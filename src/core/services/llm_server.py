@@ -1,4 +1,4 @@
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Executor
 import subprocess
 import threading
 from app_streams.events import LLM_OFFLINE, LLM_ONLINE, LLM_START, AppEvent, SystemEvent
@@ -10,7 +10,7 @@ class OllamaServer:
         self,
         port: int,
         event_stream: AppEvent,
-        thread_pool_executor: ThreadPoolExecutor,
+        thread_pool_executor: Executor,
         shutdown_signal: threading.Event,
     ) -> None:
         self.hostname = "localhost"
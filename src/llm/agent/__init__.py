@@ -1 +1,9 @@
-from .agent import Agent
+# Agent pulls in langchain, imported on first use so that light modules of this
+# package (e.g. defaults) can be imported on their own
+def __getattr__(name: str) -> any:
+    if name == "Agent":
+        from .agent import Agent
+
+        return Agent
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,22 +1,75 @@
+from concurrent.futures import Executor
+import json
 import secrets
 import threading
+import time
+from typing import Callable
 
-from langchain_core.messages import ChatMessage
+from langchain_core.messages import (
+    BaseMessage,
+    ChatMessage,
+    HumanMessage,
+    SystemMessage,
+)
 from langchain_ollama.chat_models import ChatOllama
 
 from app_streams.events import (
+    AGENT_MODEL_LOAD_ERR,
+    AGENT_MODEL_LOAD_OK,
+    AGENT_MODEL_LOAD_START,
     AGENT_OFFLINE,
     AGENT_ONLINE,
     AppEventStream,
     SystemEvent,
 )
 from core.services import OllamaServer
-from llm.agent.graph import create_graph
-from llm.agent.memory import AgentPersistentMemory, AgentSessionMemory
-from .tools import available_tools
+from llm.agent.context import ChatContextWindow, ContextSettings
+from llm.agent.defaults import DEFAULT_MAX_PARALLEL_INVOCATIONS
+from llm.agent.graph import CHATBOT_NODE, create_graph
+from llm.agent.memory import (
+    DEFAULT_MAX_SESSIONS,
+    AgentPersistentMemory,
+    AgentSessionStore,
+)
+from llm.agent.response_cache import (
+    MISS,
+    ResponseCache,
+    ResponseCacheSettings,
+    get_response_cache_key,
+)
+from llm.agent.router import (
+    DIRECT,
+    ESCALATED,
+    LARGE,
+    SMALL,
+    PromptRouter,
+    RouteReport,
+    RouterSettings,
+    answer_directly,
+)
+from llm.agent.tool_cache import tool_result_cache
+from llm.agent.utils import get_message_role
+from llm.server import DEFAULT_KEEP_ALIVE, load_ollama_model
+from .tools import SIDE_EFFECT_TOOLS, VOLATILE_TOOLS, available_tools
 
+AGENT_MODEL = "qwen3:8b"
+AGENT_TEMPERATURE = 0.2
 AGENT_SESSION_ID_HEX_SIZE = 16
 
+# ollama reports how long each request waited for the model to load, a few
+# milliseconds when it was already loaded
+COLD_START_THRESHOLD = 0.5  # seconds
+
+# routing rules take microseconds
+ROUTE_DECISION_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3)
+
+SUMMARY_INSTRUCTIONS = (
+    "Summarise the conversation below in at most {max_words} words. Keep the facts, "
+    "names, preferences, decisions and open questions the assistant may need later. "
+    "Merge in the summary of the conversation before it, if one is given. Reply with "
+    "the summary only."
+)
+
 
 class Agent:
     def __init__(
@@ -24,12 +77,93 @@ class Agent:
         llm_server: OllamaServer,
         event_stream: AppEventStream,
         shutdown_signal: threading.Event,
+        executor: Executor,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        max_parallel_invocations: int = DEFAULT_MAX_PARALLEL_INVOCATIONS,
+        context_settings: ContextSettings = ContextSettings(),
+        keep_alive: int | float | str = DEFAULT_KEEP_ALIVE,
+        response_cache_settings: ResponseCacheSettings | None = None,
+        router_settings: RouterSettings = RouterSettings(),
     ) -> None:
+        """
+        `executor` runs background work, i.e. loading the model and summarising old
+        turns. `keep_alive` is how long ollama keeps the model loaded while idle.
+        Replies are cached only if `response_cache_settings` are given. Prompts are
+        routed to a direct answer, the small model or the agent graph as
+        `router_settings` allow.
+        """
+        if max_parallel_invocations < 1:
+            raise ValueError("Agent needs at least one parallel invocation.")
+
         self.is_ready = threading.Event()
 
         self.__ollama_url = llm_server.get_server_url()
         self.__event_stream = event_stream
         self.__shutdown_signal = shutdown_signal
+        self.__executor = executor
+        self.__context_settings = context_settings
+        self.__keep_alive = keep_alive
+        self.__router = PromptRouter(router_settings)
+        # secondary memory, one chat history per connection
+        self.__sessions = AgentSessionStore(max_sessions=max_sessions)
+        # shared by all sessions, a turn holds a slot only while it runs the graph
+        self.__invocation_slots = threading.BoundedSemaphore(max_parallel_invocations)
+        self.__response_cache = (
+            None
+            if response_cache_settings is None
+            else ResponseCache(response_cache_settings)
+        )
+
+        self.__invocation_starts = event_stream.metrics.counter(
+            "yoda_agent_invocation_starts_total",
+            "Agent invocations that waited for the model to load (cold) or not (warm).",
+            ("start",),
+        )
+        self.__model_load_duration = event_stream.metrics.histogram(
+            "yoda_agent_model_load_seconds",
+            "Time ollama took to load the agent model, by what caused the load.",
+            ("trigger",),
+        )
+
+        self.__routes = event_stream.metrics.counter(
+            "yoda_agent_routes_total",
+            "Agent invocations by where they were answered.",
+            ("route",),
+        )
+        self.__route_decision_duration = event_stream.metrics.histogram(
+            "yoda_agent_route_decision_seconds",
+            "Time taken to choose where a prompt is answered.",
+            buckets=ROUTE_DECISION_BUCKETS,
+        )
+        self.__route_duration = event_stream.metrics.histogram(
+            "yoda_agent_route_duration_seconds",
+            "Time taken to answer a prompt, by where it was answered.",
+            ("route",),
+        )
+
+        self.__response_cache_lookups = event_stream.metrics.counter(
+            "yoda_response_cache_lookups_total",
+            "Agent replies served from the response cache (hit), shared with an identical request in flight (coalesced) or computed (miss).",
+            ("result",),
+        )
+
+        event_stream.metrics.counter(
+            "yoda_tool_cache_lookups_total",
+            "Agent tool calls answered from the tool result cache (hits) or run (misses).",
+            ("tool", "result"),
+            collect=lambda: {
+                (tool_name, result): stats[result]
+                for tool_name, stats in tool_result_cache.stats().items()
+                for result in ("hits", "misses")
+            },
+        )
+
+        if self.__response_cache is not None:
+            event_stream.metrics.gauge(
+                "yoda_response_cache_entries",
+                "Replies held by the response cache.",
+                collect=lambda: {(): self.__response_cache.stats()["entries"]},
+            )
 
         self.session_id = secrets.token_hex(AGENT_SESSION_ID_HEX_SIZE)
 
@@ -43,18 +177,59 @@ class Agent:
             # init the llm
             self.__tools = available_tools
             self.__llm = ChatOllama(
-                model="qwen3:8b",
+                model=AGENT_MODEL,
                 reasoning=False,
                 base_url=self.__ollama_url,
                 validate_model_on_init=False,
-                temperature=0.2,
+                temperature=AGENT_TEMPERATURE,
+                keep_alive=self.__keep_alive,
             ).bind_tools(tools=self.__tools)
+            # cached replies are only reused with the same model, sampling and tools
+            self.__model_settings = json.dumps(
+                [AGENT_MODEL, AGENT_TEMPERATURE, [tool.name for tool in self.__tools]]
+            )
+            self.__summary_llm = ChatOllama(
+                model=AGENT_MODEL,
+                reasoning=False,
+                base_url=self.__ollama_url,
+                validate_model_on_init=False,
+                temperature=0.0,
+                num_predict=self.__context_settings.summary_max_tokens,
+                keep_alive=self.__keep_alive,
+            )
+
+            small_model = self.__router.settings.small_model
+
+            if small_model is not None:
+                # simple prompts, answered without tools
+                self.__small_llm = ChatOllama(
+                    model=small_model,
+                    reasoning=False,
+                    base_url=self.__ollama_url,
+                    validate_model_on_init=False,
+                    temperature=AGENT_TEMPERATURE,
+                    keep_alive=self.__keep_alive,
+                )
+                self.__small_model_settings = json.dumps(
+                    [small_model, AGENT_TEMPERATURE, []]
+                )
+
+            # load the models while the rest of the core starts, instead of on the
+            # first user message
+            self.__executor.submit(self.__load_model, AGENT_MODEL)
+
+            if small_model is not None:
+                self.__executor.submit(self.__load_model, small_model)
 
             # init llm utilties
             self.__memory = AgentPersistentMemory(
                 filepath="data/memory.json"
             )  # primary memory
-            self.__session_chat_history = AgentSessionMemory()  # secondary memory
+            self.__context = ChatContextWindow(
+                summarize=self.__summarize,
+                executor=self.__executor,
+                settings=self.__context_settings,
+            )  # keeps the session history sent with each turn within budget
 
             # init workflow
             self.__graph = create_graph(llm=self.__llm, tools=self.__tools)
@@ -78,47 +253,267 @@ class Agent:
         self.__event_stream.push(SystemEvent(AGENT_OFFLINE, {"error": err}))
         print(err)  #
 
+    def __load_model(self, model: str) -> None:
+        self.__event_stream.push(
+            SystemEvent(
+                AGENT_MODEL_LOAD_START,
+                {"model": model, "keep_alive": self.__keep_alive},
+            )
+        )
+
+        started_at = time.perf_counter()
+
+        try:
+            response = load_ollama_model(self.__ollama_url, model, self.__keep_alive)
+        except Exception as err:
+            self.__event_stream.push(
+                SystemEvent(AGENT_MODEL_LOAD_ERR, {"model": model, "error": err})
+            )
+            return
+
+        # ollama reports durations in nanoseconds
+        load_duration = response.get("load_duration", 0) / 1e9
+        self.__model_load_duration.observe(load_duration, trigger="warm-up")
+
+        self.__event_stream.push(
+            SystemEvent(
+                AGENT_MODEL_LOAD_OK,
+                {
+                    "model": model,
+                    "duration": time.perf_counter() - started_at,
+                    "load_duration": load_duration,
+                },
+            )
+        )
+
     # def append_to_session_memory(self, messages: list[AppEvent] | list[BaseMessage]):
     #     parsed_messages = self.convert_event_stream_history_to_base_messages(messages)
     #     self.__session_chat_history.update(parsed_messages)
 
-    def invoke(self, user_message: ChatMessage) -> str:
+    def invoke(
+        self,
+        user_message: ChatMessage,
+        connection_id: int,
+        on_token: Callable[[str], None] | None = None,
+        on_routed: Callable[[RouteReport], None] | None = None,
+    ) -> str:
+        """
+        Answer a user message and return the final reply. Depending on the prompt, the
+        answer comes straight from a tool, from the small model or from the agent graph.
+        Messages of one connection share a chat history and are answered in turn,
+        different connections are answered in parallel.
+        If on_token is given, reply tokens are handed to it as they are generated.
+        If on_routed is given, it receives where this message was answered and how
+        long choosing the route and answering took.
+        """
         if not self.is_ready.is_set():
             raise RuntimeError(
                 "Agent invoked before initialization. Did you forget to call the setup() method?"
             )
 
-        chat_history = self.__session_chat_history.get()
-        print(
-            "> querying against:",
-            list(map(lambda message: message.content, chat_history)),
-        )
+        decided_at = time.perf_counter()
+        decision = self.__router.route(user_message.content)
+        decision_duration = time.perf_counter() - decided_at
+        self.__route_decision_duration.observe(decision_duration)
+
+        with self.__sessions.take_turn(connection_id) as session:
+            chat_history = self.__context.build(session)
+
+            started_at = time.perf_counter()
+            route = decision.route
+
+            if route == DIRECT:
+                reply_messages = answer_directly(decision.intent)
+
+                if on_token is not None:
+                    on_token(reply_messages[-1].content)
+
+            if route == SMALL:
+                try:
+                    reply_messages = self.__get_reply(
+                        user_message,
+                        chat_history,
+                        self.__small_model_settings,
+                        lambda: self.__run_small_model(
+                            user_message, chat_history, on_token
+                        ),
+                        on_token,
+                    )
+                except Exception as err:
+                    print(f"> [{connection_id}] small model failed, escalating: {err}")
+                    route = ESCALATED
 
-        output_state = self.__graph.invoke(
-            {
-                "messages": chat_history + [user_message],
-                "event_stream": self.__event_stream,
-                "memory": self.__memory,
-            }
+            if route in (LARGE, ESCALATED):
+                reply_messages = self.__get_reply(
+                    user_message,
+                    chat_history,
+                    self.__model_settings,
+                    lambda: self.__run_graph(user_message, chat_history, on_token),
+                    on_token,
+                )
+
+            duration = time.perf_counter() - started_at
+            self.__routes.inc(route=route)
+            self.__route_duration.observe(duration, route=route)
+
+            if on_routed is not None:
+                on_routed(RouteReport(route, decision_duration, duration))
+
+            new_messages = [user_message, *reply_messages]
+            session.update(new_messages)
+            self.__context.after_turn(session)
+
+        return new_messages[-1].content
+
+    def __get_reply(
+        self,
+        user_message: ChatMessage,
+        chat_history: list[BaseMessage],
+        model_settings: str,
+        compute: Callable[[], tuple[list[BaseMessage], bool]],
+        on_token: Callable[[str], None] | None,
+    ) -> list[BaseMessage]:
+        if self.__response_cache is None:
+            reply_messages, _ = compute()
+            return reply_messages
+
+        reply_messages, result = self.__response_cache.get_or_compute(
+            get_response_cache_key(user_message.content, chat_history, model_settings),
+            compute,
         )
-        print(
-            "> agent returned:",
-            list(map(lambda state: state.content, output_state["messages"])),
+        self.__response_cache_lookups.inc(result=result)
+
+        if result != MISS and on_token is not None:
+            on_token(reply_messages[-1].content)
+
+        return reply_messages
+
+    def __run_graph(
+        self,
+        user_message: ChatMessage,
+        chat_history: list[BaseMessage],
+        on_token: Callable[[str], None] | None,
+    ) -> tuple[list[BaseMessage], bool]:
+        graph_input = {
+            "messages": chat_history + [user_message],
+            "event_stream": self.__event_stream,
+            "memory": self.__memory,
+        }
+
+        with self.__invocation_slots:
+            if on_token is None:
+                output_state = self.__graph.invoke(graph_input)
+            else:
+                output_state = self.__stream(graph_input, on_token)
+
+        # the messages answering the user message
+        reply_messages = output_state["messages"][len(chat_history) + 1 :]
+        self.__observe_start(reply_messages)
+
+        return reply_messages, self.__on_tools_called(reply_messages)
+
+    def __run_small_model(
+        self,
+        user_message: ChatMessage,
+        chat_history: list[BaseMessage],
+        on_token: Callable[[str], None] | None,
+    ) -> tuple[list[BaseMessage], bool]:
+        messages = chat_history + [user_message]
+
+        with self.__invocation_slots:
+            reply = self.__small_llm.invoke(messages)
+
+        if reply is None or not str(reply.content).strip():
+            raise ValueError("Small model returned an empty reply.")
+
+        self.__observe_start([reply])
+
+        # sent only once the reply is known to be good: a failed reply is escalated
+        # to the large model, which streams its own tokens
+        if on_token is not None:
+            on_token(reply.content)
+
+        return [reply], True
+
+    def __on_tools_called(self, messages: list[BaseMessage]) -> bool:
+        """Returns whether the reply may be cached, given the tools it called."""
+        tool_names = {
+            call["name"]
+            for message in messages
+            for call in getattr(message, "tool_calls", None) or ()
+        }
+
+        if self.__response_cache is not None and tool_names & SIDE_EFFECT_TOOLS:
+            # e.g. memory changed, replies that searched it may be stale
+            self.__response_cache.clear()
+
+        return not tool_names & (SIDE_EFFECT_TOOLS | VOLATILE_TOOLS)
+
+    def __observe_start(self, messages: list[BaseMessage]) -> None:
+        load_duration = get_model_load_duration(messages)
+
+        if load_duration >= COLD_START_THRESHOLD:
+            # unloaded after being idle longer than keep_alive, or never warmed up
+            self.__invocation_starts.inc(start="cold")
+            self.__model_load_duration.observe(load_duration, trigger="invocation")
+        else:
+            self.__invocation_starts.inc(start="warm")
+
+    def __summarize(
+        self, previous_summary: str | None, messages: list[BaseMessage]
+    ) -> str:
+        transcript = "\n".join(
+            f"{get_message_role(message)}: {message.content}" for message in messages
         )
 
-        new_messages = output_state["messages"][len(chat_history) :]
-        print(list(map(lambda msg: msg.content, new_messages)))
-
-        print("> memory write is locked?", self.__session_chat_history.lock.locked())
-        self.__session_chat_history.update(new_messages)
-        print(
-            "> new history:",
-            list(
-                map(
-                    lambda message: message.content,
-                    self.__session_chat_history.get(),
+        if previous_summary is not None:
+            transcript = f"Summary so far: {previous_summary}\n\n{transcript}"
+
+        prompt = [
+            SystemMessage(
+                SUMMARY_INSTRUCTIONS.format(
+                    # roughly 3 words per 4 tokens
+                    max_words=self.__context_settings.summary_max_tokens * 3 // 4
                 )
             ),
-        )
+            HumanMessage(transcript),
+        ]
 
-        return new_messages[-1].content
+        # an llm call like any other, it waits for a free slot
+        with self.__invocation_slots:
+            return self.__summary_llm.invoke(prompt).content
+
+    def get_session_stats(self) -> dict[str, int]:
+        return self.__sessions.stats()
+
+    def get_response_cache_stats(self) -> dict[str, int] | None:
+        return None if self.__response_cache is None else self.__response_cache.stats()
+
+    def __stream(self, graph_input: dict, on_token: Callable[[str], None]) -> dict:
+        output_state = None
+
+        for mode, payload in self.__graph.stream(
+            graph_input, stream_mode=["messages", "values"]
+        ):
+            if mode == "values":
+                output_state = payload
+                continue
+
+            chunk, metadata = payload
+
+            # only the chatbot's reply is meant for the user, not tool output
+            if metadata.get("langgraph_node") == CHATBOT_NODE and chunk.content:
+                on_token(chunk.content)
+
+        return output_state
+
+
+def get_model_load_duration(messages: list[BaseMessage]) -> float:
+    """Seconds the llm calls behind these messages waited for the model to load."""
+    return (
+        sum(
+            getattr(message, "response_metadata", {}).get("load_duration") or 0
+            for message in messages
+        )
+        / 1e9
+    )
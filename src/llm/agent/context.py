@@ -0,0 +1,207 @@
+from collections.abc import Callable
+from concurrent.futures import Executor
+import threading
+import traceback
+import weakref
+from typing import NamedTuple
+
+from langchain_core.messages import BaseMessage
+
+from llm.agent.defaults import DEFAULT_CONTEXT_TOKEN_BUDGET
+from llm.agent.memory import (
+    AgentSessionMemory,
+    ContextSummary,
+    create_context_summary,
+)
+from llm.agent.utils import is_system_message, is_user_message
+
+DEFAULT_MIN_RECENT_TURNS = 2
+DEFAULT_SUMMARY_MAX_TOKENS = 256
+
+# once the history outgrows the budget, turns are folded until the rest fits in this
+# share of it, so that not every following turn triggers another summary
+FOLD_TARGET_SHARE = 0.5
+
+
+class ContextSettings(NamedTuple):
+    token_budget: int = DEFAULT_CONTEXT_TOKEN_BUDGET  # history tokens sent with each turn, summary included
+    min_recent_turns: int = DEFAULT_MIN_RECENT_TURNS  # newest turns sent verbatim even over budget
+    summary_max_tokens: int = DEFAULT_SUMMARY_MAX_TOKENS  # length asked of the rolling summary
+
+
+def validate_context_settings(settings: ContextSettings) -> None:
+    if settings.token_budget < 1:
+        raise ValueError("Context token budget must be positive.")
+
+    if settings.min_recent_turns < 1:
+        raise ValueError("At least one recent turn must be kept.")
+
+    if not 0 < settings.summary_max_tokens < settings.token_budget:
+        raise ValueError("Summary size must be positive and below the token budget.")
+
+
+class ChatContextWindow:
+    """
+    Keeps the history sent with each turn within a token budget.
+
+    System messages and the newest turns are sent verbatim, the newest turns filling
+    whatever the budget leaves. Once a session outgrows the budget, its older turns
+    are folded into a rolling summary by a background job on `executor`; the summary
+    is swapped into the session at once, so the next turn picks it up. Turns that no
+    longer fit are left out until then.
+
+    `summarize` takes the previous summary (or None) and the messages to fold in, and
+    returns the new summary.
+    """
+
+    def __init__(
+        self,
+        summarize: Callable[[str | None, list[BaseMessage]], str],
+        executor: Executor,
+        settings: ContextSettings = ContextSettings(),
+    ) -> None:
+        validate_context_settings(settings)
+
+        self.settings = settings
+
+        self.__summarize = summarize
+        self.__executor = executor
+        self.__lock = threading.Lock()
+        self.__summarizing: weakref.WeakSet[AgentSessionMemory] = weakref.WeakSet()
+
+        self.summaries = 0
+        self.summary_failures = 0
+        self.folded_messages = 0
+
+    def build(self, session: AgentSessionMemory) -> list[BaseMessage]:
+        """Return the history to send with the session's next turn."""
+        messages, token_counts, summary = session.get_snapshot()
+        window_start = self.__get_window_start(
+            messages,
+            token_counts,
+            self.settings.token_budget - get_summary_tokens(summary),
+        )
+
+        context = [
+            message for message in messages[:window_start] if is_system_message(message)
+        ]
+
+        if summary is not None:
+            context.append(summary.message)
+
+        return context + messages[window_start:]
+
+    def after_turn(self, session: AgentSessionMemory) -> None:
+        """Start folding old turns into the summary if the session outgrew the budget."""
+        messages, token_counts, summary = session.get_snapshot()
+
+        if sum(token_counts) + get_summary_tokens(summary) <= self.settings.token_budget:
+            return
+
+        fold_count = self.__get_window_start(
+            messages,
+            token_counts,
+            int(self.settings.token_budget * FOLD_TARGET_SHARE)
+            - self.settings.summary_max_tokens,
+        )
+        to_fold = [
+            message for message in messages[:fold_count] if not is_system_message(message)
+        ]
+
+        if not to_fold:
+            return
+
+        with self.__lock:
+            # one summary per session at a time, the next turn retries if needed
+            if session in self.__summarizing:
+                return
+
+            self.__summarizing.add(session)
+
+        previous_summary = None if summary is None else summary.text
+
+        try:
+            self.__executor.submit(
+                self.__fold, session, previous_summary, to_fold, fold_count
+            )
+        except RuntimeError:
+            # executor has been shut down (i.e. during shutdown)
+            with self.__lock:
+                self.__summarizing.discard(session)
+
+    def __fold(
+        self,
+        session: AgentSessionMemory,
+        previous_summary: str | None,
+        to_fold: list[BaseMessage],
+        fold_count: int,
+    ) -> None:
+        try:
+            summary = create_context_summary(self.__summarize(previous_summary, to_fold))
+
+            # only this job removes messages, and only from the front, so the first
+            # fold_count messages are still the ones summarised
+            session.fold(fold_count, summary)
+
+            with self.__lock:
+                self.summaries += 1
+                self.folded_messages += len(to_fold)
+        except Exception:
+            with self.__lock:
+                self.summary_failures += 1
+
+            traceback.print_exc()
+        finally:
+            with self.__lock:
+                self.__summarizing.discard(session)
+
+    def __get_window_start(
+        self, messages: list[BaseMessage], token_counts: list[int], budget: int
+    ) -> int:
+        """Index of the oldest message of the newest turns that fit in the budget."""
+        budget -= sum(
+            count
+            for message, count in zip(messages, token_counts)
+            if is_system_message(message)
+        )
+
+        window_start = len(messages)
+        turns = 0
+        turn_tokens = 0
+        window_tokens = 0
+
+        # walk back one turn (a user message and everything after it) at a time
+        for index in range(len(messages) - 1, -1, -1):
+            if is_system_message(messages[index]):
+                continue
+
+            turn_tokens += token_counts[index]
+
+            if not is_user_message(messages[index]) and index > 0:
+                continue
+
+            if (
+                turns >= self.settings.min_recent_turns
+                and window_tokens + turn_tokens > budget
+            ):
+                break
+
+            window_start = index
+            window_tokens += turn_tokens
+            turns += 1
+            turn_tokens = 0
+
+        return window_start
+
+    def stats(self) -> dict[str, int]:
+        with self.__lock:
+            return {
+                "summaries": self.summaries,
+                "summary_failures": self.summary_failures,
+                "folded_messages": self.folded_messages,
+                "summarizing": len(self.__summarizing),
+            }
+
+
+def get_summary_tokens(summary: ContextSummary | None) -> int:
+    return 0 if summary is None else summary.token_count
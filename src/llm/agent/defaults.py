@@ -0,0 +1,17 @@
+# agent defaults shown by `yo start --help`, kept free of langchain imports so that
+# the cli does not load the agent just to build its parser
+
+DEFAULT_MAX_SESSIONS = 256
+
+# ollama serves up to 4 requests per model at once by default (OLLAMA_NUM_PARALLEL),
+# more would only queue inside ollama
+DEFAULT_MAX_PARALLEL_INVOCATIONS = 4
+
+# ollama's default context is 4096 tokens, the rest is left for the tool schemas,
+# the new user message and the reply
+DEFAULT_CONTEXT_TOKEN_BUDGET = 2048
+
+DEFAULT_RESPONSE_CACHE_SIZE = 512  # replies
+DEFAULT_RESPONSE_CACHE_TTL = 10 * 60.0  # seconds
+
+DEFAULT_SIMPLE_MAX_WORDS = 12
@@ -4,6 +4,7 @@ from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.language_models import LanguageModelInput
 from langchain_core.messages import AnyMessage
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import BaseTool
 from langgraph.graph import START, StateGraph
 from langgraph.graph.message import add_messages
@@ -13,6 +14,9 @@ from langgraph.prebuilt import ToolNode, tools_condition
 from app_streams.events import AppEventStream
 from llm.agent.memory import AgentPersistentMemory
 
+CHATBOT_NODE = "chatbot"
+TOOLS_NODE = "tools"
+
 
 class AgentState(TypedDict):
     messages: Annotated[list[AnyMessage], add_messages]
@@ -26,22 +30,23 @@ def create_graph(
 ) -> CompiledStateGraph[AgentState, None, AgentState, AgentState]:
     graph_builder = StateGraph(AgentState)
 
-    def chatbot(state: AgentState):
+    def chatbot(state: AgentState, config: RunnableConfig):
         prompt = ChatPromptTemplate.from_messages(state["messages"])
         chain = prompt | llm
 
-        response = chain.invoke({"messages": state["messages"]})
+        # passing the config on lets graph.stream() pick up the llm tokens
+        response = chain.invoke({"messages": state["messages"]}, config)
 
         return {"messages": state["messages"] + [response]}
 
     tools_node = ToolNode(tools=tools)
 
-    graph_builder.add_node("chatbot", chatbot)
-    graph_builder.add_node("tools", tools_node)
+    graph_builder.add_node(CHATBOT_NODE, chatbot)
+    graph_builder.add_node(TOOLS_NODE, tools_node)
 
-    graph_builder.add_edge(START, "chatbot")
-    graph_builder.add_conditional_edges("chatbot", tools_condition)
-    graph_builder.add_edge("tools", "chatbot")
+    graph_builder.add_edge(START, CHATBOT_NODE)
+    graph_builder.add_conditional_edges(CHATBOT_NODE, tools_condition)
+    graph_builder.add_edge(TOOLS_NODE, CHATBOT_NODE)
 
     graph = graph_builder.compile()
 
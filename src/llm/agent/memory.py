@@ -1,26 +1,160 @@
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
 import json
 import os
 import threading
-from typing import Optional
+from typing import NamedTuple, Optional
 
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import BaseMessage, SystemMessage
+
+from llm.agent.defaults import DEFAULT_MAX_SESSIONS
+from llm.agent.utils import estimate_tokens, is_system_message
+
+
+class ContextSummary(NamedTuple):
+    text: str
+    message: BaseMessage  # the summary as sent to the llm
+    token_count: int
+
+
+def create_context_summary(text: str) -> ContextSummary:
+    message = SystemMessage(f"Summary of the earlier conversation: {text}")
+
+    return ContextSummary(text, message, estimate_tokens(message))
 
 
 class AgentSessionMemory:
-    def __init__(self, init_history: list[BaseMessage] = []) -> None:
+    """
+    Chat history of one session, with the token count of every message and the
+    rolling summary of the turns folded out of the history.
+
+    Turns are taken in the order they were reserved: a turn reads the history, runs
+    the agent and appends its messages before the next turn sees the history.
+    """
+
+    def __init__(self, init_history: list[BaseMessage] | None = None) -> None:
         self.lock = threading.Lock()
-        self._history: list[BaseMessage] = init_history
+        self._history: list[BaseMessage] = list(init_history or [])
+        self._token_counts: list[int] = list(map(estimate_tokens, self._history))
+        self.summary: ContextSummary | None = None
+
+        self.__turn_condition = threading.Condition()
+        self.__next_ticket = 0
+        self.__serving = 0
 
     def get(self):
         return [*self._history]
 
     def update(self, messages: list[BaseMessage]) -> None:
-        # print("-> about to update history")
+        token_counts = list(map(estimate_tokens, messages))
+
         with self.lock:
-            # print("-> acquired lock")
             self._history += messages
-            # print("-> history updated. releasing lock...")
-        # print("-> lock released")
+            self._token_counts += token_counts
+
+    def get_snapshot(
+        self,
+    ) -> tuple[list[BaseMessage], list[int], ContextSummary | None]:
+        """Return the history, its token counts and the summary, as one consistent view."""
+        with self.lock:
+            return [*self._history], [*self._token_counts], self.summary
+
+    def fold(self, count: int, summary: ContextSummary) -> None:
+        """Swap the first `count` messages for a summary. System messages are kept."""
+        with self.lock:
+            kept = [
+                index for index in range(count) if is_system_message(self._history[index])
+            ]
+
+            self._history = [self._history[index] for index in kept] + self._history[count:]
+            self._token_counts = [
+                self._token_counts[index] for index in kept
+            ] + self._token_counts[count:]
+            self.summary = summary
+
+    @property
+    def is_idle(self) -> bool:
+        with self.__turn_condition:
+            return self.__serving == self.__next_ticket
+
+    def reserve_turn(self) -> int:
+        with self.__turn_condition:
+            ticket = self.__next_ticket
+            self.__next_ticket += 1
+
+            return ticket
+
+    def wait_for_turn(self, ticket: int) -> None:
+        with self.__turn_condition:
+            self.__turn_condition.wait_for(lambda: self.__serving == ticket)
+
+    def end_turn(self) -> None:
+        with self.__turn_condition:
+            self.__serving += 1
+            self.__turn_condition.notify_all()
+
+
+class AgentSessionStore:
+    """
+    Session memories keyed by connection id.
+
+    Holds at most `max_sessions` sessions; beyond that the least recently used idle
+    sessions are evicted. Sessions with a turn running or waiting are never evicted,
+    so the store may briefly hold more.
+    """
+
+    def __init__(self, max_sessions: int = DEFAULT_MAX_SESSIONS) -> None:
+        if max_sessions < 1:
+            raise ValueError("Session store needs room for at least one session.")
+
+        self.max_sessions = max_sessions
+
+        self.__lock = threading.Lock()
+        self.__sessions: OrderedDict[int, AgentSessionMemory] = OrderedDict()
+
+        self.evicted = 0
+
+    @contextmanager
+    def take_turn(self, connection_id: int) -> Iterator[AgentSessionMemory]:
+        """Wait for the connection's turn and hand out its session for the turn."""
+        with self.__lock:
+            session = self.__sessions.get(connection_id)
+
+            if session is None:
+                session = AgentSessionMemory()
+                self.__sessions[connection_id] = session
+            else:
+                self.__sessions.move_to_end(connection_id)
+
+            # reserved under the store lock, so the session cannot be evicted meanwhile
+            ticket = session.reserve_turn()
+            self.__evict_idle_sessions()
+
+        try:
+            session.wait_for_turn(ticket)
+            yield session
+        finally:
+            session.end_turn()
+
+    def __evict_idle_sessions(self) -> None:
+        excess = len(self.__sessions) - self.max_sessions
+
+        if excess <= 0:
+            return
+
+        for connection_id, session in list(self.__sessions.items()):
+            if excess == 0:
+                break
+
+            if session.is_idle:
+                del self.__sessions[connection_id]
+                self.evicted += 1
+                excess -= 1
+
+    def stats(self) -> dict[str, int]:
+        with self.__lock:
+            return {"sessions": len(self.__sessions), "evicted": self.evicted}
 
 
 class AgentPersistentMemory:
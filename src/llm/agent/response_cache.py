@@ -0,0 +1,208 @@
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import Future
+import hashlib
+import json
+import threading
+import time
+from typing import NamedTuple
+
+from langchain_core.messages import BaseMessage
+
+from llm.agent.defaults import DEFAULT_RESPONSE_CACHE_SIZE, DEFAULT_RESPONSE_CACHE_TTL
+from llm.agent.utils import get_message_role
+
+# how a reply was obtained
+HIT = "hit"  # from the cache
+COALESCED = "coalesced"  # shared with an identical request that was in flight
+MISS = "miss"  # computed for this request
+
+# what an in-flight request hands its waiters instead of a reply
+_NOT_SHARED = "not-shared"  # the reply may not be reused, each waiter computes its own
+_FAILED = "failed"  # the request failed, one waiter computes in its place
+
+
+class ResponseCacheSettings(NamedTuple):
+    max_entries: int = DEFAULT_RESPONSE_CACHE_SIZE  # least recently used replies are evicted beyond this
+    ttl: float = DEFAULT_RESPONSE_CACHE_TTL  # seconds a reply may be reused for
+
+
+def validate_response_cache_settings(settings: ResponseCacheSettings) -> None:
+    if settings.max_entries < 1:
+        raise ValueError("Response cache needs room for at least one reply.")
+
+    if settings.ttl <= 0:
+        raise ValueError("Response cache TTL must be positive.")
+
+
+class CachedResponse(NamedTuple):
+    messages: list[BaseMessage]  # the messages that answered the prompt, reply last
+    expires_at: float  # time.monotonic()
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.split()).casefold()
+
+
+def get_response_cache_key(
+    prompt: str, history: list[BaseMessage], model_settings: str
+) -> str:
+    """Key of a reply: the normalized prompt, the history sent with it and the model."""
+    fingerprint = hashlib.blake2b(digest_size=16)
+    fingerprint.update(model_settings.encode())
+
+    for message in history:
+        fingerprint.update(
+            json.dumps(
+                [
+                    get_message_role(message),
+                    message.content,
+                    [
+                        [call["name"], call["args"]]
+                        for call in getattr(message, "tool_calls", None) or ()
+                    ],
+                ],
+                default=str,
+                ensure_ascii=False,
+            ).encode()
+        )
+
+    fingerprint.update(normalize_prompt(prompt).encode())
+
+    return fingerprint.hexdigest()
+
+
+class ResponseCache:
+    """
+    LRU cache of agent replies whose entries expire after a TTL.
+
+    Identical requests in flight at the same time are coalesced (single-flight): the
+    first computes the reply and the others wait for it, so one llm call answers all
+    of them. Waiters only get the reply if it may be cached; otherwise each computes
+    its own. If the first request fails, one waiter computes in its place.
+    """
+
+    def __init__(self, settings: ResponseCacheSettings = ResponseCacheSettings()) -> None:
+        validate_response_cache_settings(settings)
+
+        self.settings = settings
+
+        self.__lock = threading.Lock()
+        self.__entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self.__in_flight: dict[str, Future] = {}
+
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self.evicted = 0
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], tuple[list[BaseMessage], bool]],
+    ) -> tuple[list[BaseMessage], str]:
+        """
+        Return the reply messages for `key` and how they were obtained (HIT,
+        COALESCED or MISS). On a miss `compute` returns the messages and whether
+        they may be cached.
+        """
+        while True:
+            with self.__lock:
+                entry = self.__entries.get(key)
+
+                if entry is not None and entry.expires_at > time.monotonic():
+                    self.__entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.messages, HIT
+
+                if entry is not None:
+                    del self.__entries[key]
+
+                in_flight = self.__in_flight.get(key)
+
+                if in_flight is None:
+                    in_flight = Future()
+                    self.__in_flight[key] = in_flight
+                    self.misses += 1
+                    break
+
+            shared = in_flight.result()
+
+            if shared == _FAILED:
+                # the first waiter back computes, the others wait for it
+                continue
+
+            if shared == _NOT_SHARED:
+                with self.__lock:
+                    self.misses += 1
+
+                messages, is_cacheable = compute()
+
+                with self.__lock:
+                    self.__store(key, messages, is_cacheable)
+
+                return messages, MISS
+
+            with self.__lock:
+                self.coalesced += 1
+
+            return shared, COALESCED
+
+        try:
+            messages, is_cacheable = compute()
+        except BaseException:
+            # the error may be this request's own (e.g. its client went away), so
+            # waiters are not failed with it
+            with self.__lock:
+                del self.__in_flight[key]
+
+            in_flight.set_result(_FAILED)
+            raise
+
+        with self.__lock:
+            del self.__in_flight[key]
+            self.__store(key, messages, is_cacheable)
+
+        # e.g. replies that called tools with side effects ran them for this request only
+        in_flight.set_result(messages if is_cacheable else _NOT_SHARED)
+
+        return messages, MISS
+
+    def __store(self, key: str, messages: list[BaseMessage], is_cacheable: bool) -> None:
+        # called with the lock held
+        if is_cacheable:
+            self.__entries[key] = CachedResponse(
+                messages, time.monotonic() + self.settings.ttl
+            )
+            self.__evict()
+        else:
+            self.uncacheable += 1
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+
+    def __evict(self) -> None:
+        now = time.monotonic()
+
+        while self.__entries:
+            key, entry = next(iter(self.__entries.items()))
+
+            if len(self.__entries) <= self.settings.max_entries and entry.expires_at > now:
+                break
+
+            del self.__entries[key]
+            self.evicted += 1
+
+    def stats(self) -> dict[str, int]:
+        with self.__lock:
+            return {
+                "entries": len(self.__entries),
+                "in_flight": len(self.__in_flight),
+                "hits": self.hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+                "uncacheable": self.uncacheable,
+                "evicted": self.evicted,
+            }
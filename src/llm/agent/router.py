@@ -0,0 +1,193 @@
+from collections.abc import Callable
+from datetime import datetime
+import re
+import secrets
+from typing import NamedTuple
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.tools import BaseTool
+
+from llm.agent.defaults import DEFAULT_SIMPLE_MAX_WORDS
+from llm.agent.tools import get_current_datetime
+
+# where a prompt is answered
+DIRECT = "direct"  # by a rule and a tool, without an llm
+SMALL = "small"  # by the small model, without tools
+LARGE = "large"  # by the agent graph on the large model
+ESCALATED = "escalated"  # by the large model, after the small model failed
+
+ROUTES = (DIRECT, SMALL, LARGE, ESCALATED)
+
+# prompts mentioning any of these may need a tool or some reasoning, so they go to
+# the large model. matched against word prefixes
+ESCALATION_KEYWORDS = (
+    # tools
+    "remember",
+    "memor",
+    "forget",
+    "save",
+    "note",
+    "tree",
+    "forest",
+    "event",
+    "connect",
+    "system",
+    "user",
+    "time",
+    "date",
+    "day",
+    "today",
+    "now",
+    "yesterday",
+    "tomorrow",
+    # reasoning
+    "explain",
+    "why",
+    "step",
+    "code",
+    "compare",
+    "analy",
+    "calculat",
+    "summar",
+)
+
+ESCALATION_PATTERN = re.compile(
+    r"\b(?:" + "|".join(map(re.escape, ESCALATION_KEYWORDS)) + r")", re.IGNORECASE
+)
+
+DATETIME_FORMAT = "%A %Y-%m-%d %H:%M:%S.%f"  # as returned by get_current_datetime
+
+
+class DirectIntent(NamedTuple):
+    name: str
+    pattern: re.Pattern  # matched against the whole normalized prompt
+    tool: BaseTool
+    format_reply: Callable[[str], str]  # tool result -> reply
+
+
+class RouteDecision(NamedTuple):
+    route: str
+    intent: DirectIntent | None = None
+
+
+class RouteReport(NamedTuple):
+    route: str  # where the prompt was answered in the end
+    decision_duration: float  # seconds taken to choose the route
+    duration: float  # seconds taken to answer on that route
+
+
+class RouterSettings(NamedTuple):
+    small_model: str | None = None  # None sends everything that is not answered directly to the large model
+    simple_max_words: int = DEFAULT_SIMPLE_MAX_WORDS  # longer prompts go to the large model
+    direct_answers: bool = True  # answer deterministic intents without an llm
+
+
+def validate_router_settings(settings: RouterSettings) -> None:
+    if settings.simple_max_words < 1:
+        raise ValueError("Simple prompts need at least one word.")
+
+
+def format_time(result: str) -> str:
+    now = datetime.strptime(result, DATETIME_FORMAT)
+    return f"It's {now.strftime('%I:%M %p').lstrip('0')}."
+
+
+def format_date(result: str) -> str:
+    now = datetime.strptime(result, DATETIME_FORMAT)
+    return f"Today is {now.strftime('%B')} {now.day}, {now.year}."
+
+
+def format_day(result: str) -> str:
+    now = datetime.strptime(result, DATETIME_FORMAT)
+    return f"Today is {now.strftime('%A')}."
+
+
+def compile_intent_pattern(pattern: str) -> re.Pattern:
+    # optional greeting before and "now", "please" or "today" after the question itself
+    return re.compile(
+        rf"^(?:(?:hey|hi|ok|okay)\s+)?(?:yoda\W*\s*)?(?:{pattern})(?:\s+(?:now|please|today))?\W*$",
+        re.IGNORECASE,
+    )
+
+
+# only prompts that are nothing but the question are answered directly, e.g. not
+# "what time is it in tokyo"
+DIRECT_INTENTS = (
+    DirectIntent(
+        "time",
+        compile_intent_pattern(
+            r"what\s+time\s+is\s+it|what(?:'s|\s+is)\s+the\s+(?:current\s+)?time"
+            r"|(?:tell\s+me\s+)?the\s+time|time"
+        ),
+        get_current_datetime,
+        format_time,
+    ),
+    DirectIntent(
+        "date",
+        compile_intent_pattern(
+            r"what(?:'s|\s+is)\s+(?:the\s+|today's\s+)(?:current\s+)?date"
+            r"|what\s+date\s+is\s+(?:it|today)|(?:today's\s+)?date"
+        ),
+        get_current_datetime,
+        format_date,
+    ),
+    DirectIntent(
+        "day",
+        compile_intent_pattern(
+            r"what\s+day\s+is\s+(?:it|today)|what(?:'s|\s+is)\s+the\s+day"
+            r"|which\s+day\s+is\s+(?:it|today)"
+        ),
+        get_current_datetime,
+        format_day,
+    ),
+)
+
+
+class PromptRouter:
+    """
+    Rule-based choice of where a prompt is answered.
+
+    Prompts that are nothing but a deterministic question (e.g. the time) are
+    answered directly with a tool. Short prompts without hints of tools or reasoning
+    go to the small model, if there is one. Everything else goes to the large model.
+    """
+
+    def __init__(self, settings: RouterSettings = RouterSettings()) -> None:
+        validate_router_settings(settings)
+
+        self.settings = settings
+
+    def route(self, prompt: str) -> RouteDecision:
+        normalized = " ".join(prompt.split())
+
+        if self.settings.direct_answers:
+            for intent in DIRECT_INTENTS:
+                if intent.pattern.match(normalized):
+                    return RouteDecision(DIRECT, intent)
+
+        if (
+            self.settings.small_model is not None
+            and len(normalized.split()) <= self.settings.simple_max_words
+            and normalized.count("?") <= 1
+            and ESCALATION_PATTERN.search(normalized) is None
+        ):
+            return RouteDecision(SMALL)
+
+        return RouteDecision(LARGE)
+
+
+def answer_directly(intent: DirectIntent) -> list[BaseMessage]:
+    """
+    Run the intent's tool and return the reply messages, recorded as if the model had
+    called the tool, so the history reads the same either way.
+    """
+    tool_call_id = f"direct-{secrets.token_hex(8)}"
+    result = intent.tool.invoke({})
+
+    return [
+        AIMessage(
+            "", tool_calls=[{"name": intent.tool.name, "args": {}, "id": tool_call_id}]
+        ),
+        ToolMessage(str(result), tool_call_id=tool_call_id, name=intent.tool.name),
+        AIMessage(intent.format_reply(result)),
+    ]
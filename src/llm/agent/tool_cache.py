@@ -0,0 +1,225 @@
+from collections import OrderedDict
+from collections.abc import Callable
+import functools
+import inspect
+import json
+import math
+import threading
+import time
+import typing
+from typing import NamedTuple
+
+from langgraph.prebuilt import InjectedState
+
+# how a tool's results may be reused
+PURE = "pure"  # same arguments, same result, until a resource it depends on changes
+TTL = "ttl"  # reused for a while, e.g. results that change slowly
+NEVER = "never"  # run on every call
+
+DEFAULT_TOOL_CACHE_SIZE = 1024  # results, across all tools
+
+MEMORY = "memory"  # the agent's persistent memory
+
+
+class ToolCachePolicy(NamedTuple):
+    kind: str
+    ttl: float | None = None  # seconds, for TTL
+    depends_on: tuple[str, ...] = ()  # resources whose changes invalidate the results
+    invalidates: tuple[str, ...] = ()  # resources the tool changes
+    side_effects: bool = False
+
+
+class CachedToolResult(NamedTuple):
+    value: any
+    expires_at: float  # time.monotonic(), inf for pure tools
+    depends_on: tuple[str, ...]
+
+
+class ToolResultCache:
+    """
+    LRU cache of tool results, keyed by tool and arguments.
+
+    Results of a tool that depends on a resource are dropped whenever a tool that
+    changes it runs. A result computed while the resource changed is not stored.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_TOOL_CACHE_SIZE) -> None:
+        self.max_entries = max_entries
+
+        self.__lock = threading.Lock()
+        self.__entries: OrderedDict[tuple[str, str], CachedToolResult] = OrderedDict()
+        self.__generations: dict[str, int] = {}  # bumped on every change of a resource
+        self.__stats: dict[str, dict[str, int]] = {}
+
+    def get(self, key: tuple[str, str]) -> tuple[bool, any]:
+        with self.__lock:
+            entry = self.__entries.get(key)
+            is_hit = entry is not None and entry.expires_at > time.monotonic()
+
+            if is_hit:
+                self.__entries.move_to_end(key)
+            elif entry is not None:
+                del self.__entries[key]
+
+            self.__count(key[0], "hits" if is_hit else "misses")
+
+            return is_hit, entry.value if is_hit else None
+
+    def get_generation(self, resources: tuple[str, ...]) -> tuple[int, ...]:
+        with self.__lock:
+            return tuple(self.__generations.get(resource, 0) for resource in resources)
+
+    def put(
+        self,
+        key: tuple[str, str],
+        value: any,
+        ttl: float | None,
+        depends_on: tuple[str, ...],
+        generation: tuple[int, ...],
+    ) -> None:
+        expires_at = math.inf if ttl is None else time.monotonic() + ttl
+
+        with self.__lock:
+            current_generation = tuple(
+                self.__generations.get(resource, 0) for resource in depends_on
+            )
+
+            if current_generation != generation:
+                # a resource changed while the tool ran, the result may be stale
+                return
+
+            self.__entries[key] = CachedToolResult(value, expires_at, depends_on)
+            self.__entries.move_to_end(key)
+
+            while len(self.__entries) > self.max_entries:
+                evicted_key, _ = self.__entries.popitem(last=False)
+                self.__count(evicted_key[0], "evicted")
+
+    def invalidate(self, resources: tuple[str, ...]) -> None:
+        with self.__lock:
+            for resource in resources:
+                self.__generations[resource] = self.__generations.get(resource, 0) + 1
+
+            stale_keys = [
+                key
+                for key, entry in self.__entries.items()
+                if not set(entry.depends_on).isdisjoint(resources)
+            ]
+
+            for key in stale_keys:
+                del self.__entries[key]
+                self.__count(key[0], "invalidated")
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+
+    def __count(self, tool_name: str, stat: str) -> None:
+        stats = self.__stats.setdefault(
+            tool_name, {"hits": 0, "misses": 0, "evicted": 0, "invalidated": 0}
+        )
+        stats[stat] += 1
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Per tool: hits, misses, evicted and invalidated results."""
+        with self.__lock:
+            return {tool_name: {**stats} for tool_name, stats in self.__stats.items()}
+
+
+# tools are module level functions, so are their results
+tool_result_cache = ToolResultCache()
+
+
+def get_injected_parameters(func: Callable) -> set[str]:
+    """Names of the parameters filled in by the graph, not chosen by the llm."""
+    hints = typing.get_type_hints(func, include_extras=True)
+
+    return {
+        name
+        for name, hint in hints.items()
+        if any(
+            metadata is InjectedState or isinstance(metadata, InjectedState)
+            for metadata in getattr(hint, "__metadata__", ())
+        )
+    }
+
+
+def memoize(policy: ToolCachePolicy) -> Callable[[Callable], Callable]:
+    """
+    Declare how the results of a tool function may be reused. Goes below @tool, which
+    reads the wrapped function's signature and docstring.
+    """
+
+    def decorate(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+        injected_parameters = get_injected_parameters(func)
+
+        @functools.wraps(func)
+        def run_tool(*args, **kwargs):
+            if policy.kind == NEVER:
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    if policy.invalidates:
+                        tool_result_cache.invalidate(policy.invalidates)
+
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+
+            key = (
+                func.__name__,
+                json.dumps(
+                    {
+                        name: value
+                        for name, value in arguments.arguments.items()
+                        if name not in injected_parameters
+                    },
+                    sort_keys=True,
+                    default=repr,
+                ),
+            )
+
+            is_hit, value = tool_result_cache.get(key)
+
+            if is_hit:
+                return value
+
+            generation = tool_result_cache.get_generation(policy.depends_on)
+            value = func(*args, **kwargs)
+            tool_result_cache.put(
+                key, value, policy.ttl, policy.depends_on, generation
+            )
+
+            return value
+
+        run_tool.tool_cache_policy = policy
+
+        return run_tool
+
+    return decorate
+
+
+def pure(depends_on: tuple[str, ...] = ()) -> Callable[[Callable], Callable]:
+    """Results depend only on the arguments and the given resources."""
+    return memoize(ToolCachePolicy(PURE, depends_on=depends_on))
+
+
+def expires(ttl: float, depends_on: tuple[str, ...] = ()) -> Callable[[Callable], Callable]:
+    """Results may be reused for `ttl` seconds."""
+    if ttl <= 0:
+        raise ValueError("Tool result TTL must be positive.")
+
+    return memoize(ToolCachePolicy(TTL, ttl=ttl, depends_on=depends_on))
+
+
+def never_cache(
+    invalidates: tuple[str, ...] = (), side_effects: bool = False
+) -> Callable[[Callable], Callable]:
+    """Results are never reused. Results depending on `invalidates` are dropped after each call."""
+    return memoize(
+        ToolCachePolicy(NEVER, invalidates=invalidates, side_effects=side_effects)
+    )
+
+
+def get_tool_cache_policy(tool) -> ToolCachePolicy | None:
+    return getattr(getattr(tool, "func", None), "tool_cache_policy", None)
@@ -6,12 +6,25 @@ from langchain_core.tools import tool
 from langgraph.prebuilt import InjectedState
 
 from app_streams.events import SystemEvent
+from llm.agent.tool_cache import (
+    MEMORY,
+    PURE,
+    expires,
+    get_tool_cache_policy,
+    never_cache,
+    pure,
+)
 from llm.agent.utils import convert_to_base_messages
 
 from typing import Optional
 
+DEFAULT_EVENTS_HISTORY_LIMIT = 20
+# repeated lookups within one graph run are answered once
+EVENTS_HISTORY_TTL = 2.0  # seconds
+
 
 @tool
+@pure(depends_on=(MEMORY,))
 def search_memory(
     query: str,
     state: Annotated[dict, InjectedState],
@@ -27,6 +40,7 @@ def search_memory(
 
 
 @tool
+@never_cache(invalidates=(MEMORY,), side_effects=True)
 def add_memory_segment(
     segment_id: str,
     name: str,
@@ -55,6 +69,7 @@ def add_memory_segment(
 
 
 @tool
+@never_cache(invalidates=(MEMORY,), side_effects=True)
 def update_memory_segment(
     segment_id: str,
     name: Optional[str] = None,
@@ -89,6 +104,7 @@ def update_memory_segment(
 
 
 @tool
+@never_cache(side_effects=True)
 def persist_memory_to_disk(
     state: Annotated[dict, InjectedState],
 ) -> str:
@@ -108,6 +124,7 @@ def persist_memory_to_disk(
 
 
 @tool
+@never_cache()
 def count_trees(name: str) -> int:
     """
     Count the number of trees in a forest. Takes name of the forest as argument.
@@ -117,6 +134,7 @@ def count_trees(name: str) -> int:
 
 
 @tool
+@never_cache()
 def get_current_datetime() -> str:
     """
     Get current system date and time, including milliseconds.
@@ -128,20 +146,40 @@ def get_current_datetime() -> str:
 
 
 @tool
+@expires(ttl=EVENTS_HISTORY_TTL)
 def get_system_events_history(
     state: Annotated[dict, InjectedState],
+    event_type: Optional[str] = SystemEvent.type,
+    message: Optional[str] = None,
+    connection_id: Optional[int] = None,
+    since_minutes: Optional[float] = None,
+    limit: int = DEFAULT_EVENTS_HISTORY_LIMIT,
 ) -> list[BaseMessage]:
     """
-    Get the history of system events that have happened since system start.
-    This typically includes the status of system services and user connections.
+    Get the most recent events that have happened since system start, oldest first.
+    By default these are system events: the status of system services and user connections.
+    Filters:
+    event_type: "system", "user" or "assistant", or None for all events.
+    message: only events with exactly this message, e.g. "User connected to comms system."
+    connection_id: only events about this user connection.
+    since_minutes: only events from the last this many minutes.
+    limit: return at most this many events.
     """
 
-    messages = [
-        event
-        for event in list(state["event_stream"].history)
-        if isinstance(event, SystemEvent)
-    ]
-    parsed_messages = convert_to_base_messages(messages)
+    since = (
+        None
+        if since_minutes is None
+        else datetime.now().timestamp() - 60 * since_minutes
+    )
+
+    events = state["event_stream"].index.query(
+        event_type=event_type,
+        message=message,
+        connection_id=connection_id,
+        since=since,
+        limit=max(1, limit),
+    )
+    parsed_messages = convert_to_base_messages(events)
 
     return parsed_messages
 
@@ -155,3 +193,15 @@ available_tools = [
     update_memory_segment,
     persist_memory_to_disk,
 ]
+
+# tools that change state, replies cached before they ran may be stale
+SIDE_EFFECT_TOOLS = frozenset(
+    tool.name for tool in available_tools if get_tool_cache_policy(tool).side_effects
+)
+# tools whose results change over time by themselves
+VOLATILE_TOOLS = frozenset(
+    tool.name
+    for tool in available_tools
+    if get_tool_cache_policy(tool).kind != PURE
+    and not get_tool_cache_policy(tool).side_effects
+)
@@ -1,6 +1,33 @@
+import json
+import threading
+import weakref
 from langchain_core.messages import BaseMessage, ChatMessage
 from app_streams.events import AppEvent
 
+# rough figures for budgeting: qwen's tokenizer averages about 4 characters of
+# english text per token, and the chat template adds a few tokens per message
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# events never change once pushed, so each one is converted at most once
+_event_message_cache: weakref.WeakKeyDictionary[AppEvent, ChatMessage] = (
+    weakref.WeakKeyDictionary()
+)
+_event_message_cache_lock = threading.Lock()
+
+
+def convert_event_to_message(event: AppEvent) -> ChatMessage:
+    with _event_message_cache_lock:
+        message = _event_message_cache.get(event)
+
+    if message is None:
+        message = ChatMessage(role=event.type, content=str(event))
+
+        with _event_message_cache_lock:
+            _event_message_cache[event] = message
+
+    return message
+
 
 def convert_to_base_messages(
     messages: list[AppEvent] | list[BaseMessage],
@@ -10,6 +37,29 @@ def convert_to_base_messages(
         if isinstance(message, BaseMessage):
             parsed_messages.append(message)
         elif isinstance(message, AppEvent):
-            parsed_messages.append(ChatMessage(role=message.type, content=str(message)))
+            parsed_messages.append(convert_event_to_message(message))
 
     return parsed_messages
+
+
+def get_message_role(message: BaseMessage) -> str:
+    return getattr(message, "role", None) or message.type
+
+
+def is_system_message(message: BaseMessage) -> bool:
+    return get_message_role(message) == "system"
+
+
+def is_user_message(message: BaseMessage) -> bool:
+    return get_message_role(message) in ("user", "human")
+
+
+def estimate_tokens(message: BaseMessage) -> int:
+    """Estimate the prompt tokens of a message, tool calls included."""
+    text = message.content if isinstance(message.content, str) else str(message.content)
+    tool_calls = getattr(message, "tool_calls", None)
+
+    if tool_calls:
+        text += json.dumps(tool_calls, default=str)
+
+    return MESSAGE_OVERHEAD_TOKENS + -(-len(text) // CHARS_PER_TOKEN)
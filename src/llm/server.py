@@ -1,10 +1,22 @@
 from collections.abc import Callable
+import re
 import subprocess
 
-import requests
+# requests is imported where it is used: it is slow to import, and the cli imports
+# this module only to parse --keep-alive
+
+# how long ollama keeps a model loaded after its last request, in ollama's format:
+# seconds, or a duration such as "30m"; negative keeps it loaded until ollama exits
+DEFAULT_KEEP_ALIVE = "30m"
+
+MODEL_LOAD_TIMEOUT = 300.0  # seconds, large models take a while to load from disk
+
+KEEP_ALIVE_PATTERN = re.compile(r"^-?\d+(\.\d+)?(ms|s|m|h)?$")
 
 
 def get_is_ollama_server_running(base_url: str) -> bool:
+    import requests
+
     ping_endpoint = "/api/version"
     try:
         response = requests.get(f"{base_url}{ping_endpoint}")
@@ -34,3 +46,37 @@ def start_ollama_server(
             on_done()
             on_error(Exception(line))
             break
+
+
+def parse_keep_alive(value: str) -> int | float | str:
+    """Parse a keep-alive command line value. Plain numbers are seconds."""
+    match = KEEP_ALIVE_PATTERN.match(value.strip())
+
+    if match is None:
+        raise ValueError(f"Expected seconds or a duration like '30m', received: '{value}'.")
+
+    if match.group(2) is None:
+        seconds = float(value)
+        return int(seconds) if seconds.is_integer() else seconds
+
+    return value.strip()
+
+
+def load_ollama_model(
+    base_url: str,
+    model: str,
+    keep_alive: int | float | str,
+    timeout: float = MODEL_LOAD_TIMEOUT,
+) -> dict[str, any]:
+    """Load a model into memory and return ollama's reply, which reports the load time."""
+    import requests
+
+    # a generate request without a prompt only loads the model
+    response = requests.post(
+        f"{base_url}/api/generate",
+        json={"model": model, "keep_alive": keep_alive},
+        timeout=timeout,
+    )
+    response.raise_for_status()
+
+    return response.json()
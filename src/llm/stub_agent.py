@@ -0,0 +1,65 @@
+import threading
+import time
+from typing import Callable
+
+from app_streams.events import AGENT_ONLINE, AppEventStream, SystemEvent
+from llm.agent.defaults import DEFAULT_MAX_PARALLEL_INVOCATIONS, DEFAULT_MAX_SESSIONS
+from llm.agent.memory import AgentSessionStore
+
+
+class StubAgent:
+    """
+    Stand-in for llm.agent.Agent that echoes the user's message back.
+    Needs no Ollama server, which makes it suitable for benchmarks and replays.
+    Turns per connection and the limit on parallel invocations work as in Agent.
+    """
+
+    session_id = "stub"
+
+    def __init__(
+        self,
+        event_stream: AppEventStream,
+        reply_delay: float = 0.0,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        max_parallel_invocations: int = DEFAULT_MAX_PARALLEL_INVOCATIONS,
+    ) -> None:
+        if max_parallel_invocations < 1:
+            raise ValueError("Agent needs at least one parallel invocation.")
+
+        self.is_ready = threading.Event()
+
+        self.__event_stream = event_stream
+        self.__reply_delay = reply_delay
+        self.__sessions = AgentSessionStore(max_sessions=max_sessions)
+        self.__invocation_slots = threading.BoundedSemaphore(max_parallel_invocations)
+
+        self.is_ready.set()
+        self.__event_stream.push(
+            SystemEvent(
+                AGENT_ONLINE, {"ollama_url": None, "session_id": self.session_id}
+            )
+        )
+
+    def invoke(
+        self,
+        user_message,
+        connection_id: int,
+        on_token: Callable[[str], None] | None = None,
+        on_routed: Callable[[any], None] | None = None,  # unused, nothing is routed
+    ) -> str:
+        with self.__sessions.take_turn(connection_id) as session:
+            with self.__invocation_slots:
+                if self.__reply_delay > 0:
+                    time.sleep(self.__reply_delay)
+
+                reply = user_message.content
+
+                if on_token is not None:
+                    on_token(reply)
+
+            session.update([user_message])
+
+        return reply
+
+    def get_session_stats(self) -> dict[str, int]:
+        return self.__sessions.stats()
@@ -0,0 +1,189 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+
+from app_streams.dispatch import (
+    BLOCK,
+    DROP_NEWEST,
+    DROP_OLDEST,
+    BatchFlusher,
+    BatchHookDispatcher,
+    HookDispatcher,
+)
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        yield executor
+
+
+class Gate:
+    """Hook that records its items and holds back until opened."""
+
+    def __init__(self) -> None:
+        self.items = []
+        self.started = threading.Event()
+        self.is_open = threading.Event()
+
+    def __call__(self, item) -> None:
+        self.started.set()
+        self.is_open.wait(timeout=5)
+        self.items.append(item)
+
+
+def test_items_reach_the_hook_in_order(executor):
+    items = []
+    dispatcher = HookDispatcher(items.append, executor)
+
+    for item in range(1000):
+        dispatcher.dispatch(item)
+
+    assert dispatcher.join(timeout=5)
+    assert items == list(range(1000))
+    assert dispatcher.stats()["dispatched"] == 1000
+
+
+def test_items_with_the_same_order_key_stay_in_order(executor):
+    items = []
+    lock = threading.Lock()
+
+    def hook(item) -> None:
+        time.sleep(0.001)
+
+        with lock:
+            items.append(item)
+
+    dispatcher = HookDispatcher(
+        hook, executor, concurrency=4, order_key=lambda item: item[0]
+    )
+
+    for index in range(50):
+        for key in "abc":
+            dispatcher.dispatch((key, index))
+
+    assert dispatcher.join(timeout=5)
+
+    for key in "abc":
+        assert [index for k, index in items if k == key] == list(range(50))
+
+
+def test_drop_newest_discards_new_items_when_full(executor):
+    gate = Gate()
+    dispatcher = HookDispatcher(
+        gate, executor, max_queue_size=2, overflow_policy=DROP_NEWEST
+    )
+
+    dispatcher.dispatch(0)
+    gate.started.wait(timeout=5)  # 0 is being handled, the queue is empty
+
+    assert dispatcher.dispatch(1)
+    assert dispatcher.dispatch(2)
+    assert not dispatcher.dispatch(3)
+
+    gate.is_open.set()
+    assert dispatcher.join(timeout=5)
+    assert gate.items == [0, 1, 2]
+    assert dispatcher.stats()["dropped"] == 1
+
+
+def test_drop_oldest_discards_queued_items_when_full(executor):
+    gate = Gate()
+    dispatcher = HookDispatcher(
+        gate, executor, max_queue_size=2, overflow_policy=DROP_OLDEST
+    )
+
+    dispatcher.dispatch(0)
+    gate.started.wait(timeout=5)
+
+    for item in range(1, 5):
+        assert dispatcher.dispatch(item)
+
+    gate.is_open.set()
+    assert dispatcher.join(timeout=5)
+    assert gate.items == [0, 3, 4]
+    assert dispatcher.stats()["dropped"] == 2
+
+
+def test_block_waits_for_room_in_the_queue(executor):
+    gate = Gate()
+    dispatcher = HookDispatcher(gate, executor, max_queue_size=1, overflow_policy=BLOCK)
+
+    dispatcher.dispatch(0)
+    gate.started.wait(timeout=5)
+    dispatcher.dispatch(1)
+
+    pushing = threading.Thread(target=dispatcher.dispatch, args=(2,))
+    pushing.start()
+    time.sleep(0.1)
+    assert pushing.is_alive()
+
+    gate.is_open.set()
+    pushing.join(timeout=5)
+    assert dispatcher.join(timeout=5)
+    assert gate.items == [0, 1, 2]
+    assert dispatcher.stats()["dropped"] == 0
+
+
+def test_failing_hook_is_counted_and_does_not_stop_the_queue(executor):
+    items = []
+
+    def hook(item) -> None:
+        if item == 1:
+            raise RuntimeError("failed")
+
+        items.append(item)
+
+    dispatcher = HookDispatcher(hook, executor)
+
+    for item in range(3):
+        dispatcher.dispatch(item)
+
+    assert dispatcher.join(timeout=5)
+    assert items == [0, 2]
+    assert dispatcher.stats()["failed"] == 1
+
+
+def test_batches_keep_the_order_of_events(executor):
+    batches = []
+    flusher = BatchFlusher()
+    dispatcher = BatchHookDispatcher(
+        batches.append, executor, flusher, max_batch_size=10, max_delay=0.01
+    )
+
+    try:
+        for item in range(95):
+            dispatcher.dispatch(item)
+
+        time.sleep(0.1)  # the last, partial batch is flushed by its delay
+        assert dispatcher.join(timeout=5)
+    finally:
+        flusher.close()
+
+    assert [item for batch in batches for item in batch] == list(range(95))
+    assert all(len(batch) <= 10 for batch in batches)
+
+    stats = dispatcher.stats()
+    assert stats["flushed_by_size"] == 9
+    assert stats["flushed_by_delay"] == 1
+    assert stats["pending_events"] == 0
+
+
+def test_flush_hands_pending_events_to_the_hook(executor):
+    batches = []
+    flusher = BatchFlusher()
+    dispatcher = BatchHookDispatcher(
+        batches.append, executor, flusher, max_batch_size=10, max_delay=60
+    )
+
+    try:
+        dispatcher.dispatch(0)
+        dispatcher.dispatch(1)
+        dispatcher.flush()
+        assert dispatcher.join(timeout=5)
+    finally:
+        flusher.close()
+
+    assert batches == [[0, 1]]
@@ -0,0 +1,132 @@
+import json
+import os
+
+from app_streams.event_log import (
+    EventLogSettings,
+    SegmentedEventLog,
+    get_segment_paths,
+    read_segment,
+)
+
+
+class Event:
+    def __init__(self, message: str) -> None:
+        self.message = message
+
+    def as_dict(self) -> dict[str, any]:
+        return {"message": self.message}
+
+
+def open_log(directory, **kwargs) -> SegmentedEventLog:
+    return SegmentedEventLog(EventLogSettings(directory=str(directory), **kwargs))
+
+
+def write_events(directory, count: int, **kwargs) -> None:
+    event_log = open_log(directory, **kwargs)
+    event_log.append_batch([Event(f"event {index}") for index in range(count)])
+    assert event_log.flush(timeout=5)
+    event_log.close()
+
+
+def test_events_are_read_back_in_order(tmp_path):
+    event_log = open_log(tmp_path)
+
+    assert event_log.append(Event("first")) == 1
+    assert event_log.append_batch([Event("second"), Event("third")]) == 3
+    assert event_log.flush(timeout=5)
+
+    records = list(event_log.read())
+    assert [record["seq"] for record in records] == [1, 2, 3]
+    assert records[0] == {"seq": 1, "event": "Event", "message": "first"}
+    assert [record["seq"] for record in event_log.read(since_seq=3)] == [3]
+
+    stats = event_log.stats()
+    assert stats["committed"] == 3
+    assert stats["write_errors"] == 0
+
+    event_log.close()
+
+
+def test_numbering_continues_after_a_restart(tmp_path):
+    write_events(tmp_path, 3)
+
+    event_log = open_log(tmp_path)
+    assert event_log.append(Event("after restart")) == 4
+    event_log.close()
+
+
+def test_torn_last_line_is_cut_off(tmp_path):
+    write_events(tmp_path, 3)
+    [path] = get_segment_paths(str(tmp_path))
+
+    with open(path, "ab") as f:
+        f.write(b'{"seq": 4, "event": "Ev')
+
+    event_log = open_log(tmp_path)
+
+    assert event_log.append(Event("after crash")) == 4
+    assert event_log.flush(timeout=5)
+    assert [record["seq"] for record in event_log.read()] == [1, 2, 3, 4]
+
+    event_log.close()
+
+
+def test_complete_but_corrupt_last_lines_are_cut_off(tmp_path):
+    write_events(tmp_path, 3)
+    [path] = get_segment_paths(str(tmp_path))
+
+    with open(path, "ab") as f:
+        f.write(b'{"seq": 4, "eve\n')
+        f.write(b"\x00\x00\x00\n")
+
+    event_log = open_log(tmp_path)
+    event_log.close()
+
+    with open(path, "rb") as f:
+        lines = f.read().splitlines()
+
+    assert [json.loads(line)["seq"] for line in lines] == [1, 2, 3]
+
+
+def test_unreadable_newest_segment_is_removed(tmp_path):
+    write_events(tmp_path, 3)
+
+    with open(os.path.join(tmp_path, f"{4:020d}.jsonl"), "wb") as f:
+        f.write(b"garbage")
+
+    event_log = open_log(tmp_path)
+
+    assert len(event_log.get_segment_paths()) == 1
+    assert event_log.append(Event("after crash")) == 4
+
+    event_log.close()
+
+
+def test_segments_rotate_by_size(tmp_path):
+    record_size = 60
+    write_events(tmp_path, 10, segment_max_bytes=3 * record_size)
+
+    paths = get_segment_paths(str(tmp_path))
+    assert len(paths) > 1
+
+    seqs = [record["seq"] for path in paths for record in read_segment(path)]
+    assert seqs == list(range(1, 11))
+
+    # segments are named after their first record
+    for path in paths:
+        first_seq = next(read_segment(path))["seq"]
+        assert os.path.basename(path) == f"{first_seq:020d}.jsonl"
+
+
+def test_only_the_newest_segments_are_retained(tmp_path):
+    event_log = open_log(tmp_path, segment_max_bytes=1, retained_segments=2)
+
+    for index in range(5):
+        event_log.append(Event(f"event {index}"))
+        assert event_log.flush(timeout=5)
+
+    paths = event_log.get_segment_paths()
+    assert len(paths) == 2
+    assert [record["seq"] for record in event_log.read()] == [4, 5]
+
+    event_log.close()
@@ -0,0 +1,129 @@
+import asyncio
+import socket
+import struct
+import threading
+
+import pytest
+
+from comms.framing import (
+    FRAMED,
+    KIND_CHUNK,
+    KIND_ERROR,
+    KIND_MESSAGE,
+    KIND_STATS,
+    MAX_FRAME_SIZE,
+    NUL_DELIMITED,
+    PROTOCOL_VERSION,
+    AsyncFrameReader,
+    Frame,
+    FrameReader,
+    FramingError,
+    detect_framing,
+    encode_frame,
+    encode_message,
+)
+
+
+def read_frames(chunks: list[bytes], count: int, **kwargs) -> tuple[list[Frame], str]:
+    # the chunks are sent one by one, so frames may be split across reads. many small
+    # sends can fill the socket buffer, so they come from another thread
+    sender, receiver = socket.socketpair()
+
+    def send() -> None:
+        for chunk in chunks:
+            sender.sendall(chunk)
+
+    with sender, receiver:
+        reader = FrameReader(receiver, **kwargs)
+        sending = threading.Thread(target=send)
+        sending.start()
+
+        try:
+            return [reader.read_frame() for _ in range(count)], reader.framing
+        finally:
+            sending.join()
+
+
+def read_frames_async(data: bytes, count: int) -> tuple[list[Frame], str]:
+    async def read() -> tuple[list[Frame], str]:
+        stream = asyncio.StreamReader()
+        stream.feed_data(data)
+        stream.feed_eof()
+        reader = AsyncFrameReader(stream)
+
+        return [await reader.read_frame() for _ in range(count)], reader.framing
+
+    return asyncio.run(read())
+
+
+def test_frames_round_trip():
+    frames = [
+        Frame(KIND_MESSAGE, 1, "hello"),
+        Frame(KIND_CHUNK, 2, "héllo wörld ✓"),
+        Frame(KIND_STATS, 3, ""),
+        Frame(KIND_ERROR, 2**32 - 1, "failed"),
+    ]
+    data = b"".join(encode_frame(frame.payload, frame.kind, frame.request_id) for frame in frames)
+
+    assert read_frames([data], len(frames)) == (frames, FRAMED)
+    assert read_frames_async(data, len(frames)) == (frames, FRAMED)
+
+
+def test_frames_split_across_reads():
+    data = encode_frame("a" * 1000, request_id=7) + encode_frame("b", request_id=8)
+    chunks = [data[index : index + 3] for index in range(0, len(data), 3)]
+
+    frames, _ = read_frames(chunks, 2)
+
+    assert frames == [Frame(KIND_MESSAGE, 7, "a" * 1000), Frame(KIND_MESSAGE, 8, "b")]
+
+
+def test_frame_larger_than_the_buffer():
+    payload = "x" * 10_000
+
+    frames, _ = read_frames([encode_frame(payload)], 1, buffer_size=64)
+
+    assert frames[0].payload == payload
+
+
+def test_oversized_frames_are_rejected():
+    with pytest.raises(FramingError):
+        encode_frame("x" * (MAX_FRAME_SIZE + 1))
+
+    header = struct.pack("!BBII", PROTOCOL_VERSION, KIND_MESSAGE, 0, MAX_FRAME_SIZE + 1)
+
+    with pytest.raises(FramingError):
+        read_frames([header], 1)
+
+
+def test_legacy_messages_are_detected():
+    frames, framing = read_frames([b"hello\0wor", b"ld\0"], 2)
+
+    assert framing == NUL_DELIMITED
+    assert [frame.payload for frame in frames] == ["hello", "world"]
+    assert read_frames_async(b"hello\0world\0", 2)[1] == NUL_DELIMITED
+
+
+def test_legacy_message_starting_with_the_protocol_version():
+    data = bytes([PROTOCOL_VERSION]) + b"hello\0"
+
+    frames, framing = read_frames([data[:1], data[1:]], 1)
+
+    assert framing == NUL_DELIMITED
+    assert frames[0].payload == "\x02hello"
+    assert read_frames_async(data, 1)[0][0].payload == "\x02hello"
+
+
+def test_detect_framing():
+    assert detect_framing(b"") is None
+    assert detect_framing(b"h") == NUL_DELIMITED
+    assert detect_framing(bytes([PROTOCOL_VERSION])) is None
+    assert detect_framing(bytes([PROTOCOL_VERSION, KIND_STATS])) == FRAMED
+    assert detect_framing(bytes([PROTOCOL_VERSION]) + b"h") == NUL_DELIMITED
+
+
+def test_legacy_encoding_only_sends_complete_messages():
+    assert encode_message("hi", NUL_DELIMITED) == b"hi\0"
+    assert encode_message("failed", NUL_DELIMITED, KIND_ERROR) == b"failed\0"
+    assert encode_message("tok", NUL_DELIMITED, KIND_CHUNK) == b""
+    assert encode_message("hi", FRAMED, request_id=4) == encode_frame("hi", request_id=4)
@@ -0,0 +1,111 @@
+import threading
+import time
+
+from comms.outbound import (
+    BLOCK,
+    DISCONNECT,
+    DROP,
+    OutboundQueue,
+    OutboundQueueSettings,
+)
+
+
+def make_queue(policy: str, **kwargs) -> OutboundQueue:
+    return OutboundQueue(
+        OutboundQueueSettings(
+            high_watermark=10, low_watermark=4, slow_consumer_policy=policy
+        ),
+        **kwargs,
+    )
+
+
+def test_queue_pauses_at_the_high_watermark_and_resumes_at_the_low_watermark():
+    queue = make_queue(DROP)
+
+    assert queue.put(b"12345")
+    assert not queue.stats()["is_paused"]
+    assert queue.put(b"67890")
+    assert queue.stats()["is_paused"]
+
+    frames = queue.take()
+    assert frames == [b"12345", b"67890"]
+
+    # taken but not yet written still counts
+    assert queue.stats()["depth_bytes"] == 10
+
+    queue.release(frames[:1])
+    assert queue.stats()["is_paused"]  # 5 bytes left, above the low watermark
+
+    queue.release(frames[1:])
+    stats = queue.stats()
+    assert not stats["is_paused"]
+    assert stats["depth_bytes"] == 0
+    assert stats["sent_frames"] == 2
+    assert stats["sent_bytes"] == 10
+
+
+def test_drop_policy_discards_frames_while_paused():
+    ready_calls = []
+    queue = make_queue(DROP, on_ready=lambda: ready_calls.append(True))
+
+    assert queue.put(b"0123456789")
+    assert not queue.put(b"late")
+
+    assert queue.take() == [b"0123456789"]
+    assert queue.stats()["dropped_frames"] == 1
+    assert len(ready_calls) == 1
+
+
+def test_disconnect_policy_drops_the_connection():
+    disconnects = []
+    queue = make_queue(DISCONNECT, on_disconnect=lambda: disconnects.append(True))
+
+    assert queue.put(b"0123456789")
+    assert not queue.put(b"late")
+
+    assert disconnects == [True]
+    assert queue.stats()["dropped_frames"] == 1
+
+
+def test_block_policy_waits_for_the_writer():
+    queue = make_queue(BLOCK)
+    queue.put(b"0123456789")
+    results = []
+
+    putting = threading.Thread(target=lambda: results.append(queue.put(b"late")))
+    putting.start()
+
+    # the put waits while the queue is paused
+    time.sleep(0.1)
+    assert putting.is_alive()
+    assert queue.stats()["blocked_puts"] == 1
+
+    queue.release(queue.take())
+    putting.join(timeout=5)
+
+    assert results == [True]
+    assert queue.take() == [b"late"]
+
+
+def test_non_blocking_put_drops_instead_of_waiting():
+    queue = make_queue(BLOCK)
+    queue.put(b"0123456789")
+
+    assert not queue.put(b"ping", block=False)
+    assert queue.stats()["blocked_puts"] == 0
+
+
+def test_closed_queue_wakes_blocked_puts_and_the_writer():
+    queue = make_queue(BLOCK)
+    queue.put(b"0123456789")
+    results = []
+
+    putting = threading.Thread(target=lambda: results.append(queue.put(b"late")))
+    putting.start()
+    time.sleep(0.1)
+    queue.close()
+    putting.join(timeout=5)
+
+    assert results == [False]
+    assert queue.wait_and_take() == [b"0123456789"]
+    assert queue.wait_and_take() is None
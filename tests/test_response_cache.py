@@ -0,0 +1,129 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+
+from llm.agent.response_cache import (
+    COALESCED,
+    HIT,
+    MISS,
+    ResponseCache,
+    ResponseCacheSettings,
+)
+
+WAITERS = 4
+
+
+class SlowCompute:
+    """Reply computation that waits until released, counting its calls."""
+
+    def __init__(self, is_cacheable: bool = True, error: Exception | None = None) -> None:
+        self.calls = 0
+        self.is_cacheable = is_cacheable
+        self.error = error
+        self.started = threading.Event()
+        self.released = threading.Event()
+        self.__lock = threading.Lock()
+
+    def __call__(self) -> tuple[list[str], bool]:
+        with self.__lock:
+            self.calls += 1
+            call = self.calls
+
+        self.started.set()
+        self.released.wait(timeout=5)
+
+        if self.error is not None and call == 1:
+            raise self.error
+
+        return [f"reply {call}"], self.is_cacheable
+
+
+def run_concurrently(cache: ResponseCache, compute: SlowCompute) -> list:
+    with ThreadPoolExecutor(max_workers=WAITERS + 1) as executor:
+        first = executor.submit(cache.get_or_compute, "key", compute)
+        compute.started.wait(timeout=5)
+
+        others = [
+            executor.submit(cache.get_or_compute, "key", compute)
+            for _ in range(WAITERS)
+        ]
+        time.sleep(0.1)  # let them wait for the request in flight
+        compute.released.set()
+
+        return [future.exception() or future.result() for future in [first, *others]]
+
+
+def test_identical_requests_share_one_computation():
+    cache = ResponseCache()
+    compute = SlowCompute()
+
+    results = run_concurrently(cache, compute)
+
+    assert compute.calls == 1
+    assert results[0] == (["reply 1"], MISS)
+    assert results[1:] == [(["reply 1"], COALESCED)] * WAITERS
+
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["coalesced"] == WAITERS
+    assert stats["in_flight"] == 0
+
+
+def test_uncacheable_replies_are_not_shared():
+    cache = ResponseCache()
+    compute = SlowCompute(is_cacheable=False)
+
+    results = run_concurrently(cache, compute)
+
+    assert compute.calls == 1 + WAITERS
+    assert all(how == MISS for _, how in results)
+    assert len({messages[0] for messages, _ in results}) == 1 + WAITERS
+    assert cache.stats()["entries"] == 0
+
+
+def test_one_waiter_computes_in_place_of_a_failed_request():
+    cache = ResponseCache()
+    compute = SlowCompute(error=RuntimeError("failed"))
+
+    results = run_concurrently(cache, compute)
+
+    assert isinstance(results[0], RuntimeError)
+    assert compute.calls == 2
+    # the others share the retry, or find it cached if it was already done
+    hows = [how for _, how in results[1:]]
+    assert hows.count(MISS) == 1
+    assert set(hows) <= {MISS, COALESCED, HIT}
+    assert all(messages == ["reply 2"] for messages, _ in results[1:])
+
+
+def test_cached_replies_are_hits_until_they_expire():
+    cache = ResponseCache(ResponseCacheSettings(max_entries=8, ttl=0.1))
+    compute = SlowCompute()
+    compute.released.set()
+
+    assert cache.get_or_compute("key", compute) == (["reply 1"], MISS)
+    assert cache.get_or_compute("key", compute) == (["reply 1"], HIT)
+
+    time.sleep(0.15)
+    assert cache.get_or_compute("key", compute) == (["reply 2"], MISS)
+
+
+def test_least_recently_used_replies_are_evicted():
+    cache = ResponseCache(ResponseCacheSettings(max_entries=2, ttl=60))
+
+    for key in ("a", "b", "a", "c"):
+        cache.get_or_compute(key, lambda: ([key], True))
+
+    assert cache.get_or_compute("a", lambda: (["new"], True)) == (["a"], HIT)
+    assert cache.get_or_compute("b", lambda: (["new"], True)) == (["new"], MISS)
+    assert cache.stats()["evicted"] == 2
+
+
+def test_invalid_settings_are_rejected():
+    with pytest.raises(ValueError):
+        ResponseCache(ResponseCacheSettings(max_entries=0))
+
+    with pytest.raises(ValueError):
+        ResponseCache(ResponseCacheSettings(ttl=0))
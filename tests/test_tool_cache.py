@@ -0,0 +1,130 @@
+from typing import Annotated
+
+from langgraph.prebuilt import InjectedState
+import pytest
+
+from llm.agent.tool_cache import (
+    MEMORY,
+    NEVER,
+    expires,
+    get_tool_cache_policy,
+    never_cache,
+    pure,
+    tool_result_cache,
+)
+from llm.agent.tools import (
+    SIDE_EFFECT_TOOLS,
+    add_memory_segment,
+    available_tools,
+    search_memory,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_tool_result_cache():
+    tool_result_cache.clear()
+    yield
+    tool_result_cache.clear()
+
+
+class FakeMemory:
+    def __init__(self) -> None:
+        self.segments = []
+        self.searches = 0
+
+    def add_segment(self, segment: dict) -> None:
+        self.segments.append(segment)
+
+    def find_segments(self, query: str) -> list[dict]:
+        self.searches += 1
+        return [segment for segment in self.segments if query in segment["name"]]
+
+
+def test_pure_tools_run_once_per_arguments():
+    calls = []
+
+    @pure()
+    def square(value: int) -> int:
+        calls.append(value)
+        return value * value
+
+    assert [square(2), square(2), square(value=2), square(3)] == [4, 4, 4, 9]
+    assert calls == [2, 3]
+    assert tool_result_cache.stats()["square"]["hits"] == 2
+
+
+def test_injected_state_is_not_part_of_the_key():
+    calls = []
+
+    @pure()
+    def lookup(query: str, state: Annotated[dict, InjectedState]) -> str:
+        calls.append(query)
+        return query
+
+    lookup("a", {"messages": [1]})
+    lookup("a", {"messages": [1, 2]})
+
+    assert calls == ["a"]
+
+
+def test_never_cache_tools_always_run():
+    calls = []
+
+    @never_cache()
+    def roll() -> int:
+        calls.append(True)
+        return len(calls)
+
+    assert [roll(), roll()] == [1, 2]
+    assert get_tool_cache_policy(type("Tool", (), {"func": roll})).kind == NEVER
+
+
+def test_expiring_results_are_recomputed(monkeypatch):
+    calls = []
+    now = [100.0]
+    monkeypatch.setattr("llm.agent.tool_cache.time.monotonic", lambda: now[0])
+
+    @expires(ttl=2.0)
+    def clock() -> int:
+        calls.append(True)
+        return len(calls)
+
+    assert [clock(), clock()] == [1, 1]
+
+    now[0] += 3
+    assert clock() == 2
+
+
+def test_side_effect_tools_invalidate_the_results_they_change():
+    memory = FakeMemory()
+    state = {"memory": memory}
+
+    assert search_memory.func("notes", state) == []
+    assert search_memory.func("notes", state) == []
+    assert memory.searches == 1
+
+    add_memory_segment.func("1", "notes", "desc", {}, state)
+    add_memory_segment.func("1", "notes", "desc", {}, state)
+
+    assert len(memory.segments) == 2  # not memoized
+    assert len(search_memory.func("notes", state)) == 2
+    assert memory.searches == 2
+
+
+def test_every_tool_with_side_effects_is_never_cached():
+    assert SIDE_EFFECT_TOOLS == {
+        "add_memory_segment",
+        "persist_memory_to_disk",
+        "update_memory_segment",
+    }
+
+    for tool in available_tools:
+        policy = get_tool_cache_policy(tool)
+
+        assert policy is not None, tool.name
+
+        if tool.name in SIDE_EFFECT_TOOLS:
+            assert policy.kind == NEVER
+            assert policy.side_effects
+
+    assert MEMORY in get_tool_cache_policy(add_memory_segment).invalidates